@@ -0,0 +1,7 @@
+"""
+HTTP 接口模块 - 让其他程序通过 HTTP/JSON 读写计划
+"""
+
+from .server import PlanServer, run_server
+
+__all__ = ["PlanServer", "run_server"]
@@ -0,0 +1,193 @@
+"""
+HTTP 协议 - 基于 asyncio 流的最小 HTTP/1.1 实现
+
+只支持带 Content-Length 的请求体，响应体都是 JSON。
+连接默认保持，同一连接上的请求按顺序处理。
+"""
+
+import json
+import asyncio
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# 请求体和请求头的大小上限
+MAX_BODY = 1024 * 1024
+MAX_HEADERS = 100
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    505: "HTTP Version Not Supported",
+}
+
+
+class HTTPError(Exception):
+    """以指定状态码结束请求的错误，message 作为 JSON 响应中的 error 返回"""
+
+    def __init__(
+        self, status: int, message: str, headers: Optional[Dict[str, str]] = None
+    ):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+class Request:
+    """解析后的 HTTP 请求"""
+
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: Dict[str, str],
+        body: bytes = b"",
+    ):
+        """
+        初始化请求
+
+        参数:
+            method: 请求方法
+            target: 请求目标，包括路径和查询字符串
+            version: HTTP 版本，例如 HTTP/1.1
+            headers: 名称转为小写的请求头
+            body: 请求体
+        """
+        url = urlsplit(target)
+        self.method = method
+        self.path = unquote(url.path)
+        self.query = parse_qs(url.query)
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    @property
+    def keep_alive(self) -> bool:
+        """响应后是否保持连接"""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def param(self, name: str) -> Optional[str]:
+        """查询参数的值，出现多次时取最后一个，不存在时返回 None"""
+        values = self.query.get(name)
+        return values[-1] if values else None
+
+    def params(self, name: str) -> Optional[List[str]]:
+        """
+        列表形式的查询参数，既可以重复出现，也可以用逗号分隔
+
+        返回:
+            值列表，不存在时返回 None
+        """
+        values = self.query.get(name)
+        if not values:
+            return None
+        return [item for value in values for item in value.split(",") if item]
+
+    def json(self) -> Dict:
+        """
+        解析 JSON 请求体
+
+        异常:
+            HTTPError: 请求体不是 JSON 对象
+        """
+        try:
+            data = json.loads(self.body.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, ValueError):
+            raise HTTPError(400, "请求体必须是 JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "请求体必须是 JSON 对象")
+        return data
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    """
+    从连接中读取一个请求
+
+    返回:
+        请求；连接在请求开始前关闭时返回 None
+
+    异常:
+        HTTPError: 请求格式错误或超过大小限制
+    """
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "请求行格式错误")
+        if version not in ("HTTP/1.0", "HTTP/1.1"):
+            raise HTTPError(505, "只支持 HTTP/1.0 和 HTTP/1.1")
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(400, "请求头过多")
+            name, sep, value = line.decode("latin-1").partition(":")
+            if not sep:
+                raise HTTPError(400, "请求头格式错误")
+            headers[name.strip().lower()] = value.strip()
+    except asyncio.LimitOverrunError:
+        raise HTTPError(400, "请求行或请求头过长")
+    except ValueError:
+        # StreamReader 在一行超过缓冲区上限时抛出 ValueError
+        raise HTTPError(400, "请求行或请求头过长")
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "请求体必须指定 Content-Length")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Content-Length 无效")
+    if length < 0:
+        raise HTTPError(400, "Content-Length 无效")
+    if length > MAX_BODY:
+        raise HTTPError(413, "请求体过大")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, version, headers, body)
+
+
+def encode_response(
+    status: int,
+    payload: object = None,
+    headers: Optional[Dict[str, str]] = None,
+    keep_alive: bool = True,
+) -> bytes:
+    """
+    编码 HTTP 响应
+
+    参数:
+        status: 状态码
+        payload: 响应体，编码为 JSON；204 和 304 响应没有响应体
+        headers: 额外的响应头
+        keep_alive: 响应后是否保持连接
+
+    返回:
+        完整的响应字节串
+    """
+    body = b""
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}"]
+    if status not in (204, 304):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        lines.append("Content-Type: application/json; charset=utf-8")
+        lines.append(f"Content-Length: {len(body)}")
+    for name, value in (headers or {}).items():
+        lines.append(f"{name}: {value}")
+    lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
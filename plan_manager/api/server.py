@@ -0,0 +1,424 @@
+"""
+HTTP/JSON 接口 - 让其他程序通过 HTTP 读写计划
+
+接口:
+    GET    /plans               列出计划，查询参数见 _list_plans
+    POST   /plans               添加计划
+    GET    /plans/{id}          获取计划
+    PATCH  /plans/{id}          更新计划
+    DELETE /plans/{id}          删除计划
+    POST   /plans/{id}/complete 标记计划为已完成
+    GET    /upcoming?days=7     即将到期的计划
+    GET    /stats?days=7        汇总统计
+
+读取请求在事件循环中直接用内存数据回答，可以同时处理大量连接。
+修改请求交给 AsyncPlanManager 唯一的写入任务：它把排队的修改依次应用到内存，
+再在线程池中保存一次，保存完成后才回复这一批请求。
+GET 响应带有以存储版本标识为值的 ETag，客户端带 If-None-Match
+轮询时数据未变就返回 304，不再查询和编码结果。
+"""
+
+import signal
+import asyncio
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple, cast
+
+from ..core.async_manager import MAX_BATCH, AsyncPlanManager, SaveError
+from ..core.manager import PlanManager
+from ..core.query import PlanFilter
+from ..models.plan import Priority
+from .protocol import HTTPError, Request, encode_response, read_request
+
+# 列表接口默认和最多返回的计划数
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+# 持久连接空闲多久后关闭（秒）
+IDLE_TIMEOUT = 60.0
+
+# 处理结果：(状态码, 响应体, 额外的响应头)
+Result = Tuple[int, object, Dict[str, str]]
+
+
+class PlanServer:
+    """在 asyncio 事件循环中提供 HTTP/JSON 接口的服务器"""
+
+    def __init__(
+        self,
+        manager: PlanManager,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_batch: int = MAX_BATCH,
+    ):
+        """
+        初始化服务器
+
+        参数:
+            manager: 计划管理器，应使用 write_behind=True 和 memory_queries=True
+                创建，见 AsyncPlanManager
+            host: 监听地址
+            port: 监听端口，0 表示由系统分配
+            max_batch: 一次最多合并保存的修改数
+        """
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.plans = AsyncPlanManager(manager, max_batch)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self) -> None:
+        """开始监听"""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        # 端口为 0 时记下系统实际分配的端口
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """开始监听并处理请求，直到任务被取消"""
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """停止接受连接，等待排队的修改保存完成后关闭所有连接"""
+        if self._server is not None:
+            self._server.close()
+        await self.plans.flush()
+        # 关闭空闲的持久连接，等待它们的处理任务读到连接结束后退出
+        for writer in self._connections.values():
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+        await self.plans.close()
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """按顺序处理一个连接上的请求"""
+        # 连接回调总是在 asyncio.start_server 创建的任务中运行
+        task = cast(asyncio.Task, asyncio.current_task())
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except HTTPError as e:
+                    writer.write(
+                        encode_response(
+                            e.status, {"error": e.message}, keep_alive=False
+                        )
+                    )
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                status, payload, headers = await self.dispatch(request)
+                writer.write(
+                    encode_response(status, payload, headers, request.keep_alive)
+                )
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def dispatch(self, request: Request) -> Result:
+        """
+        处理一个请求
+
+        参数:
+            request: 请求
+
+        返回:
+            (状态码, 响应体, 额外的响应头)
+        """
+        try:
+            if request.method == "GET":
+                return self._get(request)
+            return await self._modify(request)
+        except HTTPError as e:
+            return e.status, {"error": e.message}, e.headers
+        except ValueError as e:
+            return 400, {"error": str(e)}, {}
+        except SaveError as e:
+            return 500, {"error": str(e)}, {}
+        except Exception as e:
+            # 未预料的错误也要回复客户端，不能直接断开连接
+            traceback.print_exc()
+            return 500, {"error": f"服务器内部错误: {e}"}, {}
+
+    def _etag(self) -> Optional[str]:
+        """当前数据的 ETag，有尚未保存的修改时为 None"""
+        generation = self.manager.generation
+        return f'"{generation}"' if generation is not None else None
+
+    def _get(self, request: Request) -> Result:
+        """处理读取请求，数据未变时返回 304"""
+        etag = self._etag()
+        headers = {"ETag": etag} if etag else {}
+        if etag and etag_matches(request.headers.get("if-none-match"), etag):
+            return 304, None, headers
+
+        segments = split_path(request.path)
+        if segments == ["plans"]:
+            payload = self._list_plans(request)
+        elif len(segments) == 2 and segments[0] == "plans":
+            payload = self._find_plan(segments[1])
+        elif segments == ["upcoming"]:
+            days = int_param(request, "days", 7)
+            payload = {"plans": self.manager.get_upcoming_deadlines(days)}
+        elif segments == ["stats"]:
+            payload = self.manager.stats(days=int_param(request, "days", 7))
+        else:
+            raise not_found(request)
+        return 200, payload, headers
+
+    def _list_plans(self, request: Request) -> Dict:
+        """
+        列出计划
+
+        查询参数:
+            tags, all_tags, not_tags: 标签条件，逗号分隔或重复出现
+            priority: 优先级
+            completed: true 或 false
+            from, to: 截止日期范围 (YYYY-MM-DD)
+            text: 标题或描述中包含的文字
+            sort: added、deadline 或 id
+            limit: 最多返回的数量，默认 50，最多 1000
+            after: 上一页最后一个计划的ID
+
+        返回:
+            {"plans": [...], "next": 下一页的 after 参数，没有下一页时为 null}
+        """
+        completed = request.param("completed")
+        if completed not in (None, "true", "false"):
+            raise HTTPError(400, "completed 必须为 true 或 false")
+        sort = request.param("sort")
+        limit = int_param(request, "limit", DEFAULT_LIMIT)
+        if not 1 <= limit <= MAX_LIMIT:
+            raise HTTPError(400, f"limit 必须在 1 到 {MAX_LIMIT} 之间")
+
+        plan_filter = PlanFilter(
+            request.params("tags"),
+            request.param("priority"),
+            None if completed is None else completed == "true",
+            all_tags=request.params("all_tags"),
+            not_tags=request.params("not_tags"),
+            deadline_from=request.param("from"),
+            deadline_to=request.param("to"),
+            text=request.param("text"),
+            order_by=None if sort == "added" else sort,
+        )
+        plans = list(
+            self.manager.iter_plans(
+                plan_filter, limit=limit, after=request.param("after")
+            )
+        )
+        next_after = plans[-1]["id"] if len(plans) == limit else None
+        return {"plans": plans, "next": next_after}
+
+    def _find_plan(self, plan_id: str) -> Dict:
+        plan = self.manager.get_plan_by_id(plan_id)
+        if plan is None:
+            raise HTTPError(404, f"未找到ID为 {plan_id} 的计划")
+        return plan
+
+    async def _modify(self, request: Request) -> Result:
+        """处理修改请求，交给写入任务执行"""
+        segments = split_path(request.path)
+        manager = self.manager
+
+        if segments == ["plans"] and request.method == "POST":
+            data = request.json()
+            if not isinstance(data.get("title"), str):
+                raise HTTPError(400, "缺少标题 title")
+            check_fields(data)
+
+            def add() -> Dict:
+                plan_id = manager.add_plan(
+                    data["title"],
+                    data.get("description", ""),
+                    data.get("deadline"),
+                    data.get("priority", "medium"),
+                    data.get("tags"),
+                )
+                return self._find_plan(plan_id)
+
+            return 201, await self.plans.submit(add), {}
+
+        if len(segments) == 2 and segments[0] == "plans":
+            plan_id = segments[1]
+            if request.method == "PATCH":
+                fields = request.json()
+                unknown = set(fields) - UPDATABLE_FIELDS
+                if unknown:
+                    raise HTTPError(
+                        400, f"不能更新的字段: {', '.join(sorted(unknown))}"
+                    )
+                check_fields(fields)
+
+                def update() -> Optional[Dict]:
+                    if not manager.update_plan(plan_id, **fields):
+                        return None
+                    return manager.get_plan_by_id(plan_id)
+
+                return found(plan_id, await self.plans.submit(update))
+            if request.method == "DELETE":
+                if not await self.plans.submit(lambda: manager.delete_plan(plan_id)):
+                    raise HTTPError(404, f"未找到ID为 {plan_id} 的计划")
+                return 204, None, {}
+
+        if len(segments) == 3 and segments[0] == "plans" and segments[2] == "complete":
+            plan_id = segments[1]
+            if request.method == "POST":
+
+                def complete() -> Optional[Dict]:
+                    if not manager.complete_plan(plan_id):
+                        return None
+                    return manager.get_plan_by_id(plan_id)
+
+                return found(plan_id, await self.plans.submit(complete))
+
+        raise not_found(request)
+
+
+# PATCH 请求可以更新的字段
+UPDATABLE_FIELDS = {"title", "description", "deadline", "priority", "tags", "completed"}
+
+# 可以为 null 的文本字段
+TEXT_FIELDS = ("title", "description", "deadline")
+
+PRIORITIES = [priority.value for priority in Priority]
+
+
+def check_fields(data: Dict) -> None:
+    """
+    检查请求体中计划字段的类型，在交给管理器之前拒绝类型不对的值
+
+    参数:
+        data: 请求体
+
+    异常:
+        HTTPError: 有字段的类型不对时返回 400
+    """
+    for name in TEXT_FIELDS:
+        if name in data and not isinstance(data[name], (str, type(None))):
+            raise HTTPError(400, f"{name} 必须是字符串或 null")
+    if "tags" in data:
+        tags = data["tags"]
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            raise HTTPError(400, "tags 必须是字符串列表")
+    if "completed" in data and not isinstance(data["completed"], bool):
+        raise HTTPError(400, "completed 必须为 true 或 false")
+    if "priority" in data and data["priority"] not in PRIORITIES:
+        raise HTTPError(400, f"priority 必须是 {', '.join(PRIORITIES)} 之一")
+
+
+def split_path(path: str) -> List[str]:
+    """将请求路径切分为非空的段"""
+    return [segment for segment in path.split("/") if segment]
+
+
+def int_param(request: Request, name: str, default: int) -> int:
+    """读取整数查询参数"""
+    value = request.param(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} 必须是整数")
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 请求头是否匹配当前的 ETag，按弱比较忽略 W/ 前缀"""
+    for tag in (header or "").split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in ("*", etag):
+            return True
+    return False
+
+
+def found(plan_id: str, plan: Optional[Dict]) -> Result:
+    """修改后的计划，计划不存在时返回 404"""
+    if plan is None:
+        raise HTTPError(404, f"未找到ID为 {plan_id} 的计划")
+    return 200, plan, {}
+
+
+# 各个路径支持的请求方法，路径中的计划ID记为 *
+ROUTES = {
+    ("plans",): "GET, POST",
+    ("plans", "*"): "GET, PATCH, DELETE",
+    ("plans", "*", "complete"): "POST",
+    ("upcoming",): "GET",
+    ("stats",): "GET",
+}
+
+
+def not_found(request: Request) -> HTTPError:
+    """路径不存在时返回 404，路径存在但不支持该方法时返回 405"""
+    segments = split_path(request.path)
+    route = tuple("*" if i == 1 else part for i, part in enumerate(segments))
+    if route in ROUTES:
+        return HTTPError(
+            405, f"{request.path} 不支持 {request.method}", {"Allow": ROUTES[route]}
+        )
+    return HTTPError(404, f"路径不存在: {request.path}")
+
+
+def run_server(
+    manager: PlanManager,
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    started: Optional[Callable[[PlanServer], None]] = None,
+) -> None:
+    """
+    运行服务器直到按 Ctrl+C 或收到 SIGTERM，退出前保存全部修改
+
+    参数:
+        manager: 计划管理器，应使用 write_behind=True 和 memory_queries=True 创建
+        host: 监听地址
+        port: 监听端口
+        started: 开始监听后调用的函数
+
+    异常:
+        OSError: 无法监听指定的地址和端口
+    """
+    server = PlanServer(manager, host, port)
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(server.start())
+        if started is not None:
+            started(server)
+
+        stop = loop.create_future()
+
+        def request_stop() -> None:
+            if not stop.done():
+                stop.set_result(None)
+
+        try:
+            loop.add_signal_handler(signal.SIGTERM, request_stop)
+        except (NotImplementedError, AttributeError):
+            # Windows 的事件循环不支持信号处理
+            pass
+        try:
+            loop.run_until_complete(stop)
+        except KeyboardInterrupt:
+            pass
+        loop.run_until_complete(server.close())
+    finally:
+        loop.close()
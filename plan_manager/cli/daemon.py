@@ -0,0 +1,217 @@
+"""
+守护进程 - 常驻内存执行命令行请求
+
+计划、索引和缓存一直保留在内存中，请求通过 Unix 套接字到达后直接执行，
+不必为每条命令启动解释器、导入模块和加载计划。每个连接由单独的线程处理，
+计划管理器以线程安全模式运行：查询可以同时进行，修改由写锁串行化。
+协议见 plan_manager.client。
+"""
+
+import io
+import os
+import sys
+import socket
+import signal
+import threading
+import traceback
+import socketserver
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from ..client import decode, encode
+
+# 单个连接读写请求的超时（秒），避免异常的客户端阻塞其他请求
+REQUEST_TIMEOUT = 10.0
+
+# 执行一条请求的函数：(命令行参数, 客户端的工作目录) -> 响应消息
+Execute = Callable[[List[str], Optional[str]], Dict]
+
+
+class ThreadOutput(io.TextIOBase):
+    """按线程分流的文本输出流，正在收集输出的线程写入自己的缓冲区"""
+
+    def __init__(self, stream: TextIO) -> None:
+        """
+        初始化输出流
+
+        参数:
+            stream: 没有收集输出的线程写入的原输出流
+        """
+        self.stream = stream
+        self._local = threading.local()
+
+    def _target(self) -> TextIO:
+        """返回当前线程应当写入的流"""
+        buffer = getattr(self._local, "buffer", None)
+        return self.stream if buffer is None else buffer
+
+    def writable(self) -> bool:
+        """输出流总是可写"""
+        return True
+
+    def write(self, text: str) -> int:
+        """写入当前线程的缓冲区或原输出流"""
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        """刷新当前线程写入的流"""
+        self._target().flush()
+
+    @contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        """在上下文中把当前线程的输出收集到返回的缓冲区"""
+        buffer = io.StringIO()
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+
+_install_lock = threading.Lock()
+
+
+def _thread_output(name: str) -> ThreadOutput:
+    """把 sys.stdout 或 sys.stderr 替换为按线程分流的输出流，只替换一次"""
+    with _install_lock:
+        stream = getattr(sys, name)
+        if not isinstance(stream, ThreadOutput):
+            stream = ThreadOutput(stream)
+            setattr(sys, name, stream)
+        return stream
+
+
+@contextmanager
+def captured_output() -> Iterator[Tuple[io.StringIO, io.StringIO]]:
+    """
+    收集当前线程写到标准输出和标准错误的内容
+
+    contextlib.redirect_stdout 替换的是整个进程的 sys.stdout，
+    多个请求线程同时执行时输出会互相混入，因此按线程分流
+
+    返回:
+        (标准输出缓冲区, 标准错误缓冲区)
+    """
+    stdout, stderr = _thread_output("stdout"), _thread_output("stderr")
+    with stdout.capture() as out, stderr.capture() as err:
+        yield out, err
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """读取一行请求，执行后写回一行响应"""
+
+    timeout = REQUEST_TIMEOUT
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        """处理一个连接上的请求"""
+        line = self.rfile.readline()
+        if not line:
+            # 只是探测守护进程是否在运行的连接
+            return
+        try:
+            request = decode(line)
+            argv = request["argv"]
+            if not isinstance(argv, list) or not all(
+                isinstance(arg, str) for arg in argv
+            ):
+                raise TypeError("argv 必须是字符串列表")
+            cwd = request.get("cwd")
+            if cwd is not None and not isinstance(cwd, str):
+                raise TypeError("cwd 必须是字符串")
+        except (ValueError, KeyError, TypeError) as e:
+            response = {"status": 2, "stdout": "", "stderr": f"无效的请求: {e}\n"}
+        else:
+            try:
+                response = self.server.execute(argv, cwd)
+            except Exception:
+                # 单个请求出错不影响守护进程继续服务
+                response = {"status": 1, "stdout": "", "stderr": traceback.format_exc()}
+        try:
+            self.wfile.write(encode(response))
+        except OSError:
+            # 客户端已经断开，命令照常生效
+            pass
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """每个连接一个线程的 Unix 套接字服务器，请求交给 execute 执行"""
+
+    # 停止时不等待仍在处理的连接
+    daemon_threads = True
+
+    def __init__(self, path: str, execute: Execute) -> None:
+        """
+        初始化服务器
+
+        参数:
+            path: 套接字文件路径
+            execute: 执行一条请求的函数
+        """
+        self.execute = execute
+        super().__init__(path, _RequestHandler)
+
+
+class PlanDaemon:
+    """在 Unix 套接字上执行命令行请求的守护进程，每个连接一个线程"""
+
+    def __init__(self, path: str, execute: Execute) -> None:
+        """
+        初始化守护进程
+
+        参数:
+            path: 套接字文件路径
+            execute: 执行一条请求并返回响应消息的函数，参数为命令行参数和
+                客户端的工作目录（旧版本客户端不提供时为 None）；
+                会被多个线程同时调用，输出请用 captured_output 收集
+
+        异常:
+            RuntimeError: 当前平台不支持 Unix 套接字，或已有守护进程在运行
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise RuntimeError("当前平台不支持 Unix 套接字")
+        self.path = path
+        self._remove_stale_socket()
+        # 套接字只允许当前用户连接
+        umask = os.umask(0o177)
+        try:
+            self.server = _UnixServer(path, execute)
+        finally:
+            os.umask(umask)
+
+    def _remove_stale_socket(self) -> None:
+        """删除上次异常退出留下的套接字文件，已有守护进程在运行时报错"""
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+        else:
+            raise RuntimeError(f"守护进程已在运行: {self.path}")
+        finally:
+            probe.close()
+
+    def serve_forever(self) -> None:
+        """处理请求直到收到 SIGINT 或 SIGTERM，退出时删除套接字文件"""
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        previous = signal.signal(signal.SIGTERM, stop)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+            self.close()
+
+    def close(self) -> None:
+        """关闭套接字并删除套接字文件"""
+        self.server.server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -2,16 +2,52 @@
 命令行入口 - 处理命令行参数和交互
 """
 
+import os
+import gc
+import json
 import argparse
-from typing import List, Optional
+import functools
+import traceback
+from itertools import islice
+from typing import Dict, List, Optional
 
-from ..core.manager import PlanManager
-from ..utils.formatters import format_plan_for_display
+from ..api import PlanServer, run_server
+from ..client import socket_path
+from ..core.manager import PlanManager, AmbiguousPlanIdError
+from ..core.query import PlanFilter
+from ..core.storage import DEFAULT_PATHS, create_storage, migrate_storage
+from ..utils.formatters import format_plan_for_display, format_stats
+from .daemon import PlanDaemon, captured_output
 
+# 修改计划的命令，守护进程在返回响应前保存它们的修改
+MUTATING_COMMANDS = ("add", "update", "delete", "complete", "compact")
 
-def parse_args():
-    """解析命令行参数"""
+
+@functools.lru_cache(maxsize=None)
+def create_parser() -> argparse.ArgumentParser:
+    """创建命令行参数解析器，守护进程处理每个请求时复用同一个"""
     parser = argparse.ArgumentParser(description="计划管理工具")
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help="日志模式：每次变更只追加到日志文件，不重写整个存储文件",
+    )
+    parser.add_argument(
+        "--backend",
+        default="json",
+        choices=["json", "sqlite"],
+        help="存储后端 (json 使用 plans.json，sqlite 使用 plans.db)",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="在内存中按列保存计划，适合计划数量很大的情况 (json 后端)",
+    )
+    parser.add_argument(
+        "--time-ids",
+        action="store_true",
+        help="新计划使用按创建时间排序的ID，ID顺序即创建顺序",
+    )
     subparsers = parser.add_subparsers(dest="command", help="子命令")
 
     # 添加计划
@@ -30,7 +66,11 @@ def parse_args():
 
     # 列出计划
     list_parser = subparsers.add_parser("list", help="列出计划")
-    list_parser.add_argument("--tags", "-t", nargs="+", help="按标签筛选")
+    list_parser.add_argument(
+        "--tags", "-t", nargs="+", help="按标签筛选，带有任一标签即可"
+    )
+    list_parser.add_argument("--all-tags", nargs="+", help="必须带有全部这些标签")
+    list_parser.add_argument("--not-tags", nargs="+", help="排除带有这些标签的计划")
     list_parser.add_argument(
         "--priority", "-p", choices=["low", "medium", "high"], help="按优先级筛选"
     )
@@ -40,10 +80,32 @@ def parse_args():
     list_parser.add_argument(
         "--uncompleted", "-u", action="store_true", help="只显示未完成的计划"
     )
+    list_parser.add_argument(
+        "--from", dest="deadline_from", help="截止日期不早于该日期 (YYYY-MM-DD)"
+    )
+    list_parser.add_argument(
+        "--to", dest="deadline_to", help="截止日期不晚于该日期 (YYYY-MM-DD)"
+    )
+    list_parser.add_argument(
+        "--sort",
+        choices=["added", "deadline", "id"],
+        help="排序方式 (默认按添加顺序；指定日期范围时按截止日期；"
+        "id 按ID，使用按时间排序的ID时即创建顺序)",
+    )
+    list_parser.add_argument("--text", help="标题或描述中包含的文字")
+    list_parser.add_argument(
+        "--explain", action="store_true", help="只显示查询的执行计划，不列出计划"
+    )
+    list_parser.add_argument(
+        "--limit", "-n", type=int, help="最多显示的数量 (指定 --page 时默认 50)"
+    )
+    page_group = list_parser.add_mutually_exclusive_group()
+    page_group.add_argument("--after", help="从该ID的计划之后开始（上一页最后一个ID）")
+    page_group.add_argument("--page", type=int, help="显示第几页，从 1 开始")
 
     # 更新计划
     update_parser = subparsers.add_parser("update", help="更新计划")
-    update_parser.add_argument("id", help="计划ID")
+    update_parser.add_argument("id", help="计划ID或唯一的ID前缀")
     update_parser.add_argument("--title", help="更新标题")
     update_parser.add_argument("--description", help="更新描述")
     update_parser.add_argument("--deadline", "-d", help="更新截止日期 (YYYY-MM-DD)")
@@ -54,17 +116,86 @@ def parse_args():
 
     # 删除计划
     delete_parser = subparsers.add_parser("delete", help="删除计划")
-    delete_parser.add_argument("id", help="计划ID")
+    delete_parser.add_argument("id", help="计划ID或唯一的ID前缀")
 
     # 完成计划
     complete_parser = subparsers.add_parser("complete", help="标记计划为已完成")
-    complete_parser.add_argument("id", help="计划ID")
+    complete_parser.add_argument("id", help="计划ID或唯一的ID前缀")
 
     # 即将到期
     upcoming_parser = subparsers.add_parser("upcoming", help="查看即将到期的计划")
     upcoming_parser.add_argument("--days", "-d", type=int, default=7, help="未来天数")
 
-    return parser.parse_args()
+    # 已过期
+    subparsers.add_parser("overdue", help="查看已过期且未完成的计划")
+
+    # 最近创建
+    recent_parser = subparsers.add_parser("recent", help="按ID顺序查看最近创建的计划")
+    recent_parser.add_argument(
+        "--since", help="创建时间不早于 (YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS)"
+    )
+    recent_parser.add_argument("--after", help="上一页最后一个计划的ID")
+    recent_parser.add_argument(
+        "--limit", "-n", type=int, default=20, help="每页数量 (默认 20)"
+    )
+
+    # 最紧急的计划
+    next_parser = subparsers.add_parser("next", help="按紧急程度查看接下来要做的计划")
+    next_parser.add_argument(
+        "--count", "-n", type=int, default=10, help="显示数量 (默认 10)"
+    )
+
+    # 全文搜索
+    search_parser = subparsers.add_parser("search", help="在标题和描述中搜索计划")
+    search_parser.add_argument("query", help="搜索内容")
+    search_parser.add_argument(
+        "--limit", "-n", type=int, default=20, help="最多显示的数量 (默认 20)"
+    )
+
+    # 汇总统计
+    stats_parser = subparsers.add_parser("stats", help="查看计划的汇总统计")
+    stats_parser.add_argument(
+        "--json", action="store_true", help="以 JSON 格式输出，便于其他程序读取"
+    )
+
+    # 压缩日志
+    subparsers.add_parser("compact", help="将操作日志压缩为新的存储快照")
+
+    # 迁移存储
+    migrate_parser = subparsers.add_parser("migrate", help="将计划迁移到SQLite数据库")
+    migrate_parser.add_argument(
+        "--source", default="plans.json", help="源JSON文件 (默认 plans.json)"
+    )
+    migrate_parser.add_argument(
+        "--target", default="plans.db", help="目标SQLite数据库 (默认 plans.db)"
+    )
+
+    # HTTP 接口
+    api_parser = subparsers.add_parser("api", help="启动 HTTP/JSON 接口服务")
+    api_parser.add_argument(
+        "--host", default="127.0.0.1", help="监听地址 (默认 127.0.0.1)"
+    )
+    api_parser.add_argument(
+        "--port", type=int, default=8080, help="监听端口 (默认 8080)"
+    )
+
+    # 守护进程
+    subparsers.add_parser(
+        "serve",
+        help="启动守护进程，常驻内存并通过 Unix 套接字执行其他命令",
+    )
+
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    解析命令行参数
+
+    参数:
+        argv: 命令行参数，不含程序名，默认使用 sys.argv
+    """
+    return create_parser().parse_args(argv)
 
 
 def add_plan(
@@ -74,28 +205,114 @@ def add_plan(
     deadline: Optional[str],
     priority: str,
     tags: List[str],
+    time_ordered: Optional[bool] = None,
 ) -> None:
     """添加计划处理函数"""
     try:
-        plan_id = manager.add_plan(title, description, deadline, priority, tags)
+        plan_id = manager.add_plan(
+            title, description, deadline, priority, tags, time_ordered=time_ordered
+        )
         print(f"计划已添加，ID: {plan_id}")
     except ValueError as e:
         print(f"错误: {e}")
 
 
 def list_plans(
-    manager: PlanManager, tags: List[str], priority: str, completed: Optional[bool]
+    manager: PlanManager,
+    tags: List[str],
+    priority: str,
+    completed: Optional[bool],
+    all_tags: Optional[List[str]] = None,
+    not_tags: Optional[List[str]] = None,
+    deadline_from: Optional[str] = None,
+    deadline_to: Optional[str] = None,
+    sort: Optional[str] = None,
+    text: Optional[str] = None,
+    explain: bool = False,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    page: Optional[int] = None,
 ) -> None:
-    """列出计划处理函数"""
-    plans = manager.get_plans(tags, priority, completed)
-    if not plans:
+    """列出计划处理函数，边查询边输出"""
+    if sort is None and (deadline_from or deadline_to):
+        sort = "deadline"
+    if page is not None:
+        if page < 1:
+            print("错误: 页码必须从 1 开始")
+            return
+        limit = limit or 50
+    if limit is not None and limit < 1:
+        print("错误: 显示数量必须大于 0")
+        return
+    try:
+        plan_filter = PlanFilter(
+            tags,
+            priority,
+            completed,
+            all_tags=all_tags,
+            not_tags=not_tags,
+            deadline_from=deadline_from,
+            deadline_to=deadline_to,
+            text=text,
+            order_by=None if sort == "added" else sort,
+        )
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    if explain:
+        print(manager.explain(plan_filter, limit))
+        return
+
+    try:
+        # 指定页码时 limit 已有默认值
+        if page is None or limit is None:
+            plans = manager.iter_plans(plan_filter, limit=limit, after=after)
+        else:
+            # 页码按偏移跳过前面的结果；大量翻页时使用 --after 更快
+            offset = (page - 1) * limit
+            plans = islice(
+                manager.iter_plans(plan_filter, limit=offset + limit), offset, None
+            )
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    count = 0
+    last_id = None
+    for plan in plans:
+        if count:
+            print("-" * 40)
+        print(format_plan_for_display(plan))
+        count += 1
+        last_id = plan["id"]
+
+    if not count:
         print("没有找到符合条件的计划")
+    elif limit is None:
+        print(f"共 {count} 个计划")
     else:
-        for i, plan in enumerate(plans):
-            print(format_plan_for_display(plan))
-            if i < len(plans) - 1:
-                print("-" * 40)
-        print(f"共 {len(plans)} 个计划")
+        print(f"本页 {count} 个计划")
+        if count == limit and page is not None:
+            print(f"下一页: --page {page + 1}")
+        elif count == limit:
+            print(f"下一页: --after {last_id}")
+
+
+def resolve_id(manager: PlanManager, plan_id: str) -> Optional[str]:
+    """将计划ID或ID前缀解析为完整ID，失败时输出原因"""
+    try:
+        full_id = manager.resolve_plan_id(plan_id)
+    except AmbiguousPlanIdError as e:
+        print(f"错误: ID前缀 {plan_id} 不唯一，匹配到以下计划:")
+        for candidate in e.candidates:
+            plan = manager.get_plan_by_id(candidate)
+            print(f"  {candidate}  {plan['title'] if plan else ''}")
+        return None
+
+    if full_id is None:
+        print(f"未找到ID为 {plan_id} 的计划")
+    return full_id
 
 
 def update_plan(manager: PlanManager, plan_id: str, **kwargs) -> None:
@@ -103,7 +320,11 @@ def update_plan(manager: PlanManager, plan_id: str, **kwargs) -> None:
     try:
         if not kwargs:
             print("错误: 至少需要指定一个要更新的字段")
-        elif manager.update_plan(plan_id, **kwargs):
+            return
+        full_id = resolve_id(manager, plan_id)
+        if full_id is None:
+            return
+        if manager.update_plan(full_id, **kwargs):
             print("计划已更新")
         else:
             print(f"未找到ID为 {plan_id} 的计划")
@@ -113,7 +334,10 @@ def update_plan(manager: PlanManager, plan_id: str, **kwargs) -> None:
 
 def delete_plan(manager: PlanManager, plan_id: str) -> None:
     """删除计划处理函数"""
-    if manager.delete_plan(plan_id):
+    full_id = resolve_id(manager, plan_id)
+    if full_id is None:
+        return
+    if manager.delete_plan(full_id):
         print("计划已删除")
     else:
         print(f"未找到ID为 {plan_id} 的计划")
@@ -121,7 +345,10 @@ def delete_plan(manager: PlanManager, plan_id: str) -> None:
 
 def complete_plan(manager: PlanManager, plan_id: str) -> None:
     """完成计划处理函数"""
-    if manager.complete_plan(plan_id):
+    full_id = resolve_id(manager, plan_id)
+    if full_id is None:
+        return
+    if manager.complete_plan(full_id):
         print("计划已标记为完成")
     else:
         print(f"未找到ID为 {plan_id} 的计划")
@@ -140,11 +367,118 @@ def show_upcoming(manager: PlanManager, days: int) -> None:
         print(f"共 {len(plans)} 个即将到期的计划")
 
 
-def main():
-    """命令行主函数"""
-    args = parse_args()
-    manager = PlanManager()
+def show_overdue(manager: PlanManager) -> None:
+    """显示已过期计划处理函数"""
+    plans = manager.get_overdue_plans()
+    if not plans:
+        print("没有已过期的计划")
+    else:
+        for i, plan in enumerate(plans):
+            print(format_plan_for_display(plan))
+            if i < len(plans) - 1:
+                print("-" * 40)
+        print(f"共 {len(plans)} 个已过期的计划")
+
+
+def show_recent(
+    manager: PlanManager, since: Optional[str], after: Optional[str], limit: int
+) -> None:
+    """按ID顺序分页显示最近创建的计划处理函数"""
+    try:
+        plans = manager.get_plans_created_since(since, after, limit)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    if not plans:
+        print("没有找到符合条件的计划")
+        return
+    for i, plan in enumerate(plans):
+        print(format_plan_for_display(plan))
+        if i < len(plans) - 1:
+            print("-" * 40)
+    print(f"本页 {len(plans)} 个计划")
+    if len(plans) == limit:
+        print(f"下一页: --after {plans[-1]['id']}")
+
+
+def show_next(manager: PlanManager, count: int) -> None:
+    """按紧急程度显示最紧急的未完成计划处理函数"""
+    ranked = manager.top_urgent(count)
+    if not ranked:
+        print("没有未完成的计划")
+        return
+    for i, (plan, score) in enumerate(ranked):
+        print(f"#{i + 1}  紧急程度: {score:.2f}")
+        print(format_plan_for_display(plan))
+        if i < len(ranked) - 1:
+            print("-" * 40)
+    print(f"共 {len(ranked)} 个计划")
+
+
+def search_plans(manager: PlanManager, query: str, limit: int) -> None:
+    """全文搜索计划处理函数"""
+    results = manager.search(query, limit)
+    if not results:
+        print("没有找到匹配的计划")
+        return
+    for i, (plan, score) in enumerate(results):
+        print(f"#{i + 1}  相关度: {score:.2f}")
+        print(format_plan_for_display(plan))
+        if i < len(results) - 1:
+            print("-" * 40)
+    print(f"共 {len(results)} 个匹配的计划")
+
+
+def show_stats(manager: PlanManager, as_json: bool) -> None:
+    """显示汇总统计处理函数"""
+    stats = manager.stats()
+    if as_json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    else:
+        print(format_stats(stats))
+
+
+def compact_store(manager: PlanManager) -> None:
+    """压缩日志处理函数"""
+    stats = manager.compact()
+    print(f"压缩完成：合并了 {stats['records']} 条日志记录（{stats['bytes']} 字节）")
+
+
+def migrate_store(source: str, target: str) -> None:
+    """迁移存储处理函数"""
+    count = migrate_storage(
+        create_storage("json", source), create_storage("sqlite", target)
+    )
+    print(f"已将 {count} 个计划从 {source} 迁移到 {target}")
+    print("之后请使用 --backend sqlite 访问迁移后的数据")
+
+
+def create_manager(
+    args: argparse.Namespace, write_behind: bool = False, thread_safe: bool = False
+) -> PlanManager:
+    """按全局选项创建计划管理器"""
+    return PlanManager(
+        storage=create_storage(args.backend, journal=args.journal),
+        columnar=args.columnar,
+        time_ordered_ids=args.time_ids,
+        # 保存建立好的索引，供下次启动的进程直接读取
+        persist_indexes=True,
+        write_behind=write_behind,
+        # 常驻进程的计划已经全部在内存中，查询不再访问存储
+        memory_queries=write_behind,
+        thread_safe=thread_safe,
+    )
+
+
+def run_command(manager: PlanManager, args: argparse.Namespace) -> None:
+    """
+    用计划管理器执行解析后的命令
 
+    参数:
+        manager: 计划管理器
+        args: parse_args 的结果
+    """
     if args.command == "add":
         add_plan(
             manager,
@@ -153,6 +487,7 @@ def main():
             args.deadline,
             args.priority,
             args.tags,
+            time_ordered=args.time_ids,
         )
     elif args.command == "list":
         completed = None
@@ -160,7 +495,22 @@ def main():
             completed = True
         elif args.uncompleted:
             completed = False
-        list_plans(manager, args.tags, args.priority, completed)
+        list_plans(
+            manager,
+            args.tags,
+            args.priority,
+            completed,
+            all_tags=args.all_tags,
+            not_tags=args.not_tags,
+            deadline_from=args.deadline_from,
+            deadline_to=args.deadline_to,
+            sort=args.sort,
+            text=args.text,
+            explain=args.explain,
+            limit=args.limit,
+            after=args.after,
+            page=args.page,
+        )
     elif args.command == "update":
         kwargs = {}
         if args.title:
@@ -180,11 +530,154 @@ def main():
         complete_plan(manager, args.id)
     elif args.command == "upcoming":
         show_upcoming(manager, args.days)
+    elif args.command == "overdue":
+        show_overdue(manager)
+    elif args.command == "recent":
+        show_recent(manager, args.since, args.after, args.limit)
+    elif args.command == "next":
+        show_next(manager, args.count)
+    elif args.command == "search":
+        search_plans(manager, args.query, args.limit)
+    elif args.command == "stats":
+        show_stats(manager, args.json)
+    elif args.command == "compact":
+        compact_store(manager)
     else:
         # 如果没有指定命令，显示帮助
         parser = argparse.ArgumentParser(description="计划管理工具")
         parser.print_help()
 
 
+def same_store(
+    manager: PlanManager,
+    args: argparse.Namespace,
+    request: argparse.Namespace,
+    cwd: Optional[str],
+) -> bool:
+    """
+    判断转发来的命令是否访问守护进程的存储，并且存储选项与守护进程一致
+
+    参数:
+        manager: 守护进程的计划管理器
+        args: 守护进程启动时的全局选项
+        request: 转发来的命令的解析结果
+        cwd: 客户端的工作目录，存储文件相对于它解析；未提供时视为不一致
+    """
+    if cwd is None:
+        return False
+    options = ("backend", "journal", "columnar")
+    if any(getattr(request, name) != getattr(args, name) for name in options):
+        return False
+    path = os.path.join(cwd, DEFAULT_PATHS[request.backend])
+    return os.path.realpath(path) == os.path.realpath(manager.storage_path)
+
+
+def execute_request(
+    manager: PlanManager,
+    args: argparse.Namespace,
+    argv: List[str],
+    cwd: Optional[str] = None,
+) -> Dict:
+    """
+    在守护进程中执行转发来的命令行参数，可以被多个线程同时调用
+
+    修改计划的命令在返回响应前保存修改，确认执行的修改不会因守护进程
+    异常退出而丢失；查询直接使用内存中的数据
+
+    参数:
+        manager: 守护进程的计划管理器（线程安全模式）
+        args: 守护进程启动时的全局选项
+        argv: 转发来的命令行参数
+        cwd: 客户端的工作目录
+
+    返回:
+        响应消息，见 plan_manager.client；命令访问另一个存储或存储选项与
+        守护进程不一致时 status 为 None，由客户端直接访问存储
+    """
+    status = 0
+    with captured_output() as (stdout, stderr):
+        try:
+            request = parse_args(argv)
+            if request.command in ("serve", "api", "migrate"):
+                return {"status": None}
+            if not same_store(manager, args, request, cwd):
+                return {"status": None}
+            run_command(manager, request)
+            if request.command in MUTATING_COMMANDS:
+                manager.flush()
+        except SystemExit as e:
+            # 参数错误和 --help 由 argparse 以 SystemExit 结束
+            status = e.code if isinstance(e.code, int) else int(bool(e.code))
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return {"status": status, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+
+def serve(args: argparse.Namespace) -> None:
+    """
+    守护进程处理函数
+
+    计划管理器常驻内存，修改在返回响应前保存。其他命令行进程把参数
+    转发过来，在这里由每个连接的线程用同一个管理器执行，输出原样返回
+    """
+    manager = create_manager(args, write_behind=True, thread_safe=True)
+    # 常驻的计划数据不会成为循环垃圾，移出垃圾回收的跟踪范围，
+    # 避免处理请求时触发的完整回收每次都遍历全部计划
+    gc.freeze()
+
+    def execute(argv: List[str], cwd: Optional[str]) -> Dict:
+        return execute_request(manager, args, argv, cwd)
+
+    path = socket_path()
+    try:
+        daemon = PlanDaemon(path, execute)
+    except (RuntimeError, OSError) as e:
+        manager.close()
+        print(f"错误: {e}")
+        return
+    print(f"守护进程已启动，监听 {path}，按 Ctrl+C 停止")
+    try:
+        daemon.serve_forever()
+    finally:
+        manager.close()
+    print("守护进程已停止")
+
+
+def serve_api(args: argparse.Namespace, host: str, port: int) -> None:
+    """HTTP 接口处理函数，修改由接口服务的写入任务合并保存"""
+    manager = create_manager(args, write_behind=True)
+    # 与守护进程相同，常驻的计划数据移出垃圾回收的跟踪范围
+    gc.freeze()
+
+    def started(server: PlanServer) -> None:
+        print(f"HTTP 接口已启动: http://{host}:{server.port}/，按 Ctrl+C 停止")
+
+    try:
+        run_server(manager, host, port, started)
+    except OSError as e:
+        manager.close()
+        print(f"错误: 无法监听 {host}:{port}: {e}")
+        return
+    print("HTTP 接口已停止")
+
+
+def main():
+    """命令行主函数"""
+    args = parse_args()
+    if args.command == "migrate":
+        migrate_store(args.source, args.target)
+        return
+    if args.command == "serve":
+        serve(args)
+        return
+    if args.command == "api":
+        serve_api(args, args.host, args.port)
+        return
+
+    # 守护进程在运行时，入口 plan_manager.main 已经把命令转发给它
+    run_command(create_manager(args), args)
+
+
 if __name__ == "__main__":
     main()
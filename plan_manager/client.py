@@ -0,0 +1,91 @@
+"""
+守护进程客户端 - 把命令行参数转发给正在运行的 plan-manager serve
+
+只依赖标准库，不导入计划管理器本身，转发时省去导入模块和加载计划的时间。
+
+协议：每个连接处理一个请求。客户端发送一行 JSON {"argv": [...], "cwd": ...}，
+cwd 是客户端的工作目录，守护进程据此解析命令要访问的存储文件；
+守护进程执行后返回一行 JSON {"status": 退出码, "stdout": ..., "stderr": ...}；
+status 为 null 表示守护进程不处理该命令（例如访问的是另一个存储，
+或全局选项与守护进程不一致），客户端应直接访问存储。
+"""
+
+import os
+import sys
+import json
+import socket
+from typing import Dict, List, Optional
+
+# 默认的套接字文件，位于当前目录，与默认的存储文件对应
+DEFAULT_SOCKET = ".plan-manager.sock"
+
+# 连接守护进程的超时（秒），连接成功后等待命令执行完成
+CONNECT_TIMEOUT = 1.0
+
+
+def socket_path() -> str:
+    """守护进程的套接字路径，可以用环境变量 PLAN_MANAGER_SOCKET 指定"""
+    return os.environ.get("PLAN_MANAGER_SOCKET") or DEFAULT_SOCKET
+
+
+def encode(message: Dict) -> bytes:
+    """将消息编码为一行 JSON"""
+    return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def decode(line: bytes) -> Dict:
+    """
+    解码一行 JSON 消息
+
+    异常:
+        ValueError: 不是 JSON 对象
+    """
+    message = json.loads(line.decode("utf-8"))
+    if not isinstance(message, dict):
+        raise ValueError("消息必须是 JSON 对象")
+    return message
+
+
+def forward(argv: List[str], path: Optional[str] = None) -> Optional[int]:
+    """
+    把命令行参数交给守护进程执行，并输出执行结果
+
+    参数:
+        argv: 命令行参数，不含程序名
+        path: 套接字路径，默认为 socket_path()
+
+    返回:
+        命令的退出码；守护进程没有运行或不处理该命令时返回 None，
+        由调用方直接访问存储
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CONNECT_TIMEOUT)
+        try:
+            client.connect(path or socket_path())
+        except OSError:
+            return None
+        client.settimeout(None)
+
+        # 请求发出后命令可能已经执行，失败时不能再直接访问存储重复执行
+        try:
+            client.sendall(encode({"argv": argv, "cwd": os.getcwd()}))
+            with client.makefile("rb") as reader:
+                response = decode(reader.readline())
+        except (OSError, ValueError) as e:
+            print(f"错误: 与守护进程通信失败: {e}", file=sys.stderr)
+            return 1
+    finally:
+        client.close()
+
+    status = response.get("status")
+    if status is None:
+        return None
+    if not isinstance(status, int):
+        print("错误: 守护进程返回了无效的响应", file=sys.stderr)
+        return 1
+    sys.stdout.write(response.get("stdout", ""))
+    sys.stderr.write(response.get("stderr", ""))
+    return status
@@ -2,6 +2,21 @@
 核心功能模块 - 包含计划管理的主要功能
 """
 
-from .manager import PlanManager
+from .manager import PlanManager, AmbiguousPlanIdError
+from .async_manager import AsyncPlanManager, SaveError
+from .query import PlanFilter
+from .storage import StorageBackend, JSONStorage, SQLiteStorage, StaleStoreError
+from .urgency import UrgencyScore
 
-__all__ = ["PlanManager"]
+__all__ = [
+    "PlanManager",
+    "AmbiguousPlanIdError",
+    "AsyncPlanManager",
+    "SaveError",
+    "PlanFilter",
+    "StorageBackend",
+    "JSONStorage",
+    "SQLiteStorage",
+    "StaleStoreError",
+    "UrgencyScore",
+]
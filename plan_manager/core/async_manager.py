@@ -0,0 +1,337 @@
+"""
+异步计划管理器 - 在 asyncio 事件循环中使用计划管理器而不阻塞
+
+读取直接使用内存中的数据，在事件循环线程中立即完成，不读写存储。
+修改交给唯一的写入任务：它按到达顺序把排队的修改应用到内存，
+再在线程池中保存一次，保存完成后这一批调用才返回。每个调用都在
+发起与返回之间的某一时刻生效，生效顺序就是到达顺序，
+因此并发的调用看到的结果是可线性化的。
+"""
+
+import asyncio
+import datetime
+import functools
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from .manager import PlanManager
+from .query import PlanFilter
+
+# 写入任务一次最多合并保存的修改数
+MAX_BATCH = 256
+
+ResultT = TypeVar("ResultT")
+
+
+class SaveError(RuntimeError):
+    """修改已经生效，但保存失败；修改留在内存中，随下一次保存重试"""
+
+
+class AsyncPlanManager:
+    """
+    计划管理器的 asyncio 接口
+
+    用法:
+        async with await AsyncPlanManager.open("plans.json") as plans:
+            plan_id = await plans.add_plan("写周报", "")
+            upcoming = await plans.get_upcoming_deadlines(7)
+    """
+
+    def __init__(
+        self,
+        manager: PlanManager,
+        max_batch: int = MAX_BATCH,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        包装已有的计划管理器
+
+        参数:
+            manager: 计划管理器，应使用 write_behind=True 和 memory_queries=True
+                创建，由写入任务决定何时保存，查询只使用内存数据；
+                否则修改和查询会在事件循环中读写存储
+            max_batch: 一次最多合并保存的修改数
+            executor: 执行保存的线程池，None 表示事件循环的默认线程池
+        """
+        self.manager = manager
+        self.max_batch = max_batch
+        self._executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @classmethod
+    async def open(
+        cls,
+        storage_path: str = "plans.json",
+        max_batch: int = MAX_BATCH,
+        executor: Optional[Executor] = None,
+        **kwargs,
+    ) -> "AsyncPlanManager":
+        """
+        在线程池中创建并加载计划管理器
+
+        参数:
+            storage_path: 存储计划数据的文件路径
+            max_batch: 一次最多合并保存的修改数
+            executor: 执行加载和保存的线程池
+            **kwargs: 传给 PlanManager 的其他参数，
+                write_behind 和 memory_queries 默认为 True
+
+        返回:
+            异步计划管理器
+        """
+        kwargs.setdefault("write_behind", True)
+        kwargs.setdefault("memory_queries", True)
+        manager = await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(PlanManager, storage_path, **kwargs)
+        )
+        return cls(manager, max_batch, executor)
+
+    async def __aenter__(self) -> "AsyncPlanManager":
+        """进入 async with 语句"""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """退出 async with 语句时关闭"""
+        await self.close()
+
+    @property
+    def generation(self) -> Optional[str]:
+        """当前数据的版本标识，见 PlanManager.generation"""
+        return self.manager.generation
+
+    # ---- 修改 ----
+
+    async def submit(
+        self, operation: Callable[[], ResultT], blocking: bool = False
+    ) -> ResultT:
+        """
+        把修改交给写入任务，等待它生效并保存
+
+        需要原子地执行多个修改时，可以提交一个在 manager.transaction() 中
+        完成它们的函数。
+
+        参数:
+            operation: 修改计划的函数，在写入任务中按提交顺序调用
+            blocking: 函数是否会读写存储；为 True 时在线程池中调用，
+                调用期间写入任务不处理其他修改
+
+        返回:
+            operation 的返回值
+
+        异常:
+            RuntimeError: 已经关闭
+            SaveError: 修改已经生效，但保存失败
+            operation 抛出的其他异常，此时修改没有生效
+        """
+        if self._closed:
+            raise RuntimeError("异步计划管理器已关闭")
+        queue = self._queue
+        if queue is None:
+            # 队列在事件循环中创建，Python 3.10 之前它会绑定创建时的事件循环
+            queue = self._queue = asyncio.Queue()
+            self._writer_task = asyncio.ensure_future(self._writer(queue))
+        future: "asyncio.Future[ResultT]" = asyncio.get_running_loop().create_future()
+        await queue.put((operation, blocking, future))
+        return await future
+
+    async def _writer(self, queue: asyncio.Queue) -> None:
+        """
+        唯一的写入任务：依次应用排队的修改，每批只保存一次
+
+        参数:
+            queue: 修改队列，元素为 (修改函数, 是否阻塞, 等待结果的 Future)
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            results: List[Tuple[asyncio.Future, object, Optional[BaseException]]] = []
+            for operation, blocking, future in batch:
+                # 调用方已经取消，修改不再生效
+                if future.cancelled():
+                    continue
+                try:
+                    if blocking:
+                        result = await loop.run_in_executor(self._executor, operation)
+                    else:
+                        result = operation()
+                    results.append((future, result, None))
+                except Exception as e:
+                    results.append((future, None, e))
+
+            saved: Optional[SaveError] = None
+            try:
+                await loop.run_in_executor(self._executor, self.manager.flush)
+            except Exception as e:
+                saved = SaveError(f"保存失败: {e}")
+                saved.__cause__ = e
+
+            for future, result, error in results:
+                if future.done():
+                    continue
+                if error is None:
+                    error = saved
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+            for _ in batch:
+                queue.task_done()
+
+    async def add_plan(
+        self,
+        title: str,
+        description: str,
+        deadline: Optional[str] = None,
+        priority: str = "medium",
+        tags: Optional[List[str]] = None,
+    ) -> str:
+        """添加新计划，返回新计划的ID，见 PlanManager.add_plan"""
+        return await self.submit(
+            lambda: self.manager.add_plan(title, description, deadline, priority, tags)
+        )
+
+    async def delete_plan(self, plan_id: str) -> bool:
+        """删除计划，见 PlanManager.delete_plan"""
+        return await self.submit(lambda: self.manager.delete_plan(plan_id))
+
+    async def update_plan(self, plan_id: str, **kwargs) -> bool:
+        """更新计划，见 PlanManager.update_plan"""
+        return await self.submit(lambda: self.manager.update_plan(plan_id, **kwargs))
+
+    async def complete_plan(self, plan_id: str) -> bool:
+        """标记计划为已完成，见 PlanManager.complete_plan"""
+        return await self.submit(lambda: self.manager.complete_plan(plan_id))
+
+    async def compact(self) -> Dict[str, int]:
+        """在线程池中整理存储，见 PlanManager.compact"""
+        return await self.submit(self.manager.compact, blocking=True)
+
+    async def flush(self) -> None:
+        """等待此前提交的修改全部生效并保存"""
+        if self._queue is not None:
+            await self._queue.join()
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.manager.flush
+        )
+
+    async def close(self) -> None:
+        """等待排队的修改保存完成，停止写入任务并关闭计划管理器"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._queue is not None and self._writer_task is not None:
+            await self._queue.join()
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+            self._writer_task = None
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.manager.close
+        )
+
+    # ---- 读取：直接使用内存数据 ----
+
+    async def get_plans(
+        self,
+        tags: Optional[List[str]] = None,
+        priority: Optional[str] = None,
+        completed: Optional[bool] = None,
+        all_tags: Optional[List[str]] = None,
+        not_tags: Optional[List[str]] = None,
+        deadline_from: Optional[str] = None,
+        deadline_to: Optional[str] = None,
+        order_by: Optional[str] = None,
+        text: Optional[str] = None,
+    ) -> List[Dict]:
+        """获取符合条件的计划，见 PlanManager.get_plans"""
+        return self.manager.get_plans(
+            tags,
+            priority,
+            completed,
+            all_tags=all_tags,
+            not_tags=not_tags,
+            deadline_from=deadline_from,
+            deadline_to=deadline_to,
+            order_by=order_by,
+            text=text,
+        )
+
+    async def iter_plans(
+        self,
+        plan_filter: Optional[PlanFilter] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        获取一页符合条件的计划，见 PlanManager.iter_plans
+
+        返回列表而不是迭代器：结果在这一次调用中取完，不受之后生效的修改影响。
+        """
+        return list(self.manager.iter_plans(plan_filter, order_by, limit, after))
+
+    async def query(
+        self,
+        plan_filter: PlanFilter,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """按查询条件获取计划，见 PlanManager.query；与 iter_plans 相同返回列表"""
+        return list(self.manager.query(plan_filter, after, limit))
+
+    async def explain(
+        self, plan_filter: PlanFilter, limit: Optional[int] = None
+    ) -> str:
+        """说明查询会如何执行，见 PlanManager.explain"""
+        return self.manager.explain(plan_filter, limit)
+
+    async def get_plan_by_id(self, plan_id: str) -> Optional[Dict]:
+        """通过ID获取计划，见 PlanManager.get_plan_by_id"""
+        return self.manager.get_plan_by_id(plan_id)
+
+    async def find_plan_ids(
+        self, prefix: str, limit: Optional[int] = None
+    ) -> List[str]:
+        """查找ID以指定前缀开头的计划，见 PlanManager.find_plan_ids"""
+        return self.manager.find_plan_ids(prefix, limit)
+
+    async def resolve_plan_id(self, id_or_prefix: str) -> Optional[str]:
+        """把完整ID或唯一的ID前缀解析为完整ID，见 PlanManager.resolve_plan_id"""
+        return self.manager.resolve_plan_id(id_or_prefix)
+
+    async def get_plans_created_since(
+        self,
+        since: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """按ID顺序获取某个时间之后创建的计划，见 PlanManager.get_plans_created_since"""
+        return self.manager.get_plans_created_since(since, after, limit)
+
+    async def get_upcoming_deadlines(self, days: int = 7) -> List[Dict]:
+        """获取即将到期的计划，见 PlanManager.get_upcoming_deadlines"""
+        return self.manager.get_upcoming_deadlines(days)
+
+    async def get_overdue_plans(self) -> List[Dict]:
+        """获取已过期且未完成的计划，见 PlanManager.get_overdue_plans"""
+        return self.manager.get_overdue_plans()
+
+    async def top_urgent(
+        self, k: int = 10, now: Optional[datetime.date] = None
+    ) -> List[Tuple[Dict, float]]:
+        """获取最紧急的未完成计划，见 PlanManager.top_urgent"""
+        return self.manager.top_urgent(k, now)
+
+    async def search(
+        self, query: str, limit: Optional[int] = 20
+    ) -> List[Tuple[Dict, float]]:
+        """全文搜索计划，见 PlanManager.search"""
+        return self.manager.search(query, limit)
+
+    async def stats(self, now: Optional[datetime.date] = None, days: int = 7) -> Dict:
+        """汇总统计，见 PlanManager.stats"""
+        return self.manager.stats(now, days)
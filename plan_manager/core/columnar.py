@@ -0,0 +1,578 @@
+"""
+列式计划表 - 以列的形式在内存中保存大量计划
+
+优先级和完成状态保存为单字节数组，截止日期保存为 int32 日期序数，
+标签按字典编码，标题、描述等字符串各自保存在独立的列表中。
+安装 NumPy 时过滤条件以向量化的掩码计算，否则逐行判断。
+
+对外仍然表现为计划ID到计划字典的映射，字典在访问时由各列组装。
+"""
+
+import datetime
+from array import array
+from itertools import chain
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
+
+from .indexes import UNDATED, date_ordinal
+from .query import PlanFilter
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    try:
+        import numpy as np
+    except ImportError:  # NumPy 是可选依赖
+        np = None
+
+# 逐行保存的字段，其余字段由数组列保存
+STRING_FIELDS = ("title", "description", "created_at")
+
+# 由列保存的计划字段，其他字段原样保存在 extras 中
+PLAN_FIELDS = frozenset(
+    STRING_FIELDS + ("id", "deadline", "priority", "tags", "completed")
+)
+
+# 字典编码的取值类型
+ValueT = TypeVar("ValueT", bound=Optional[str])
+
+# 行在某种排序方式下的排序键，见 PlanTable._row_key
+RowKey = Union[str, int, Tuple[int, int]]
+
+
+class PlanTable:
+    """按列保存计划的表，提供与 {ID: 计划字典} 相同的映射接口"""
+
+    def __init__(self, plans: Optional[List[Dict]] = None) -> None:
+        """
+        初始化计划表
+
+        参数:
+            plans: 初始计划字典列表
+        """
+        # 行号到计划ID，以及计划ID到行号；删除的行留空，整理时回收
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+
+        # 字符串池：每个字段一个列表
+        self.strings: Dict[str, List[Optional[str]]] = {
+            field: [] for field in STRING_FIELDS
+        }
+
+        # 数组列
+        self.priority = array("b")
+        self.completed = array("B")
+        self.deadline = array("i")
+        self.alive = array("B")
+
+        # 优先级和标签的字典编码
+        self.priority_values: List[Optional[str]] = []
+        self.priority_codes: Dict[Optional[str], int] = {}
+        self.tag_values: List[str] = []
+        self.tag_codes: Dict[str, int] = {}
+        self.tags: List[Tuple[int, ...]] = []
+
+        # 不能按日期序数还原的截止日期，以及计划字典中的其他字段
+        self.raw_deadlines: Dict[int, Optional[str]] = {}
+        self.extras: Dict[int, Dict] = {}
+
+        # NumPy 过滤标签时使用的扁平化 (行号, 标签编码) 数组，标签变化后重建
+        self._tag_pairs: Optional[Tuple["np.ndarray", "np.ndarray"]] = None
+
+        for plan in plans or ():
+            self[plan["id"]] = plan
+
+    # 映射接口
+
+    def __len__(self) -> int:
+        """返回计划数"""
+        return len(self.rows)
+
+    def __contains__(self, plan_id: object) -> bool:
+        """判断计划ID是否在表中"""
+        return plan_id in self.rows
+
+    def __iter__(self) -> Iterator[str]:
+        """按添加顺序遍历计划ID"""
+        return (plan_id for plan_id in self.ids if plan_id is not None)
+
+    def __getitem__(self, plan_id: str) -> Dict:
+        """
+        组装指定计划的字典
+
+        异常:
+            KeyError: 计划不存在
+        """
+        return self._plan(self.rows[plan_id])
+
+    def get(self, plan_id: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        """组装指定计划的字典，计划不存在时返回 default"""
+        row = self.rows.get(plan_id)
+        return default if row is None else self._plan(row)
+
+    def keys(self) -> Iterator[str]:
+        """按添加顺序遍历计划ID"""
+        return iter(self)
+
+    def values(self) -> Iterator[Dict]:
+        """按添加顺序逐个组装计划字典"""
+        return (
+            self._plan(row)
+            for row, plan_id in enumerate(self.ids)
+            if plan_id is not None
+        )
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        """按添加顺序遍历 (计划ID, 计划字典)"""
+        return (
+            (plan_id, self._plan(row))
+            for row, plan_id in enumerate(self.ids)
+            if plan_id is not None
+        )
+
+    def __setitem__(self, plan_id: str, plan: Dict) -> None:
+        """
+        添加或替换计划，新计划追加到末尾
+
+        异常:
+            ValueError: 优先级的取值过多
+        """
+        row = self.rows.get(plan_id)
+        if row is None:
+            # 新计划追加到末尾，保持添加顺序
+            row = len(self.ids)
+            self.ids.append(plan_id)
+            self.rows[plan_id] = row
+            for values in self.strings.values():
+                values.append(None)
+            self.priority.append(0)
+            self.completed.append(0)
+            self.deadline.append(UNDATED)
+            self.alive.append(1)
+            self.tags.append(())
+        self._store(row, plan)
+
+    def __delitem__(self, plan_id: str) -> None:
+        """
+        删除计划，删除的行过多时整理表
+
+        异常:
+            KeyError: 计划不存在
+        """
+        row = self.rows.pop(plan_id)
+        self.ids[row] = None
+        self.alive[row] = 0
+        for values in self.strings.values():
+            values[row] = None
+        self.tags[row] = ()
+        self.raw_deadlines.pop(row, None)
+        self.extras.pop(row, None)
+        self._tag_pairs = None
+
+        # 删除的行过多时整理，回收空间
+        if len(self.ids) > 1024 and len(self.rows) * 2 < len(self.ids):
+            self._rebuild()
+
+    def pop(self, plan_id: str, default: Optional[Dict] = None) -> Optional[Dict]:
+        """删除计划并返回它的字典，计划不存在时返回 default"""
+        row = self.rows.get(plan_id)
+        if row is None:
+            return default
+        plan = self._plan(row)
+        del self[plan_id]
+        return plan
+
+    def copy(self) -> "PlanTable":
+        """复制整张表，用于事务回滚"""
+        return PlanTable(list(self.values()))
+
+    # 列的编码与还原
+
+    def _encode(
+        self, values: List[ValueT], codes: Dict[ValueT, int], value: ValueT
+    ) -> int:
+        """返回字符串在字典中的编码，没有时加入字典"""
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _store(self, row: int, plan: Dict) -> None:
+        """把计划字典拆分到各列"""
+        for field, values in self.strings.items():
+            values[row] = plan.get(field)
+
+        priority = plan.get("priority")
+        if len(self.priority_values) >= 127 and priority not in self.priority_codes:
+            raise ValueError("优先级的取值过多，无法使用列式存储")
+        self.priority[row] = self._encode(
+            self.priority_values, self.priority_codes, priority
+        )
+        self.completed[row] = 1 if plan.get("completed") else 0
+
+        deadline = plan.get("deadline")
+        ordinal = UNDATED
+        if deadline:
+            try:
+                ordinal = date_ordinal(deadline)
+            except ValueError:
+                pass
+        self.deadline[row] = ordinal
+        # 只有补零格式的日期能从序数还原，其他写法原样保存
+        if deadline is not None and (
+            ordinal == UNDATED
+            or datetime.date.fromordinal(ordinal).isoformat() != deadline
+        ):
+            self.raw_deadlines[row] = deadline
+        else:
+            self.raw_deadlines.pop(row, None)
+
+        tags = tuple(
+            self._encode(self.tag_values, self.tag_codes, tag)
+            for tag in plan.get("tags") or ()
+        )
+        if tags != self.tags[row]:
+            self.tags[row] = tags
+            self._tag_pairs = None
+
+        extras = {key: value for key, value in plan.items() if key not in PLAN_FIELDS}
+        if extras:
+            self.extras[row] = extras
+        else:
+            self.extras.pop(row, None)
+
+    def _plan(self, row: int) -> Dict:
+        """由各列组装出一行的计划字典"""
+        if row in self.raw_deadlines:
+            deadline = self.raw_deadlines[row]
+        elif self.deadline[row] == UNDATED:
+            deadline = None
+        else:
+            deadline = datetime.date.fromordinal(self.deadline[row]).isoformat()
+
+        plan = {
+            "id": self.ids[row],
+            "title": self.strings["title"][row],
+            "description": self.strings["description"][row],
+            "created_at": self.strings["created_at"][row],
+            "deadline": deadline,
+            "priority": self.priority_values[self.priority[row]],
+            "tags": [self.tag_values[code] for code in self.tags[row]],
+            "completed": bool(self.completed[row]),
+        }
+        if row in self.extras:
+            plan.update(self.extras[row])
+        return plan
+
+    def _rebuild(self) -> None:
+        """去掉已删除的行，重新编号"""
+        rebuilt = PlanTable(list(self.values()))
+        self.__dict__.update(rebuilt.__dict__)
+
+    # 查询
+
+    def query(
+        self,
+        plan_filter: PlanFilter,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        按查询条件过滤计划
+
+        参数:
+            plan_filter: 查询条件
+            after: 分页游标，即上一页最后一个计划的ID
+            limit: 最多返回的数量
+
+        返回:
+            按要求顺序排列的计划字典的迭代器，字典在遍历到时才组装
+
+        异常:
+            ValueError: 游标对应的计划不存在
+        """
+        order_by = plan_filter.order_by
+        cursor: Optional[RowKey] = None
+        if order_by == "id":
+            # 任意字符串都可以作为ID顺序的游标
+            cursor = after
+        elif after is not None:
+            row = self.rows.get(after)
+            if row is None:
+                raise ValueError(f"分页游标 {after} 对应的计划不存在")
+            cursor = self._row_key(order_by, row)
+
+        rows = self._select(
+            priority=plan_filter.priority,
+            completed=plan_filter.completed,
+            any_tags=plan_filter.tags,
+            all_tags=plan_filter.all_tags,
+            not_tags=plan_filter.not_tags,
+            start=plan_filter.start,
+            end=plan_filter.end,
+            by_deadline=order_by == "deadline",
+        )
+        if order_by == "id":
+            # 选中的行都没有删除，ID不为 None
+            rows.sort(key=cast(Callable[[int], str], self.ids.__getitem__))
+        if cursor is not None:
+            first = self._skip(rows, order_by, cursor)
+            rows = rows[first:]
+        return self._assemble(rows, plan_filter.text, limit)
+
+    def _row_key(self, order_by: Optional[str], row: int) -> RowKey:
+        """返回未删除的行在指定排序方式下的排序键"""
+        if order_by == "id":
+            return self.ids[row] or ""
+        if order_by == "deadline":
+            # 截止日期相同的行按行号（添加顺序）稳定排列
+            return (self.deadline[row], row)
+        return row
+
+    def _skip(self, rows: List[int], order_by: Optional[str], cursor: RowKey) -> int:
+        """返回有序行号列表中第一个排在游标之后的下标"""
+        # 同一种排序方式的排序键类型相同，可以比较
+        key: Callable[[Optional[str], int], Any] = self._row_key
+        lo, hi = 0, len(rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(order_by, rows[mid]) <= cursor:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _assemble(
+        self, rows: List[int], text: Optional[str], limit: Optional[int]
+    ) -> Iterator[Dict]:
+        """按行号逐个组装计划字典，并逐行检查文字条件"""
+        if limit is not None and limit <= 0:
+            return
+        # 遍历期间删除计划或整理表会改变行号，先按查询时的行号取得ID，
+        # 组装时再按ID找到当前的行
+        ids = self.ids
+        text = text.lower() if text else None
+        produced = 0
+        for row in rows:
+            plan_id = ids[row]
+            current = None if plan_id is None else self.rows.get(plan_id)
+            if current is None:
+                continue
+            # 文字条件没有对应的列编码，逐行比较
+            if text is not None and not (
+                text in (self.strings["title"][current] or "").lower()
+                or text in (self.strings["description"][current] or "").lower()
+            ):
+                continue
+            yield self._plan(current)
+            produced += 1
+            if produced == limit:
+                return
+
+    def deadline_range(self, start: Optional[int], end: Optional[int]) -> List[Dict]:
+        """按截止日期排列返回范围内尚未完成的计划"""
+        rows = self._select(completed=False, start=start, end=end, by_deadline=True)
+        return [self._plan(row) for row in rows]
+
+    def open_by_deadline(
+        self,
+    ) -> Tuple[Iterator[Tuple[Dict, int]], Iterator[Dict]]:
+        """
+        按截止日期排列的未完成计划，计划字典在遍历到时才生成
+
+        返回:
+            有截止日期的 (计划字典, 日期序数) 迭代器，
+            以及按添加顺序排列的没有截止日期的计划字典迭代器
+        """
+        rows = self._select(completed=False, by_deadline=True)
+        split = next(
+            (i for i, row in enumerate(rows) if self.deadline[row] == UNDATED),
+            len(rows),
+        )
+        dated = ((self._plan(row), self.deadline[row]) for row in rows[:split])
+        undated = (self._plan(row) for row in rows[split:])
+        return dated, undated
+
+    def explain(self, plan_filter: PlanFilter) -> str:
+        """说明列式表的过滤方式"""
+        mode = "NumPy 向量化掩码" if np is not None else "逐行判断（未安装 NumPy）"
+        lines = [f"查询计划（列式表，共 {len(self)} 个计划）", f"  执行方式: {mode}"]
+        if plan_filter.text:
+            lines.append(f"  逐条过滤: 标题或描述包含 {plan_filter.text!r}")
+        if plan_filter.order_by == "deadline":
+            lines.append("  排序: 按截止日期列稳定排序")
+        elif plan_filter.order_by == "id":
+            lines.append("  排序: 按ID排序")
+        else:
+            lines.append("  排序: 按行号（添加顺序）输出")
+        return "\n".join(lines)
+
+    def _codes(self, tags: Optional[List[str]]) -> List[int]:
+        """标签的编码，不存在的标签没有编码"""
+        return [self.tag_codes[tag] for tag in tags or () if tag in self.tag_codes]
+
+    def _select(
+        self,
+        priority: Optional[str] = None,
+        completed: Optional[bool] = None,
+        any_tags: Optional[List[str]] = None,
+        all_tags: Optional[List[str]] = None,
+        not_tags: Optional[List[str]] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        by_deadline: bool = False,
+    ) -> List[int]:
+        """
+        计算满足条件的行号
+
+        返回:
+            行号列表，按添加顺序或截止日期排列
+        """
+        priority_code = None
+        if priority:
+            priority_code = self.priority_codes.get(priority)
+            if priority_code is None:
+                return []
+
+        any_codes = self._codes(any_tags)
+        if any_tags and not any_codes:
+            return []
+        all_names = list(dict.fromkeys(all_tags or ()))
+        if any(tag not in self.tag_codes for tag in all_names):
+            return []
+        all_codes = self._codes(all_names)
+        not_codes = self._codes(not_tags)
+
+        select = self._select_numpy if np is not None else self._select_python
+        return select(
+            priority_code,
+            completed,
+            any_codes,
+            all_codes,
+            not_codes,
+            start,
+            end,
+            by_deadline,
+        )
+
+    def _select_numpy(
+        self,
+        priority_code: Optional[int],
+        completed: Optional[bool],
+        any_codes: List[int],
+        all_codes: List[int],
+        not_codes: List[int],
+        start: Optional[int],
+        end: Optional[int],
+        by_deadline: bool,
+    ) -> List[int]:
+        """用 NumPy 掩码计算满足条件的行号"""
+        # 直接在数组列的内存上建立视图，不复制数据；
+        # 视图只在本函数内使用，不会阻止数组继续增长
+        mask = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        if priority_code is not None:
+            mask &= np.frombuffer(self.priority, dtype=np.int8) == priority_code
+        if completed is not None:
+            mask &= np.frombuffer(self.completed, dtype=np.uint8) == int(completed)
+
+        deadlines = np.frombuffer(self.deadline, dtype=np.intc)
+        if start is not None or end is not None:
+            mask &= deadlines < UNDATED
+            if start is not None:
+                mask &= deadlines >= start
+            if end is not None:
+                mask &= deadlines <= end
+
+        if any_codes or all_codes or not_codes:
+            rows, codes = self._tag_arrays()
+            size = len(mask)
+            if any_codes:
+                mask &= np.bincount(
+                    rows[np.isin(codes, any_codes)], minlength=size
+                ).astype(bool)
+            if all_codes:
+                mask &= np.bincount(
+                    rows[np.isin(codes, all_codes)], minlength=size
+                ) == len(all_codes)
+            if not_codes:
+                mask &= ~np.bincount(
+                    rows[np.isin(codes, not_codes)], minlength=size
+                ).astype(bool)
+
+        selected = np.flatnonzero(mask)
+        if by_deadline:
+            selected = selected[np.argsort(deadlines[selected], kind="stable")]
+        result: List[int] = selected.tolist()
+        return result
+
+    def _tag_arrays(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """返回全部 (行号, 标签编码) 对，每行的重复标签只保留一个"""
+        if self._tag_pairs is None:
+            lengths = np.fromiter(map(len, self.tags), dtype=np.intc)
+            codes = np.fromiter(
+                chain.from_iterable(self.tags), dtype=np.intc, count=int(lengths.sum())
+            )
+            rows = np.repeat(np.arange(len(self.tags), dtype=np.intc), lengths)
+            width = max(len(self.tag_values), 1)
+            keys = rows.astype(np.int64) * width + codes
+            unique = np.unique(keys)
+            if len(unique) != len(keys):
+                rows = (unique // width).astype(np.intc)
+                codes = (unique % width).astype(np.intc)
+            self._tag_pairs = (rows, codes)
+        return self._tag_pairs
+
+    def _select_python(
+        self,
+        priority_code: Optional[int],
+        completed: Optional[bool],
+        any_codes: List[int],
+        all_codes: List[int],
+        not_codes: List[int],
+        start: Optional[int],
+        end: Optional[int],
+        by_deadline: bool,
+    ) -> List[int]:
+        """逐行计算满足条件的行号"""
+        any_set = set(any_codes)
+        all_set = set(all_codes)
+        not_set = set(not_codes)
+        ranged = start is not None or end is not None
+        low = start if start is not None else 0
+        high = end if end is not None else UNDATED - 1
+
+        selected = []
+        for row, alive in enumerate(self.alive):
+            if not alive:
+                continue
+            if priority_code is not None and self.priority[row] != priority_code:
+                continue
+            if completed is not None and self.completed[row] != completed:
+                continue
+            if ranged and not low <= self.deadline[row] <= high:
+                continue
+            if any_set or all_set or not_set:
+                tags = self.tags[row]
+                if any_set and any_set.isdisjoint(tags):
+                    continue
+                if all_set and not all_set.issubset(tags):
+                    continue
+                if not_set and not not_set.isdisjoint(tags):
+                    continue
+            selected.append(row)
+
+        if by_deadline:
+            selected.sort(key=self.deadline.__getitem__)
+        return selected
@@ -0,0 +1,77 @@
+"""
+后台写入 - 合并短时间内的多次修改，统一保存
+"""
+
+import time
+import threading
+from typing import Callable, Optional
+
+
+class WriteBehindFlusher(threading.Thread):
+    """后台保存线程：修改停止一段时间后，或距第一次未保存的修改过久时保存"""
+
+    def __init__(
+        self, flush: Callable[[], None], delay: float = 0.5, max_delay: float = 5.0
+    ):
+        """
+        初始化后台保存线程
+
+        参数:
+            flush: 执行保存的函数
+            delay: 最后一次修改之后等待的静默时间（秒）
+            max_delay: 第一次未保存的修改最多等待的时间（秒）
+        """
+        super().__init__(name="plan-manager-flusher", daemon=True)
+        self._flush = flush
+        self.delay = delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._first_change: Optional[float] = None
+        self._last_change = 0.0
+        self._stopped = False
+
+    def notify(self) -> None:
+        """通知有新的修改等待保存"""
+        with self._cond:
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._last_change = now
+            self._cond.notify()
+
+    def stop(self) -> None:
+        """停止线程，退出前保存剩余的修改"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self.is_alive():
+            self.join()
+
+    def run(self) -> None:
+        """等待修改并在合适的时机保存"""
+        while True:
+            with self._cond:
+                while self._first_change is None and not self._stopped:
+                    self._cond.wait()
+
+                # 静默期内不断有新修改时继续等待，但不超过最长延迟
+                while self._first_change is not None and not self._stopped:
+                    deadline = min(
+                        self._last_change + self.delay,
+                        self._first_change + self.max_delay,
+                    )
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                stopped = self._stopped
+                self._first_change = None
+
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"警告：后台保存计划失败: {e}")
+
+            if stopped:
+                return
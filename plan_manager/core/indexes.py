@@ -0,0 +1,932 @@
+"""
+内存索引 - 为计划查询提供不依赖全量扫描的索引结构
+
+索引在首次使用时根据全部计划建立，之后随每次修改增量维护。
+"""
+
+import bisect
+import heapq
+import datetime
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
+
+from ..models.plan import CREATED_AT_FORMAT, Priority, id_timestamp, time_id_bound
+from .search import bm25, plan_terms, query_terms, top_scores
+
+# 没有截止日期的计划在截止日期索引中排在所有日期之后
+UNDATED = datetime.date.max.toordinal() + 1
+
+# 按索引顺序遍历时每批取出的ID数；每批重新定位，遍历期间可以修改计划
+CHUNK_SIZE = 256
+
+# marshal 能保存的值：内置的标量以及由它们组成的容器，索引内容只能由这些类型组成
+Marshallable = Union[
+    None,
+    bool,
+    int,
+    float,
+    str,
+    bytes,
+    Tuple[Any, ...],
+    List[Any],
+    Dict[Any, Any],
+    Set[Any],
+    FrozenSet[Any],
+]
+
+# 索引内容的类型，见 PlanIndex.state
+StateT = TypeVar("StateT", bound=Marshallable)
+
+# OrderIndex.key 返回的排序键，同一个索引的排序键之间可以比较
+SortKey = Union[str, int, Tuple[int, int, str]]
+
+
+def date_ordinal(value: str) -> int:
+    """
+    将 YYYY-MM-DD 格式的日期转换为序数，便于比较和二分查找
+
+    参数:
+        value: 日期字符串
+
+    返回:
+        日期序数
+
+    异常:
+        ValueError: 日期格式无效
+    """
+    try:
+        return datetime.date.fromisoformat(value).toordinal()
+    except ValueError:
+        # fromisoformat 不接受省略前导零的写法，与 Plan.validate 保持一致
+        return datetime.datetime.strptime(value, "%Y-%m-%d").date().toordinal()
+
+
+def deadline_ordinal(plan: Dict) -> int:
+    """计划截止日期的序数，没有或无法解析时返回 UNDATED"""
+    if not plan.get("deadline"):
+        return UNDATED
+    try:
+        return date_ordinal(plan["deadline"])
+    except ValueError:
+        return UNDATED
+
+
+class PlanIndex(Generic[StateT]):
+    """索引基类，StateT 是保存到旁路文件的索引内容的类型"""
+
+    # 是否可以保存到旁路文件（见 IndexSidecar），下次运行时直接读取而不必重建
+    persistent = False
+
+    def build(self, plans: Iterable[Dict]) -> None:
+        """
+        根据全部计划建立索引
+
+        参数:
+            plans: 全部计划字典
+        """
+        for plan in plans:
+            self.add(plan)
+
+    def add(self, plan: Dict) -> None:
+        """将一个计划加入索引"""
+        raise NotImplementedError
+
+    def remove(self, plan: Dict) -> None:
+        """将一个计划移出索引"""
+        raise NotImplementedError
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """
+        计划被修改时更新索引
+
+        参数:
+            old: 修改前的计划字典
+            new: 修改后的计划字典
+        """
+        self.remove(old)
+        self.add(new)
+
+    def state(self) -> StateT:
+        """
+        返回索引的全部内容，只包含 marshal 能保存的内置类型
+
+        persistent 为 True 的索引需要实现
+        """
+        raise NotImplementedError
+
+    def restore(self, state: StateT) -> None:
+        """
+        用 state 返回的内容恢复索引
+
+        参数:
+            state: 之前保存的索引内容
+        """
+        raise NotImplementedError
+
+
+class OrderIndex(PlanIndex[StateT]):
+    """能按某种顺序输出计划的索引，提供键集分页所需的排序键"""
+
+    def key(self, plan_id: str) -> SortKey:
+        """
+        计划在索引顺序中的排序键
+
+        异常:
+            KeyError: 计划不在索引中
+        """
+        raise NotImplementedError
+
+    def ordered_from(self, after: Optional[str] = None) -> Iterator[str]:
+        """
+        按索引顺序分批遍历计划ID
+
+        参数:
+            after: 从该计划之后开始，None 表示从头开始
+
+        返回:
+            计划ID的迭代器
+
+        异常:
+            KeyError: after 对应的计划不在索引中
+        """
+        raise NotImplementedError
+
+    def sort(self, ids: Iterable[str]) -> List[str]:
+        """
+        按索引顺序排列计划ID
+
+        参数:
+            ids: 计划ID
+
+        返回:
+            排好序的计划ID列表
+        """
+        return sorted(ids, key=self.key)
+
+
+# PrefixIndex 的内容：(有序的ID, 有序的 (创建时间, 计划ID))
+PrefixState = Tuple[List[str], List[Tuple[str, str]]]
+
+
+class PrefixIndex(OrderIndex[PrefixState]):
+    """
+    按ID排序的索引，支持像 git 短哈希一样按ID前缀查找计划
+
+    按时间排序的ID（见 time_ordered_id）字典序就是创建顺序，
+    因此该索引同时是这些计划的创建时间索引；其他ID的计划另外按创建时间排列
+    """
+
+    persistent = True
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        # 不是按时间排序的ID：有序的 (创建时间, 计划ID)
+        self.untimed: List[Tuple[str, str]] = []
+
+    @staticmethod
+    def _untimed_entry(plan: Dict) -> Optional[Tuple[str, str]]:
+        """ID不含时间戳的计划在 untimed 中的条目"""
+        if id_timestamp(plan["id"]) is not None:
+            return None
+        return (plan.get("created_at") or "", plan["id"])
+
+    def build(self, plans: Iterable[Dict]) -> None:
+        """按全部计划一次排序建立索引，比逐个插入快"""
+        plans = list(plans)
+        self.ids = sorted(plan["id"] for plan in plans)
+        entries = (self._untimed_entry(plan) for plan in plans)
+        self.untimed = sorted(entry for entry in entries if entry is not None)
+
+    def add(self, plan: Dict) -> None:
+        """按ID顺序插入计划"""
+        bisect.insort(self.ids, plan["id"])
+        entry = self._untimed_entry(plan)
+        if entry is not None:
+            bisect.insort(self.untimed, entry)
+
+    def remove(self, plan: Dict) -> None:
+        """删除计划的ID和创建时间条目"""
+        i = bisect.bisect_left(self.ids, plan["id"])
+        if i < len(self.ids) and self.ids[i] == plan["id"]:
+            del self.ids[i]
+        entry = self._untimed_entry(plan)
+        if entry is not None:
+            i = bisect.bisect_left(self.untimed, entry)
+            if i < len(self.untimed) and self.untimed[i] == entry:
+                del self.untimed[i]
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """计划修改不影响该索引"""
+        # 计划ID和创建时间不会改变
+        pass
+
+    def state(self) -> PrefixState:
+        """返回 (有序的ID, 有序的 (创建时间, 计划ID))"""
+        return self.ids, self.untimed
+
+    def restore(self, state: PrefixState) -> None:
+        """用 state 返回的内容恢复索引"""
+        self.ids, self.untimed = state
+
+    def find(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        查找以指定前缀开头的ID
+
+        参数:
+            prefix: ID前缀
+            limit: 最多返回的数量
+
+        返回:
+            按字典序排列的匹配ID
+        """
+        result: List[str] = []
+        i = bisect.bisect_left(self.ids, prefix)
+        while i < len(self.ids) and self.ids[i].startswith(prefix):
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(self.ids[i])
+            i += 1
+        return result
+
+    def key(self, plan_id: str) -> str:
+        """返回计划ID本身，ID顺序即字典序"""
+        # 任意字符串都可以作为ID顺序的游标
+        return plan_id
+
+    def ordered_from(self, after: Optional[str] = None) -> Iterator[str]:
+        """按ID字典序遍历 after 之后的计划ID"""
+        return self._walk("", after)
+
+    def sort(self, ids: Iterable[str]) -> List[str]:
+        """按ID字典序排列计划ID"""
+        return sorted(ids)
+
+    def _walk(self, start: str, after: Optional[str]) -> Iterator[str]:
+        """从 start 开始（跳过不大于 after 的ID）按字典序分批遍历ID"""
+        if after is not None and after >= start:
+            i = bisect.bisect_right(self.ids, after)
+        else:
+            i = bisect.bisect_left(self.ids, start)
+        while True:
+            end = i + CHUNK_SIZE
+            chunk = self.ids[i:end]
+            if not chunk:
+                return
+            yield from chunk
+            i = bisect.bisect_right(self.ids, chunk[-1])
+
+    def created_since(
+        self,
+        since: Optional[datetime.datetime] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """
+        按ID顺序查找创建时间不早于指定时间的计划，支持键集分页
+
+        按时间排序的ID直接在有序ID上二分定位，无需解析创建时间；
+        其他ID按创建时间二分定位后按ID合并到结果中
+
+        参数:
+            since: 创建时间下限（本地时间），None 表示不限
+            after: 上一页最后一个计划的ID，只返回ID比它大的计划
+            limit: 最多返回的数量
+
+        返回:
+            按ID字典序排列的计划ID；对按时间排序的ID即创建顺序
+        """
+        if since is None:
+            return list(islice(self._walk("", after), limit))
+
+        bound = time_id_bound(int(since.timestamp()) * 1000)
+        timed = (
+            plan_id
+            for plan_id in self._walk(bound, after)
+            if id_timestamp(plan_id) is not None
+        )
+        i = bisect.bisect_left(self.untimed, (since.strftime(CREATED_AT_FORMAT),))
+        untimed = sorted(
+            plan_id
+            for _, plan_id in self.untimed[i:]
+            if after is None or plan_id > after
+        )
+        return list(islice(heapq.merge(timed, untimed), limit))
+
+
+class SequenceIndex(OrderIndex[None]):
+    """记录计划的添加顺序，使索引查询的结果保持原有的列表顺序"""
+
+    def __init__(self) -> None:
+        self.positions: Dict[str, int] = {}
+        # 按添加顺序排列的计划ID，位置单调递增，可以按位置二分查找
+        self.order: List[str] = []
+        self._next = 0
+
+    def add(self, plan: Dict) -> None:
+        """将计划追加到添加顺序的末尾"""
+        self.positions[plan["id"]] = self._next
+        self.order.append(plan["id"])
+        self._next += 1
+
+    def remove(self, plan: Dict) -> None:
+        """删除计划，其他计划的位置不变"""
+        position = self.positions.get(plan["id"])
+        if position is None:
+            return
+        i = self._locate(position - 1)
+        if i < len(self.order) and self.order[i] == plan["id"]:
+            del self.order[i]
+        del self.positions[plan["id"]]
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """修改不改变计划的位置"""
+        # 修改不改变计划的位置
+        pass
+
+    def _locate(self, position: int) -> int:
+        """返回 order 中第一个位置大于 position 的下标"""
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.positions[self.order[mid]] <= position:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def key(self, plan_id: str) -> int:
+        """返回计划的添加位置"""
+        return self.positions[plan_id]
+
+    def ordered_from(self, after: Optional[str] = None) -> Iterator[str]:
+        """按添加顺序遍历 after 之后的计划ID"""
+        position = -1 if after is None else self.positions[after]
+        while True:
+            i = self._locate(position)
+            end = i + CHUNK_SIZE
+            chunk = self.order[i:end]
+            if not chunk:
+                return
+            position = self.positions[chunk[-1]]
+            yield from chunk
+
+
+# TagIndex 的内容：标签到计划ID列表的映射
+TagState = Dict[str, List[str]]
+
+
+class TagIndex(PlanIndex[TagState]):
+    """标签倒排索引：标签到计划ID集合的映射"""
+
+    persistent = True
+
+    def __init__(self) -> None:
+        self.tags: Dict[str, Set[str]] = {}
+
+    def add(self, plan: Dict) -> None:
+        """将计划加入其每个标签的ID集合"""
+        for tag in set(plan.get("tags") or ()):
+            self.tags.setdefault(tag, set()).add(plan["id"])
+
+    def remove(self, plan: Dict) -> None:
+        """将计划移出其每个标签的ID集合，删除变空的标签"""
+        for tag in set(plan.get("tags") or ()):
+            ids = self.tags.get(tag)
+            if ids is not None:
+                ids.discard(plan["id"])
+                if not ids:
+                    del self.tags[tag]
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """只在标签改变时更新索引"""
+        if old.get("tags") != new.get("tags"):
+            super().update(old, new)
+
+    def state(self) -> TagState:
+        """返回标签到计划ID列表的映射"""
+        # marshal 保存集合很慢，转为列表
+        return {tag: list(ids) for tag, ids in self.tags.items()}
+
+    def restore(self, state: TagState) -> None:
+        """用 state 返回的内容恢复索引"""
+        self.tags = {tag: set(ids) for tag, ids in state.items()}
+
+    def ids(self, tag: str) -> Set[str]:
+        """返回带有指定标签的计划ID集合，调用方不应修改"""
+        return self.tags.get(tag, set())
+
+    def union(self, tags: Iterable[str]) -> Set[str]:
+        """返回带有任一指定标签的计划ID集合"""
+        result: Set[str] = set()
+        for tag in tags:
+            result |= self.ids(tag)
+        return result
+
+    def query(
+        self,
+        any_tags: Optional[List[str]] = None,
+        all_tags: Optional[List[str]] = None,
+        not_tags: Optional[List[str]] = None,
+    ) -> Set[str]:
+        """
+        用集合运算组合标签条件
+
+        参数:
+            any_tags: 至少带有其中一个标签 (OR)
+            all_tags: 必须带有全部标签 (AND)
+            not_tags: 不能带有其中任何标签 (NOT)
+
+        返回:
+            匹配的计划ID集合；any_tags 和 all_tags 至少要提供一个
+        """
+        sets = [self.ids(tag) for tag in all_tags or ()]
+        if any_tags:
+            sets.append(self.union(any_tags))
+        if not sets:
+            raise ValueError("至少需要一个 any_tags 或 all_tags 条件")
+
+        # 从最小的集合开始求交集，耗时与结果规模相当
+        sets.sort(key=len)
+        result = set(sets[0])
+        for ids in sets[1:]:
+            if not result:
+                break
+            result &= ids
+
+        for tag in not_tags or ():
+            excluded = self.ids(tag)
+            if len(excluded) < len(result):
+                result -= excluded
+            else:
+                result = {plan_id for plan_id in result if plan_id not in excluded}
+        return result
+
+
+# DeadlineIndex 的内容：(有序的条目, 计划ID到排序键的映射, 下一个添加序号)
+DeadlineState = Tuple[List[Tuple[int, int, str]], Dict[str, Tuple[int, int]], int]
+
+
+class DeadlineIndex(OrderIndex[DeadlineState]):
+    """按截止日期排序的索引，日期预先解析为序数，范围查询只需二分查找"""
+
+    persistent = True
+
+    def __init__(self) -> None:
+        # 有序的 (日期序数, 添加序号, 计划ID)，同一天的计划保持添加顺序
+        self.entries: List[Tuple[int, int, str]] = []
+        self.keys: Dict[str, Tuple[int, int]] = {}
+        self._next = 0
+
+    def build(self, plans: Iterable[Dict]) -> None:
+        """先解析全部截止日期，再一次排序建立索引"""
+        for plan in plans:
+            self.keys[plan["id"]] = (deadline_ordinal(plan), self._next)
+            self._next += 1
+        self.entries = sorted(key + (plan_id,) for plan_id, key in self.keys.items())
+
+    def _insert(self, plan_id: str, key: Tuple[int, int]) -> None:
+        """以指定的排序键插入计划"""
+        self.keys[plan_id] = key
+        bisect.insort(self.entries, key + (plan_id,))
+
+    def add(self, plan: Dict) -> None:
+        """按截止日期插入计划，排在同一天已有的计划之后"""
+        self._insert(plan["id"], (deadline_ordinal(plan), self._next))
+        self._next += 1
+
+    def remove(self, plan: Dict) -> None:
+        """删除计划的条目"""
+        key = self.keys.pop(plan["id"], None)
+        if key is None:
+            return
+        entry = key + (plan["id"],)
+        i = bisect.bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """只在截止日期改变时更新索引，保留原来的添加序号"""
+        ordinal = deadline_ordinal(new)
+        key = self.keys.get(old["id"])
+        if key is None or key[0] == ordinal:
+            return
+        # 修改截止日期时保留原来的添加序号
+        self.remove(old)
+        self._insert(new["id"], (ordinal, key[1]))
+
+    def state(self) -> DeadlineState:
+        """返回 (有序的条目, 计划ID到排序键的映射, 下一个添加序号)"""
+        return self.entries, self.keys, self._next
+
+    def restore(self, state: DeadlineState) -> None:
+        """用 state 返回的内容恢复索引"""
+        self.entries, self.keys, self._next = state
+
+    def range(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> List[str]:
+        """
+        查找截止日期在指定范围内的计划
+
+        参数:
+            start: 起始日期序数（包含），None 表示不限
+            end: 结束日期序数（包含），None 表示不限
+
+        返回:
+            按截止日期排列的计划ID，不含没有截止日期的计划
+        """
+        lo, hi = self._bounds(start, end)
+        return [entry[2] for entry in self.entries[lo:hi]]
+
+    def count(self, start: Optional[int] = None, end: Optional[int] = None) -> int:
+        """返回截止日期在指定范围内的计划数，只需两次二分查找"""
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+    def contains(self, plan_id: str, start: Optional[int], end: Optional[int]) -> bool:
+        """判断计划的截止日期是否在指定范围内"""
+        key = self.keys.get(plan_id)
+        if key is None or key[0] == UNDATED:
+            return False
+        return (start is None or key[0] >= start) and (end is None or key[0] <= end)
+
+    def _bounds(self, start: Optional[int], end: Optional[int]) -> Tuple[int, int]:
+        """范围在有序列表中对应的切片位置"""
+        lo = 0 if start is None else bisect.bisect_left(self.entries, (start,))
+        stop = UNDATED if end is None else min(end + 1, UNDATED)
+        return lo, max(lo, bisect.bisect_left(self.entries, (stop,), lo))
+
+    def key(self, plan_id: str) -> Tuple[int, int, str]:
+        """返回 (日期序数, 添加序号, 计划ID)"""
+        return self.keys[plan_id] + (plan_id,)
+
+    def ordered_from(self, after: Optional[str] = None) -> Iterator[str]:
+        """按截止日期遍历 after 之后的计划ID，没有截止日期的排在最后"""
+        # 空元组小于任何条目，表示从头开始
+        entry: Tuple = () if after is None else self.key(after)
+        return (plan_id for _, plan_id in self._iterate(entry))
+
+    def scan(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        按截止日期分批遍历，遍历期间可以增删计划
+
+        参数:
+            start: 起始日期序数（包含），UNDATED 表示只遍历没有截止日期的计划
+            end: 结束日期序数（包含），None 表示遍历到最后
+
+        返回:
+            (日期序数, 计划ID) 的迭代器
+        """
+        # 添加序号都大于 -1，(start, -1) 排在该日期的全部条目之前
+        for ordinal, plan_id in self._iterate(() if start is None else (start, -1)):
+            if end is not None and ordinal > end:
+                return
+            yield ordinal, plan_id
+
+    def _iterate(self, entry: Tuple) -> Iterator[Tuple[int, str]]:
+        """从排在 entry 之后的条目开始分批遍历"""
+        while True:
+            i = bisect.bisect_right(self.entries, entry)
+            end = i + CHUNK_SIZE
+            chunk = self.entries[i:end]
+            if not chunk:
+                return
+            entry = chunk[-1]
+            for item in chunk:
+                yield item[0], item[2]
+
+    def sort(self, ids: Iterable[str]) -> List[str]:
+        """按截止日期排列计划ID，同一天的保持添加顺序"""
+        ids = ids if isinstance(ids, (set, frozenset, dict)) else set(ids)
+        # 候选较多时顺序遍历索引，比重新排序更快
+        if len(ids) * 8 > len(self.entries):
+            return [entry[2] for entry in self.entries if entry[2] in ids]
+        return sorted(ids, key=self.keys.__getitem__)
+
+
+class ValueIndex(PlanIndex[None]):
+    """单个字段的取值到计划ID集合的映射，子类通过 field 指定字段"""
+
+    field = ""
+
+    def __init__(self) -> None:
+        self.values: Dict[object, Set[str]] = {}
+
+    def add(self, plan: Dict) -> None:
+        """将计划加入其字段值对应的ID集合"""
+        self.values.setdefault(plan.get(self.field), set()).add(plan["id"])
+
+    def remove(self, plan: Dict) -> None:
+        """将计划移出其字段值对应的ID集合"""
+        ids = self.values.get(plan.get(self.field))
+        if ids is not None:
+            ids.discard(plan["id"])
+            if not ids:
+                del self.values[plan.get(self.field)]
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """只在字段值改变时更新索引"""
+        if old.get(self.field) != new.get(self.field):
+            super().update(old, new)
+
+    def ids(self, value: object) -> Set[str]:
+        """返回字段等于指定值的计划ID集合，调用方不应修改"""
+        return self.values.get(value, set())
+
+
+class PriorityIndex(ValueIndex):
+    """按优先级分组的索引"""
+
+    field = "priority"
+
+
+class CompletionIndex(ValueIndex):
+    """按完成状态分组的索引"""
+
+    field = "completed"
+
+
+def make_stats(
+    total: int,
+    completed: int,
+    priorities: Dict[str, int],
+    tags: Dict[str, int],
+    overdue: int,
+    due_soon: int,
+) -> Dict:
+    """
+    组装 PlanManager.stats 返回的汇总字典
+
+    参数:
+        total: 计划总数
+        completed: 已完成的计划数
+        priorities: 各优先级的计划数
+        tags: 各标签的计划数
+        overdue: 已过期且未完成的计划数
+        due_soon: 即将到期且未完成的计划数
+
+    返回:
+        优先级按 low、medium、high 排列并补全为 0，标签按计划数从多到少排列
+    """
+    by_priority = {priority.value: 0 for priority in Priority}
+    by_priority.update((key, count) for key, count in priorities.items() if count)
+    return {
+        "total": total,
+        "completed": completed,
+        "open": total - completed,
+        "overdue": overdue,
+        "due_this_week": due_soon,
+        "by_priority": by_priority,
+        "by_tag": dict(
+            sorted(
+                ((tag, count) for tag, count in tags.items() if count),
+                key=lambda item: (-item[1], item[0]),
+            )
+        ),
+    }
+
+
+# StatsIndex 的内容：(总数, 已完成数, 各优先级计数, 各标签计数, 未完成计划的截止日期)
+StatsState = Tuple[int, int, Dict[str, int], Dict[str, int], List[int]]
+
+
+class StatsIndex(PlanIndex[StatsState]):
+    """
+    汇总计数：总数以及按优先级、完成状态和标签的计划数，随每次修改增量维护
+
+    过期和即将到期的数量随日期变化，因此保存未完成计划的有序截止日期，
+    查询时用两次二分查找得到
+    """
+
+    persistent = True
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.completed = 0
+        self.priorities: Dict[str, int] = {}
+        self.tags: Dict[str, int] = {}
+        # 未完成且有截止日期的计划的日期序数，有序
+        self.open_deadlines: List[int] = []
+
+    def build(self, plans: Iterable[Dict]) -> None:
+        """根据全部计划统计计数"""
+        # 先收集后排序，比逐个插入快
+        for plan in plans:
+            self._count(plan, 1)
+            if not plan.get("completed"):
+                ordinal = deadline_ordinal(plan)
+                if ordinal != UNDATED:
+                    self.open_deadlines.append(ordinal)
+        self.open_deadlines.sort()
+
+    def _count(self, plan: Dict, delta: int) -> None:
+        """按计划的字段增减计数"""
+        self.total += delta
+        if plan.get("completed"):
+            self.completed += delta
+        priority = plan.get("priority", "")
+        self.priorities[priority] = self.priorities.get(priority, 0) + delta
+        for tag in set(plan.get("tags") or ()):
+            count = self.tags.get(tag, 0) + delta
+            if count:
+                self.tags[tag] = count
+            else:
+                del self.tags[tag]
+
+    def add(self, plan: Dict) -> None:
+        """将计划计入各项计数"""
+        self._count(plan, 1)
+        if not plan.get("completed"):
+            ordinal = deadline_ordinal(plan)
+            if ordinal != UNDATED:
+                bisect.insort(self.open_deadlines, ordinal)
+
+    def remove(self, plan: Dict) -> None:
+        """从各项计数中减去计划"""
+        self._count(plan, -1)
+        if not plan.get("completed"):
+            ordinal = deadline_ordinal(plan)
+            if ordinal != UNDATED:
+                i = bisect.bisect_left(self.open_deadlines, ordinal)
+                if i < len(self.open_deadlines) and self.open_deadlines[i] == ordinal:
+                    del self.open_deadlines[i]
+
+    def state(self) -> StatsState:
+        """返回 (总数, 已完成数, 各优先级计数, 各标签计数, 未完成计划的截止日期)"""
+        return (
+            self.total,
+            self.completed,
+            self.priorities,
+            self.tags,
+            self.open_deadlines,
+        )
+
+    def restore(self, state: StatsState) -> None:
+        """用 state 返回的内容恢复索引"""
+        (
+            self.total,
+            self.completed,
+            self.priorities,
+            self.tags,
+            self.open_deadlines,
+        ) = state
+
+    def summary(self, today: int, days: int = 7) -> Dict:
+        """
+        返回汇总字典
+
+        参数:
+            today: 今天的日期序数
+            days: 即将到期的天数，与 get_upcoming_deadlines 相同
+
+        返回:
+            见 make_stats
+        """
+        deadlines = self.open_deadlines
+        start = bisect.bisect_left(deadlines, today)
+        end = bisect.bisect_right(deadlines, today + days)
+        return make_stats(
+            self.total,
+            self.completed,
+            self.priorities,
+            self.tags,
+            overdue=start,
+            due_soon=end - start,
+        )
+
+
+# SearchIndex 的内容：(倒排表, 各计划的词数, 各计划的添加序号, 总词数, 下一个添加序号)
+SearchState = Tuple[Dict[str, Dict[str, int]], Dict[str, int], Dict[str, int], int, int]
+
+
+class SearchIndex(PlanIndex[SearchState]):
+    """标题和描述的全文倒排索引：检索词到 {计划ID: 词频} 的映射"""
+
+    persistent = True
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # 每个计划的词数和添加序号，以及全部计划的总词数
+        self.lengths: Dict[str, int] = {}
+        self.order: Dict[str, int] = {}
+        self.total_length = 0
+        self._next = 0
+
+    def _insert(self, plan: Dict, seq: int) -> None:
+        """以指定的添加序号将计划的检索词加入倒排表"""
+        plan_id = plan["id"]
+        terms = plan_terms(plan)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[plan_id] = tf
+        length = sum(terms.values())
+        self.lengths[plan_id] = length
+        self.total_length += length
+        self.order[plan_id] = seq
+
+    def add(self, plan: Dict) -> None:
+        """将计划的标题和描述加入倒排表"""
+        self._insert(plan, self._next)
+        self._next += 1
+
+    def remove(self, plan: Dict) -> None:
+        """将计划从倒排表中删除"""
+        plan_id = plan["id"]
+        if plan_id not in self.lengths:
+            return
+        for term in plan_terms(plan):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(plan_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(plan_id)
+        del self.order[plan_id]
+
+    def update(self, old: Dict, new: Dict) -> None:
+        """只在标题或描述改变时更新索引，保留原来的添加序号"""
+        if old.get("title") == new.get("title") and old.get("description") == new.get(
+            "description"
+        ):
+            return
+        # 修改内容时保留原来的添加序号
+        seq = self.order.get(old["id"], self._next)
+        self.remove(old)
+        self._insert(new, seq)
+
+    def state(self) -> SearchState:
+        """返回 (倒排表, 各计划的词数, 各计划的添加序号, 总词数, 下一个添加序号)"""
+        return (
+            self.postings,
+            self.lengths,
+            self.order,
+            self.total_length,
+            self._next,
+        )
+
+    def restore(self, state: SearchState) -> None:
+        """用 state 返回的内容恢复索引"""
+        (
+            self.postings,
+            self.lengths,
+            self.order,
+            self.total_length,
+            self._next,
+        ) = state
+
+    def search(
+        self, query: str, limit: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        按 BM25 评分检索，包含任一检索词的计划都会返回
+
+        参数:
+            query: 查询文本
+            limit: 最多返回的数量，None 表示全部
+
+        返回:
+            按评分从高到低排列的 (计划ID, 评分)
+        """
+        count = len(self.lengths)
+        average = self.total_length / count if count else 0.0
+        scores: Dict[str, float] = {}
+        for term in query_terms(query):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            df = len(posting)
+            for plan_id, tf in posting.items():
+                score = bm25(tf, df, self.lengths[plan_id], count, average)
+                scores[plan_id] = scores.get(plan_id, 0.0) + score
+        return top_scores(scores, self.order, limit)
+
+
+# 索引名称到索引类型的映射
+INDEX_TYPES: Dict[str, Type[PlanIndex]] = {
+    "prefix": PrefixIndex,
+    "sequence": SequenceIndex,
+    "tags": TagIndex,
+    "deadline": DeadlineIndex,
+    "priority": PriorityIndex,
+    "completed": CompletionIndex,
+    "stats": StatsIndex,
+    "search": SearchIndex,
+}
+
+# 按名称取得索引时期望的索引类型
+IndexT = TypeVar("IndexT", bound=PlanIndex)
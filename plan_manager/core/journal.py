@@ -0,0 +1,113 @@
+"""
+操作日志 - 以追加方式记录计划的每一次变更
+"""
+
+import os
+import json
+from typing import Dict, List, Tuple
+
+
+class PlanJournal:
+    """追加式操作日志，每行保存一条 JSON 格式的变更记录"""
+
+    def __init__(self, path: str):
+        """
+        初始化操作日志
+
+        参数:
+            path: 日志文件路径
+        """
+        self.path = path
+        # 当前日志中的记录数和字节数，用于判断是否需要压缩
+        self.record_count = 0
+        self.size_bytes = 0
+
+    def exists(self) -> bool:
+        """日志文件是否存在"""
+        return os.path.exists(self.path)
+
+    def append(self, records: List[Dict], fsync: bool = False) -> None:
+        """
+        追加变更记录
+
+        参数:
+            records: 变更记录列表，一次写入
+            fsync: 写入后是否同步到磁盘
+        """
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        )
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        self.record_count += len(records)
+        self.size_bytes += len(lines.encode("utf-8"))
+
+    def read(self) -> List[Dict]:
+        """
+        按写入顺序读取全部变更记录
+
+        返回:
+            变更记录列表；末尾未写完整的记录不读取，由之后的 read_new 读取
+        """
+        self.record_count = 0
+        self.size_bytes = 0
+        if not self.exists():
+            return []
+
+        with open(self.path, "rb") as f:
+            content = f.read()
+        records, self.size_bytes = self._parse(content)
+        self.record_count = len(records)
+        return records
+
+    def read_new(self) -> List[Dict]:
+        """
+        读取 size_bytes 之后由其他进程追加的变更记录
+
+        返回:
+            新的变更记录列表；末尾未写完整的记录留到下一次读取
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self.size_bytes)
+            content = f.read()
+        records, consumed = self._parse(content)
+        self.record_count += len(records)
+        self.size_bytes += consumed
+        return records
+
+    def _parse(self, content: bytes) -> Tuple[List[Dict], int]:
+        """
+        解析完整的记录行
+
+        读取不持有锁，其他进程可能正在追加，最后一个换行符之后的内容
+        是还没有写完的记录，不解析也不报告损坏
+
+        参数:
+            content: 从某条记录开头读到的文件内容
+
+        返回:
+            (变更记录列表, 已解析的字节数)
+        """
+        consumed = content.rfind(b"\n") + 1
+        records = []
+        for line in content[:consumed].decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                print(f"警告：日志文件 {self.path} 中的记录损坏，已忽略")
+        return records, consumed
+
+    def truncate(self) -> None:
+        """清空日志文件"""
+        if self.exists():
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+        self.record_count = 0
+        self.size_bytes = 0
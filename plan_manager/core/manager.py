@@ -2,42 +2,678 @@
 计划管理器 - 提供计划的增删改查功能
 """
 
-import os
-import json
+import atexit
 import datetime
-from typing import Dict, List, Optional, Any
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import (
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Any,
+    Tuple,
+    Type,
+    Union,
+)
 
-from ..models.plan import Plan
+from ..models.plan import EDITABLE_FIELDS, Plan, id_created_at, time_ordered_id
+from .columnar import PlanTable
+from .flusher import WriteBehindFlusher
+from .indexes import (
+    INDEX_TYPES,
+    UNDATED,
+    DeadlineIndex,
+    IndexT,
+    PlanIndex,
+    PrefixIndex,
+    SearchIndex,
+    StatsIndex,
+)
+from .query import PlanFilter, parse_datetime, plan_query
+from .rwlock import ReadWriteLock
+from .sidecar import Change, IndexSidecar
+from .urgency import UrgencyScore, top_by_deadline, top_by_scan
+from .views import PlanView
+from .storage import (
+    JOURNAL_COMPACT_BYTES,
+    JOURNAL_COMPACT_RECORDS,
+    JSONStorage,
+    SQLiteStorage,
+    StaleStoreError,
+    StorageBackend,
+    apply_record,
+)
+
+# 内存中按ID索引的全部计划，启用列式存储时为 PlanTable
+PlanRecords = Union[Dict[str, Dict], PlanTable]
+
+# 持久化级别：none 不主动落盘，batch 每次保存落盘一次，always 每次修改都落盘
+DURABILITY_LEVELS = ("none", "batch", "always")
+
+
+# 线程安全模式下在读锁内执行的查询方法
+READ_METHODS = (
+    "get_plans",
+    "iter_plans",
+    "query",
+    "explain",
+    "get_plan_by_id",
+    "find_plan_ids",
+    "resolve_plan_id",
+    "get_plans_created_since",
+    "get_upcoming_deadlines",
+    "get_overdue_plans",
+    "top_urgent",
+    "search",
+    "stats",
+)
+
+
+def _locked(lock: ContextManager[Any], method: Callable) -> Callable:
+    """返回持有 lock 调用 method 的函数"""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+class AmbiguousPlanIdError(ValueError):
+    """ID前缀匹配到多个计划"""
+
+    def __init__(self, prefix: str, candidates: List[str]):
+        """
+        初始化异常
+
+        参数:
+            prefix: 输入的ID前缀
+            candidates: 匹配到的部分候选ID
+        """
+        self.prefix = prefix
+        self.candidates = candidates
+        super().__init__(f"ID前缀 {prefix} 匹配到多个计划: {', '.join(candidates)}")
 
 
 class PlanManager:
     """计划管理器类"""
 
-    def __init__(self, storage_path: str = "plans.json"):
+    def __init__(
+        self,
+        storage_path: str = "plans.json",
+        journal: bool = False,
+        compact_bytes: int = JOURNAL_COMPACT_BYTES,
+        compact_records: int = JOURNAL_COMPACT_RECORDS,
+        storage: Optional[StorageBackend] = None,
+        write_behind: bool = False,
+        flush_delay: float = 0.5,
+        flush_max_delay: float = 5.0,
+        durability: str = "batch",
+        columnar: bool = False,
+        time_ordered_ids: bool = False,
+        urgency: Optional[UrgencyScore] = None,
+        persist_indexes: bool = False,
+        memory_queries: bool = False,
+        thread_safe: bool = False,
+    ):
         """
         初始化计划管理器
 
         参数:
             storage_path: 存储计划数据的文件路径
+            journal: 是否启用日志模式。启用后每次变更只向日志文件
+                追加一条记录，而不是重写整个存储文件
+            compact_bytes: 日志超过该字节数时自动压缩
+            compact_records: 日志超过该记录数时自动压缩
+            storage: 自定义存储后端，提供时忽略以上存储参数
+            write_behind: 是否启用后台写入。启用后修改立即生效，
+                由后台线程把短时间内的多次修改合并为一次保存
+            flush_delay: 后台写入时，最后一次修改之后等待的静默时间（秒）
+            flush_max_delay: 后台写入时，修改最多延迟保存的时间（秒）
+            durability: 持久化级别 (none, batch, always)。none 不主动落盘；
+                batch 每次保存落盘一次；always 每次修改都同步保存并落盘
+            columnar: 是否在内存中按列保存计划。适合计划数量很大的情况，
+                占用内存更少，安装 NumPy 时过滤使用向量化计算
+            time_ordered_ids: 新计划是否使用按创建时间排序的ID (UUIDv7 布局)。
+                已有的 uuid4 ID不受影响，两种ID可以共存
+            urgency: top_urgent 使用的紧急程度评分规则，不提供时使用默认权重
+            persist_indexes: 是否把建立好的ID、标签、截止日期和全文索引保存在
+                存储文件旁边的 .indexes 目录中，下次运行时直接读取。
+                索引随修改增量更新后重新保存，数据在别处被改动时自动重建
+            memory_queries: 存储后端支持直接查询时，是否仍然把全部计划加载到内存中
+                查询，查询不再读写存储
+            thread_safe: 是否允许多个线程共享同一个实例。启用后查询持有读锁，
+                可以同时进行；修改持有写锁，彼此互斥；保存在写锁之外进行，
+                同时到达的修改合并为一次保存。query 和 iter_plans 在读锁内
+                取完结果。plans 视图不加锁，多线程时请使用查询方法
+        """
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError("持久化级别必须为 none, batch 或 always")
+
+        if storage is None:
+            storage = JSONStorage(
+                storage_path,
+                journal=journal,
+                compact_bytes=compact_bytes,
+                compact_records=compact_records,
+            )
+        self.storage = storage
+        self.storage_path = storage.path
+        self.time_ordered_ids = time_ordered_ids
+        self.urgency = urgency or UrgencyScore()
+        self.memory_queries = memory_queries
+
+        # 内存中的计划按ID索引，字典保持添加顺序；
+        # 支持直接查询的后端按需加载全部数据。其他索引按需建立
+        self._indexes: Dict[str, PlanIndex] = {}
+        self._columnar = columnar
+        self._records: Optional[PlanRecords] = None
+        self._meta: Dict[str, Any] = {}
+
+        # 内存数据是否与存储一致，以及按顺序记下的尚未保存的修改；
+        # 索引旁路文件只在两者一致时读写，保存后修改写入旁路文件的变更日志
+        self._sidecar = IndexSidecar(self.storage_path) if persist_indexes else None
+        self._synced = False
+        self._changes: List[Change] = []
+
+        # plans 视图使用的计划对象缓存和按顺序排列的ID列表
+        self._plan_cache: Dict[str, Plan] = {}
+        self._id_list: Optional[List[str]] = None
+        if not storage.supports_queries:
+            self._set_data(self._load_plans())
+
+        # 事务嵌套深度和尚未持久化的变更记录
+        self._batch_depth = 0
+        self._pending: List[Dict] = []
+
+        # 内存数据的读写锁（非线程安全模式下读取不加锁），
+        # 建立索引等派生数据的锁，以及串行化保存的锁
+        self.thread_safe = thread_safe
+        self._lock: Optional[ReadWriteLock] = None
+        self._read_lock: ContextManager[Any]
+        self._write_lock: ContextManager[Any]
+        if thread_safe:
+            self._lock = ReadWriteLock()
+            self._read_lock = self._lock.reader
+            self._write_lock = self._lock.writer
+            # 只给线程安全的实例加锁，默认模式下查询没有额外开销
+            for name in READ_METHODS:
+                setattr(self, name, _locked(self._read_lock, getattr(self, name)))
+        else:
+            self._read_lock = nullcontext()
+            self._write_lock = threading.RLock()
+        self._derive_lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self.durability = durability
+        self._unflushed: List[Dict] = []
+        self._flusher: Optional[WriteBehindFlusher] = None
+        if write_behind and durability != "always":
+            # 未保存的修改只在内存中，查询必须基于内存数据
+            self._get_records()
+            self._flusher = WriteBehindFlusher(
+                self.flush, delay=flush_delay, max_delay=flush_max_delay
+            )
+            self._flusher.start()
+            # 解释器退出时保存尚未写入的修改
+            atexit.register(self.close)
+
+    def _set_data(self, data: Dict) -> PlanRecords:
+        """
+        用存储格式的计划数据替换内存中的计划
+
+        返回:
+            新的按ID索引的全部计划
+        """
+        records: PlanRecords
+        if self._columnar:
+            records = PlanTable(data["plans"])
+        else:
+            records = {plan["id"]: plan for plan in data["plans"]}
+        self._records = records
+        self._meta = {key: value for key, value in data.items() if key != "plans"}
+        self._clear_derived()
+        self._synced = True
+        self._changes = []
+        return records
+
+    def _clear_derived(self) -> None:
+        """清除由全部计划推导出的索引和缓存"""
+        self._indexes.clear()
+        self._plan_cache.clear()
+        self._id_list = None
+
+    def _get_records(self) -> PlanRecords:
+        """返回按ID索引的全部计划，首次访问时加载"""
+        records = self._records
+        if records is None:
+            # 多个读者可能同时首次访问
+            with self._derive_lock:
+                records = self._records
+                if records is None:
+                    records = self._set_data(self._load_plans())
+        return records
+
+    def _index(self, name: str, kind: Type[IndexT]) -> IndexT:
+        """
+        返回指定名称的索引，首次使用时根据全部计划建立
+
+        参数:
+            name: 索引名称，见 INDEX_TYPES
+            kind: 该名称的索引的类型
+
+        异常:
+            TypeError: 索引不是 kind 类型
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            index = self._build_index(name)
+        if not isinstance(index, kind):
+            raise TypeError(f"索引 {name} 的类型不是 {kind.__name__}")
+        return index
+
+    def _build_index(self, name: str) -> PlanIndex:
+        """建立指定名称的索引，优先从旁路文件恢复"""
+        records = self._get_records()
+        with self._derive_lock:
+            index = self._indexes.get(name)
+            if index is not None:
+                return index
+            index = INDEX_TYPES[name]()
+            sidecar = self._sidecar if index.persistent else None
+            # 内存数据与存储一致时才能使用旁路文件
+            generation = None if sidecar is None else self.generation
+            if sidecar is None or generation is None:
+                index.build(records.values())
+            elif not self._restore_index(sidecar, name, index, generation):
+                index.build(records.values())
+                sidecar.save(name, generation, index.state())
+            # 建立期间数据被整体替换（见 _rebase）时，索引只用于本次查询
+            if records is self._records:
+                self._indexes[name] = index
+        return index
+
+    @property
+    def generation(self) -> Optional[str]:
+        """
+        当前数据的版本标识，数据改变后随之改变
+
+        内存数据与存储一致时为存储的版本标识（见 StorageBackend.generation）；
+        有尚未保存的修改，或存储不提供版本标识时为 None
+        """
+        with self._read_lock:
+            if not self._synced or self._changes:
+                return None
+            return self.storage.generation
+
+    def _restore_index(
+        self, sidecar: IndexSidecar, name: str, index: PlanIndex, generation: str
+    ) -> bool:
+        """
+        从旁路文件恢复索引，并重放文件保存之后的修改
+
+        参数:
+            sidecar: 索引旁路文件
+            name: 索引名称
+            index: 要恢复的空索引
+            generation: 当前存储的版本标识
+
+        返回:
+            文件不存在、损坏或已过期时返回 False
+        """
+        loaded = sidecar.load(name, generation)
+        if loaded is None:
+            return False
+        state, changes = loaded
+        try:
+            index.restore(state)
+            for old, new in changes:
+                if new is None:
+                    if old is not None:
+                        index.remove(old)
+                elif old is None:
+                    index.add(new)
+                else:
+                    index.update(old, new)
+        except (KeyError, TypeError, ValueError):
+            return False
+        if changes:
+            # 保存追上当前版本的索引，下次不必再重放
+            sidecar.save(name, generation, index.state())
+        return True
+
+    def _record_changes(self, before: Optional[str], count: int) -> None:
+        """
+        保存成功后移除已保存的前 count 个修改，使用索引旁路文件时写入变更日志
+
+        参数:
+            before: 保存前存储的版本标识，内存数据与存储不一致时为 None
+            count: 本次保存包含的修改数
         """
-        self.storage_path = storage_path
-        self.plans_data = self._load_plans()
+        changes = self._changes[:count]
+        del self._changes[:count]
+        after = self.storage.generation
+        if self._sidecar is not None and before is not None and after is not None:
+            self._sidecar.record(before, after, changes)
+
+    def _apply(self, record: Dict) -> None:
+        """
+        将变更记录应用到内存中的计划，并维护已建立的索引
+
+        参数:
+            record: 变更记录
+        """
+        records = self._get_records()
+        plan_id = record["plan"]["id"] if "plan" in record else record.get("id", "")
+        old = records.get(plan_id)
+        apply_record(records, record)
+        new = records.get(plan_id)
+
+        self._plan_cache.pop(plan_id, None)
+        if (old is None) != (new is None):
+            self._id_list = None
+        if old is new:
+            return
+        self._changes.append((old, new))
+        try:
+            for index in self._indexes.values():
+                if old is None:
+                    if new is not None:
+                        index.add(new)
+                elif new is None:
+                    index.remove(old)
+                else:
+                    index.update(old, new)
+        except BaseException:
+            # 撤销内存中的修改，否则它既没有保存也不会被保存；
+            # 已经更新了一部分的索引全部丢弃，用到时重新建立
+            if old is None:
+                records.pop(plan_id, None)
+            else:
+                records[plan_id] = old
+            self._changes.pop()
+            self._clear_derived()
+            raise
+
+    def _snapshot(self) -> Dict:
+        """以存储格式返回当前全部计划数据"""
+        return dict(self._meta, plans=list(self._get_records().values()))
+
+    @property
+    def plans_data(self) -> Dict:
+        """全部计划数据，保持 {"plans": [...]} 的存储格式"""
+        with self._read_lock:
+            return self._snapshot()
+
+    @plans_data.setter
+    def plans_data(self, data: Dict) -> None:
+        # 外部导入的数据必须完整验证
+        for plan in data["plans"]:
+            Plan.from_dict(plan)
+        with self._write_lock:
+            self._set_data(data)
+            # 数据尚未保存，与存储中的不一致，也不再记录修改
+            self._synced = False
 
     def _load_plans(self) -> Dict:
-        """从存储文件加载计划"""
-        if os.path.exists(self.storage_path):
+        """
+        从存储后端加载计划
+
+        存储能证明数据由本程序写入且未被改动时直接使用，
+        否则逐个验证计划，并对无效的计划给出警告
+        """
+        data = self.storage.load()
+        if not self.storage.trusted:
+            for plan in data["plans"]:
+                try:
+                    Plan.from_dict(plan)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"警告：计划 {plan.get('id')} 的数据无效: {e}")
+        return data
+
+    def compact(self) -> Dict[str, int]:
+        """
+        整理存储：将日志压缩为新的快照并清空日志
+
+        返回:
+            整理掉的日志记录数和字节数
+        """
+        self.flush()
+        with self._io_lock:
+            while True:
+                with self._write_lock:
+                    before = self.storage.generation if self._synced else None
+                    count = len(self._changes)
+                    # 与 flush 相同，在写锁内取得不再变化的快照，
+                    # 写入文件期间其他线程可以继续读取和修改
+                    data = self._snapshot()
+                try:
+                    stats = self.storage.compact(lambda: data)
+                except StaleStoreError:
+                    # 其他进程的修改不能被压缩出的快照覆盖：
+                    # 在写锁之外重新加载，重放尚未保存的修改后再次压缩
+                    loaded = self._load_plans()
+                    with self._write_lock:
+                        self._rebase(self._unflushed, loaded)
+                    continue
+                with self._write_lock:
+                    # 压缩只改变存储的版本标识，计划数据不变
+                    self._record_changes(before, count)
+                    self._synced = True
+                return stats
+
+    def _rebase(self, records: List[Dict], data: Dict) -> None:
+        """
+        存储已被其他进程修改：在重新加载的数据上依次重放本进程尚未保存的修改
+
+        按计划合并：本进程修改过的计划以本进程的版本为准，其他计划保留其他进程的修改，
+        其他进程已经删除的计划上的更新被忽略。合并结果整体替换内存数据，
+        不在原数据上修改，不持有读锁的读取看到的是合并前或合并后的完整数据。
+        之后内存数据等于重新加载的数据加上 records。调用方持有写锁
+
+        参数:
+            records: 尚未保存的变更记录
+            data: 重新加载的存储数据
+        """
+        plans = {plan["id"]: plan for plan in data["plans"]}
+        changes: List[Change] = []
+        for record in records:
+            plan_id = record["plan"]["id"] if "plan" in record else record.get("id")
+            old = plans.get(plan_id)
+            apply_record(plans, record)
+            changes.append((old, plans.get(plan_id)))
+        data["plans"] = list(plans.values())
+        self._set_data(data)
+        self._changes = changes
+
+    def _write(self, record: Dict) -> None:
+        """
+        应用一条变更记录并持久化
+
+        参数:
+            record: 变更记录
+        """
+        with self._modifying():
+            if self._records is not None:
+                self._apply(record)
+
+            if self._batch_depth:
+                self._pending.append(record)
+            else:
+                self._persist([record])
+
+    @contextmanager
+    def _modifying(self) -> Iterator[None]:
+        """
+        在写锁内修改内存数据
+
+        线程安全模式下保存推迟到最外层的修改释放写锁之后，
+        等待写锁期间其他线程的修改一并保存
+        """
+        with self._write_lock:
+            yield
+        if (
+            self._lock is not None
+            and self._flusher is None
+            and self._unflushed
+            and not self._lock.write_held()
+        ):
+            self.flush()
+
+    def _persist(self, records: List[Dict]) -> None:
+        """
+        持久化变更记录：同步保存，或交给后台线程合并保存
+
+        线程安全模式下由 _modifying 在写锁之外保存
+
+        参数:
+            records: 已应用到内存数据的变更记录
+        """
+        if self._flusher is not None:
+            self._unflushed.extend(records)
+            self._flusher.notify()
+            return
+        if self._lock is not None and self._records is not None:
+            self._unflushed.extend(records)
+            return
+
+        before = self.storage.generation if self._synced else None
+        try:
+            foreign = self.storage.commit(
+                records, self._snapshot, durable=self.durability != "none"
+            )
+        except BaseException:
+            # 内存中已应用的修改没有保存，不再与存储一致
+            self._synced = False
+            raise
+        if foreign is None:
+            # 其他进程替换了快照，本进程的修改追加在它之后，重新加载即是合并的结果
+            self._set_data(self._load_plans())
+            return
+        if foreign:
+            # 存储中其他进程的修改在前、本进程的在后，内存中按同样的顺序重放
+            for record in foreign + records:
+                self._apply(record)
+        self._record_changes(before, len(self._changes))
+
+    def flush(self) -> None:
+        """立即保存后台写入模式或线程安全模式下尚未保存的修改"""
+        if self._flusher is None and self._lock is None:
+            return
+
+        with self._io_lock:
+            with self._write_lock:
+                records, self._unflushed = self._unflushed, []
+                if not records:
+                    return
+                # 保存期间的新修改留在列表末尾，保存后只记录本次包含的修改
+                before = self.storage.generation if self._synced else None
+                count = len(self._changes)
+                # 更新会替换整个计划字典，浅拷贝即可得到不再变化的快照，
+                # 保存期间其他线程可以继续修改内存数据
+                data = self._snapshot()
+
             try:
-                with open(self.storage_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"警告：计划文件 {self.storage_path} 损坏，创建新文件")
-                return {"plans": []}
-        return {"plans": []}
-
-    def _save_plans(self) -> None:
-        """保存计划到存储文件"""
-        with open(self.storage_path, "w", encoding="utf-8") as f:
-            json.dump(self.plans_data, f, indent=4, ensure_ascii=False)
+                foreign = self.storage.commit(
+                    records, lambda: data, durable=self.durability != "none"
+                )
+            except BaseException:
+                with self._write_lock:
+                    self._unflushed[:0] = records
+                raise
+
+            if foreign is None or (foreign and self._lock is None):
+                # 其他进程替换了快照，或者读取不加锁、不能在原数据上修改：
+                # 在写锁之外重新加载，重放尚未保存的修改后整体替换内存数据
+                loaded = self._load_plans()
+                with self._write_lock:
+                    self._rebase(self._unflushed, loaded)
+                return
+            with self._write_lock:
+                if not foreign:
+                    self._record_changes(before, count)
+                    return
+                for record in foreign + records:
+                    self._apply(record)
+                # 内存数据现在等于存储，之后只剩尚未保存的修改
+                self._changes = []
+                for record in self._unflushed:
+                    self._apply(record)
+
+    def close(self) -> None:
+        """停止后台写入线程并保存全部修改"""
+        if self._flusher is not None:
+            self._flusher.stop()
+            self.flush()
+            self._flusher = None
+            atexit.unregister(self.close)
+
+    def _query_storage(self) -> Optional[SQLiteStorage]:
+        """
+        返回直接执行查询的存储后端
+
+        返回:
+            支持查询的存储后端；不支持查询，或有只在内存里的未保存变更时返回 None
+        """
+        storage = self.storage
+        if (
+            isinstance(storage, SQLiteStorage)
+            and storage.supports_queries
+            and not self.memory_queries
+            and not self._batch_depth
+            and not self._unflushed
+        ):
+            return storage
+        return None
+
+    @contextmanager
+    def transaction(self) -> Iterator["PlanManager"]:
+        """
+        批量修改计划，退出时只保存一次
+
+        事务内的修改只作用于内存；正常退出时验证并一次性保存全部修改，
+        发生异常时回滚到事务开始前的状态。嵌套的事务并入最外层事务。
+
+        用法:
+            with manager.transaction():
+                for title in titles:
+                    manager.add_plan(title, "")
+        """
+        with self._modifying():
+            if self._batch_depth:
+                self._batch_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._batch_depth -= 1
+                return
+
+            # 记录的更新会替换整个计划字典，浅拷贝即可回滚
+            saved = self._get_records().copy()
+            saved_changes = len(self._changes)
+            self._batch_depth = 1
+            self._pending = []
+            try:
+                yield self
+                for record in self._pending:
+                    if "plan" in record:
+                        Plan.from_dict(record["plan"])
+                if self._pending:
+                    self._persist(self._pending)
+            except BaseException:
+                self._records = saved
+                self._clear_derived()
+                del self._changes[saved_changes:]
+                raise
+            finally:
+                self._batch_depth = 0
+                self._pending = []
+
+    batch = transaction
 
     def add_plan(
         self,
@@ -45,7 +681,8 @@ class PlanManager:
         description: str,
         deadline: Optional[str] = None,
         priority: str = "medium",
-        tags: List[str] = None,
+        tags: Optional[List[str]] = None,
+        time_ordered: Optional[bool] = None,
     ) -> str:
         """
         添加新计划
@@ -56,18 +693,28 @@ class PlanManager:
             deadline: 截止日期 (YYYY-MM-DD 格式)
             priority: 优先级 (low, medium, high)
             tags: 标签列表
+            time_ordered: 是否使用按创建时间排序的ID，None 表示按 time_ordered_ids
 
         返回:
             新计划的ID
         """
-        # 创建新计划对象
-        plan = Plan(title, description, deadline, priority, tags)
+        if time_ordered is None:
+            time_ordered = self.time_ordered_ids
+        # 创建新计划对象；按时间排序的ID与创建时间取自同一时刻
+        plan_id = time_ordered_id() if time_ordered else None
+        created_at = id_created_at(plan_id) if plan_id else None
+        plan = Plan(
+            title,
+            description,
+            deadline,
+            priority,
+            tags,
+            plan_id=plan_id,
+            created_at=created_at,
+        )
 
-        # 将计划转换为字典并添加到数据中
-        self.plans_data["plans"].append(plan.to_dict())
-
-        # 保存到文件
-        self._save_plans()
+        # 将计划转换为字典，添加到数据中并保存
+        self._write({"op": "add", "plan": plan.to_dict()})
 
         return plan.id
 
@@ -81,12 +728,13 @@ class PlanManager:
         返回:
             是否成功删除
         """
-        for i, plan_dict in enumerate(self.plans_data["plans"]):
-            if plan_dict["id"] == plan_id:
-                del self.plans_data["plans"][i]
-                self._save_plans()
-                return True
-        return False
+        # 查找和删除在同一次持有写锁期间完成
+        with self._modifying():
+            if self.get_plan_by_id(plan_id) is None:
+                return False
+
+            self._write({"op": "delete", "id": plan_id})
+            return True
 
     def update_plan(self, plan_id: str, **kwargs) -> bool:
         """
@@ -94,61 +742,171 @@ class PlanManager:
 
         参数:
             plan_id: 计划ID
-            **kwargs: 要更新的字段
+            **kwargs: 要更新的字段，见 EDITABLE_FIELDS
 
         返回:
             是否成功更新
         """
-        for plan_dict in self.plans_data["plans"]:
-            if plan_dict["id"] == plan_id:
-                # 创建计划对象进行验证
-                plan = Plan.from_dict(plan_dict)
+        # 读取、修改和写回在同一次持有写锁期间完成，并发的更新不会互相覆盖
+        with self._modifying():
+            plan_dict = self.get_plan_by_id(plan_id)
+            if plan_dict is None:
+                return False
 
-                # 更新属性
-                for key, value in kwargs.items():
-                    if hasattr(plan, key) and key != "id" and key != "created_at":
-                        setattr(plan, key, value)
+            # 创建计划对象进行验证
+            plan = Plan.from_dict(plan_dict)
 
-                # 验证数据有效性
-                plan.validate()
+            # 更新属性，只接受可以修改的字段；其他参数（包括计划对象的内部属性）忽略
+            for key in EDITABLE_FIELDS:
+                if key in kwargs:
+                    setattr(plan, key, kwargs[key])
 
-                # 更新字典并保存
-                updated_dict = plan.to_dict()
-                for key, value in updated_dict.items():
-                    plan_dict[key] = value
+            # 验证数据有效性
+            plan.validate()
 
-                self._save_plans()
-                return True
-        return False
+            # 更新字典并保存
+            self._write({"op": "update", "plan": plan.to_dict()})
+            return True
 
     def get_plans(
-        self, tags: List[str] = None, priority: str = None, completed: bool = None
+        self,
+        tags: Optional[List[str]] = None,
+        priority: Optional[str] = None,
+        completed: Optional[bool] = None,
+        all_tags: Optional[List[str]] = None,
+        not_tags: Optional[List[str]] = None,
+        deadline_from: Optional[str] = None,
+        deadline_to: Optional[str] = None,
+        order_by: Optional[str] = None,
+        text: Optional[str] = None,
     ) -> List[Dict]:
         """
         获取符合条件的计划
 
         参数:
-            tags: 标签过滤
+            tags: 标签过滤，带有其中任一标签即可 (OR)
             priority: 优先级过滤
             completed: 完成状态过滤
+            all_tags: 标签过滤，必须带有全部标签 (AND)
+            not_tags: 标签过滤，不能带有其中任何标签 (NOT)
+            deadline_from: 截止日期不早于该日期 (YYYY-MM-DD)
+            deadline_to: 截止日期不晚于该日期 (YYYY-MM-DD)
+            order_by: 排序方式 (None 按添加顺序，deadline 按截止日期，
+                没有截止日期的排在最后；id 按ID)
+            text: 标题或描述中包含的文字，不区分大小写
 
         返回:
             符合条件的计划列表
         """
-        result = self.plans_data["plans"]
+        plan_filter = PlanFilter(
+            tags,
+            priority,
+            completed,
+            all_tags=all_tags,
+            not_tags=not_tags,
+            deadline_from=deadline_from,
+            deadline_to=deadline_to,
+            text=text,
+            order_by=order_by,
+        )
+        return list(self.query(plan_filter))
+
+    def iter_plans(
+        self,
+        plan_filter: Optional[PlanFilter] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """
+        逐个产出符合条件的计划，支持键集分页
 
-        if tags:
-            result = [
-                plan for plan in result if any(tag in plan["tags"] for tag in tags)
-            ]
+        结果边查询边产出，只取前几个结果时不必构建完整的列表。
+        游标是上一页最后一个计划的ID，翻页时从它在排序中的位置之后继续，
+        不受其他计划增删的影响
 
-        if priority:
-            result = [plan for plan in result if plan["priority"] == priority]
+        用法:
+            page = list(manager.iter_plans(plan_filter, limit=50))
+            while page:
+                ...
+                page = list(
+                    manager.iter_plans(plan_filter, limit=50, after=page[-1]["id"])
+                )
 
-        if completed is not None:
-            result = [plan for plan in result if plan["completed"] == completed]
+        参数:
+            plan_filter: 查询条件，None 表示全部计划
+            order_by: 排序方式，提供时覆盖 plan_filter.order_by
+            limit: 最多产出的数量，None 表示不限
+            after: 分页游标，即上一页最后一个计划的ID
 
-        return result
+        返回:
+            计划字典的迭代器
+
+        异常:
+            ValueError: 排序方式无效，或游标对应的计划不存在
+        """
+        if plan_filter is None:
+            plan_filter = PlanFilter(order_by=order_by)
+        elif order_by is not None:
+            plan_filter = plan_filter.replace(order_by=order_by)
+        return self.query(plan_filter, after=after, limit=limit)
+
+    def query(
+        self,
+        plan_filter: PlanFilter,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """
+        按查询条件逐个返回计划
+
+        查询从估计匹配数最少的索引条件出发，其余条件在索引上逐个判断，
+        结果按 plan_filter.order_by 指定的顺序输出。
+
+        参数:
+            plan_filter: 查询条件
+            after: 分页游标，即上一页最后一个计划的ID
+            limit: 最多返回的数量
+
+        返回:
+            计划字典的迭代器
+
+        异常:
+            ValueError: 游标对应的计划不存在
+        """
+        storage = self._query_storage()
+        if storage is not None:
+            results = iter(storage.query(plan_filter, after, limit))
+        else:
+            records = self._get_records()
+            if isinstance(records, PlanTable):
+                results = iter(records.query(plan_filter, after, limit))
+            else:
+                query = plan_query(plan_filter, records, self._index, limit)
+                results = query.execute(after)
+        if self._lock is not None:
+            # 结果在读锁内取完，迭代时不受其他线程的修改影响
+            return iter(list(results))
+        return results
+
+    def explain(self, plan_filter: PlanFilter, limit: Optional[int] = None) -> str:
+        """
+        说明查询会如何执行，用于诊断较慢的查询
+
+        参数:
+            plan_filter: 查询条件
+            limit: 最多需要的结果数，会影响执行方式的选择
+
+        返回:
+            多行说明文字
+        """
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.explain(plan_filter, limit)
+        records = self._get_records()
+        if isinstance(records, PlanTable):
+            return records.explain(plan_filter)
+        return plan_query(plan_filter, records, self._index, limit).explain()
 
     def get_plan_by_id(self, plan_id: str) -> Optional[Dict]:
         """
@@ -160,10 +918,88 @@ class PlanManager:
         返回:
             计划字典，如果不存在则返回None
         """
-        for plan in self.plans_data["plans"]:
-            if plan["id"] == plan_id:
-                return plan
-        return None
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.get_plan_by_id(plan_id)
+
+        return self._get_records().get(plan_id)
+
+    def find_plan_ids(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """
+        查找ID以指定前缀开头的计划
+
+        参数:
+            prefix: ID前缀
+            limit: 最多返回的数量
+
+        返回:
+            按字典序排列的匹配ID
+        """
+        if not prefix:
+            return []
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.find_plan_ids(prefix, limit)
+        return self._index("prefix", PrefixIndex).find(prefix, limit)
+
+    def resolve_plan_id(self, id_or_prefix: str) -> Optional[str]:
+        """
+        将完整ID或唯一的ID前缀解析为完整ID
+
+        参数:
+            id_or_prefix: 完整ID或ID前缀
+
+        返回:
+            完整的计划ID，如果不存在则返回None
+
+        异常:
+            AmbiguousPlanIdError: 前缀匹配到多个计划
+        """
+        if self.get_plan_by_id(id_or_prefix) is not None:
+            return id_or_prefix
+
+        # 多取一些候选，便于在报错时列出
+        candidates = self.find_plan_ids(id_or_prefix, limit=10)
+        if not candidates:
+            return None
+        if len(candidates) > 1:
+            raise AmbiguousPlanIdError(id_or_prefix, candidates)
+        return candidates[0]
+
+    def get_plans_created_since(
+        self,
+        since: Optional[str] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        按ID顺序获取创建时间不早于指定时间的计划，支持键集分页
+
+        使用按时间排序的ID时，ID顺序就是创建顺序，ID索引同时充当创建时间索引
+
+        参数:
+            since: 创建时间下限 (YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS)，None 表示不限
+            after: 上一页最后一个计划的ID，只返回ID比它大的计划
+            limit: 最多返回的数量
+
+        返回:
+            按ID排列的计划列表
+
+        异常:
+            ValueError: 时间格式无效
+        """
+        moment = parse_datetime(since)
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.get_plans_created_since(moment, after, limit)
+
+        records = self._get_records()
+        return [
+            records[plan_id]
+            for plan_id in self._index("prefix", PrefixIndex).created_since(
+                moment, after, limit
+            )
+        ]
 
     def get_upcoming_deadlines(self, days: int = 7) -> List[Dict]:
         """
@@ -175,19 +1011,137 @@ class PlanManager:
         返回:
             未来指定天数内到期的计划列表
         """
-        today = datetime.datetime.now().date()
-        future = today + datetime.timedelta(days=days)
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.get_upcoming_deadlines(days)
 
-        result = []
-        for plan in self.plans_data["plans"]:
-            if not plan["deadline"] or plan["completed"]:
-                continue
+        today = datetime.datetime.now().date().toordinal()
+        return self._deadline_range(today, today + days)
+
+    def get_overdue_plans(self) -> List[Dict]:
+        """
+        获取已过期的计划
+
+        返回:
+            截止日期早于今天且尚未完成的计划，按截止日期排列
+        """
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.get_overdue_plans()
 
-            deadline = datetime.datetime.strptime(plan["deadline"], "%Y-%m-%d").date()
-            if today <= deadline <= future:
+        today = datetime.datetime.now().date().toordinal()
+        return self._deadline_range(None, today - 1)
+
+    def _deadline_range(self, start: Optional[int], end: Optional[int]) -> List[Dict]:
+        """按截止日期排列返回范围内尚未完成的计划"""
+        records = self._get_records()
+        if isinstance(records, PlanTable):
+            return records.deadline_range(start, end)
+
+        result = []
+        for plan_id in self._index("deadline", DeadlineIndex).range(start, end):
+            plan = records[plan_id]
+            if not plan["completed"]:
                 result.append(plan)
+        return result
+
+    def top_urgent(
+        self, k: int = 10, now: Optional[datetime.date] = None
+    ) -> List[Tuple[Dict, float]]:
+        """
+        获取最紧急的 k 个未完成计划
+
+        按截止日期顺序扫描并用有界堆保留前 k 个，
+        剩余计划的评分上限不超过当前第 k 名时提前结束，不对全部计划排序
+
+        参数:
+            k: 数量
+            now: 计算紧急程度使用的日期或时间，默认为当前时间
+
+        返回:
+            按紧急程度从高到低排列的 (计划字典, 评分)
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        if isinstance(now, datetime.datetime):
+            now = now.date()
+        today = now.toordinal()
+        if k <= 0:
+            return []
 
-        return sorted(result, key=lambda x: x["deadline"])
+        storage = self._query_storage()
+        if storage is not None:
+            candidates = storage.urgent_candidates(k)
+            return top_by_scan(candidates, k, today, self.urgency)
+
+        records = self._get_records()
+        if isinstance(records, PlanTable):
+            dated, undated = records.open_by_deadline()
+        else:
+            index = self._index("deadline", DeadlineIndex)
+            dated = (
+                (records[plan_id], ordinal)
+                for ordinal, plan_id in index.scan(end=UNDATED - 1)
+                if not records[plan_id]["completed"]
+            )
+            undated = (
+                records[plan_id]
+                for _, plan_id in index.scan(UNDATED)
+                if not records[plan_id]["completed"]
+            )
+        return top_by_deadline(dated, undated, k, today, self.urgency)
+
+    def search(self, query: str, limit: Optional[int] = 20) -> List[Tuple[Dict, float]]:
+        """
+        在标题和描述中全文检索计划
+
+        中文等按相邻两个字符切分，英文和数字按单词切分；全文索引在首次检索时建立，
+        之后随每次修改增量维护。包含任一检索词的计划都会返回，按 BM25 评分排列
+
+        参数:
+            query: 查询文本
+            limit: 最多返回的数量，None 表示全部
+
+        返回:
+            按相关程度从高到低排列的 (计划字典, 评分)
+        """
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.search(query, limit)
+
+        records = self._get_records()
+        return [
+            (records[plan_id], score)
+            for plan_id, score in self._index("search", SearchIndex).search(
+                query, limit
+            )
+        ]
+
+    def stats(self, now: Optional[datetime.date] = None, days: int = 7) -> Dict:
+        """
+        获取计划的汇总统计
+
+        计数在每次修改时增量维护，调用时不扫描全部计划
+
+        参数:
+            now: 判断过期和即将到期使用的日期或时间，默认为当前时间
+            days: 即将到期的天数，与 get_upcoming_deadlines 相同
+
+        返回:
+            汇总字典，包含 total、completed、open、overdue（已过期且未完成）、
+            due_this_week（未来 days 天内到期且未完成）、
+            by_priority（各优先级的计划数）和 by_tag（各标签的计划数）
+        """
+        if now is None:
+            now = datetime.datetime.now()
+        if isinstance(now, datetime.datetime):
+            now = now.date()
+        today = now.toordinal()
+
+        storage = self._query_storage()
+        if storage is not None:
+            return storage.stats(today, days)
+        return self._index("stats", StatsIndex).summary(today, days)
 
     def complete_plan(self, plan_id: str) -> bool:
         """
@@ -201,7 +1155,45 @@ class PlanManager:
         """
         return self.update_plan(plan_id, completed=True)
 
+    def _plan_ids(self) -> List[str]:
+        """按添加顺序排列的全部计划ID，增删计划后重新生成"""
+        if self._id_list is None:
+            self._id_list = list(self._get_records())
+        return self._id_list
+
+    def _plan_object(
+        self, plan_id: str, plan_dict: Optional[Dict] = None
+    ) -> Optional[Plan]:
+        """
+        返回计划对象，优先使用缓存
+
+        参数:
+            plan_id: 计划ID
+            plan_dict: 已经取得的计划字典，省去一次查找
+
+        返回:
+            计划对象，计划不存在时返回 None
+        """
+        if self._records is None and plan_dict is not None:
+            # 数据只在存储后端，修改不经过内存，不能缓存
+            return Plan.from_dict(plan_dict, validate=False)
+
+        plan = self._plan_cache.get(plan_id)
+        if plan is None:
+            if plan_dict is None:
+                plan_dict = self._get_records().get(plan_id)
+                if plan_dict is None:
+                    return None
+            # 内存中的计划在写入时已经验证过，无需再次验证
+            plan = Plan.from_dict(plan_dict, validate=False)
+            self._plan_cache[plan_id] = plan
+        return plan
+
     @property
-    def plans(self) -> List[Plan]:
-        """返回所有计划对象列表"""
-        return [Plan.from_dict(plan_dict) for plan_dict in self.plans_data["plans"]]
+    def plans(self) -> PlanView:
+        """
+        所有计划对象的只读序列视图
+
+        计划对象在访问时才构建并缓存，修改计划后对应的缓存自动失效
+        """
+        return PlanView(self)
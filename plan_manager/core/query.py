@@ -0,0 +1,469 @@
+"""
+查询规划 - 根据索引基数选择最有选择性的条件驱动计划查询
+
+查询条件由 PlanFilter 描述。规划时估算每个可用索引的条件能匹配多少计划，
+从最小的候选集合出发，其余条件逐个在索引上做成员判断，最后按要求的顺序输出。
+"""
+
+import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Type,
+)
+
+from ..models.plan import CREATED_AT_FORMAT
+from .indexes import (
+    DeadlineIndex,
+    IndexT,
+    OrderIndex,
+    SortKey,
+    TagIndex,
+    ValueIndex,
+    date_ordinal,
+)
+
+# 支持的排序方式：None 按添加顺序，deadline 按截止日期，
+# id 按ID（使用按时间排序的ID时即创建顺序）
+ORDER_BY = (None, "deadline", "id")
+
+# 排序方式对应的索引
+ORDER_INDEXES = {None: "sequence", "deadline": "deadline", "id": "prefix"}
+
+# 候选集合超过全部计划的该比例时，直接按输出顺序扫描，避免对大集合排序
+SCAN_RATIO = 0.25
+
+
+class IndexGetter(Protocol):
+    """按名称获取索引的函数，索引在首次使用时建立"""
+
+    def __call__(self, name: str, kind: Type[IndexT]) -> IndexT:
+        """
+        返回指定名称的索引
+
+        参数:
+            name: 索引名称，见 INDEX_TYPES
+            kind: 该名称的索引的类型
+
+        异常:
+            TypeError: 索引不是 kind 类型
+        """
+        ...
+
+
+def parse_date(value: Optional[str]) -> Optional[int]:
+    """
+    解析查询条件中的日期
+
+    参数:
+        value: YYYY-MM-DD 格式的日期，可以为 None
+
+    返回:
+        日期序数，未提供日期时返回 None
+    """
+    if not value:
+        return None
+    try:
+        return date_ordinal(value)
+    except ValueError:
+        raise ValueError(f"日期 {value} 格式必须为 YYYY-MM-DD")
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime.datetime]:
+    """
+    解析查询条件中的时间
+
+    参数:
+        value: YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS 格式的时间，可以为 None
+
+    返回:
+        不带时区的本地时间，只提供日期时为当天零点；未提供时返回 None
+    """
+    if not value:
+        return None
+    for fmt in (CREATED_AT_FORMAT, "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"时间 {value} 格式必须为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS")
+
+
+class PlanFilter:
+    """计划查询条件，所有条件同时满足才算匹配"""
+
+    def __init__(
+        self,
+        tags: Optional[List[str]] = None,
+        priority: Optional[str] = None,
+        completed: Optional[bool] = None,
+        all_tags: Optional[List[str]] = None,
+        not_tags: Optional[List[str]] = None,
+        deadline_from: Optional[str] = None,
+        deadline_to: Optional[str] = None,
+        text: Optional[str] = None,
+        order_by: Optional[str] = None,
+    ) -> None:
+        """
+        初始化查询条件
+
+        参数:
+            tags: 带有其中任一标签即可 (OR)
+            priority: 优先级
+            completed: 完成状态
+            all_tags: 必须带有全部标签 (AND)
+            not_tags: 不能带有其中任何标签 (NOT)
+            deadline_from: 截止日期不早于该日期 (YYYY-MM-DD)
+            deadline_to: 截止日期不晚于该日期 (YYYY-MM-DD)
+            text: 标题或描述中包含的文字，不区分大小写
+            order_by: 排序方式 (None 按添加顺序，deadline 按截止日期，
+                没有截止日期的排在最后；id 按ID)
+        """
+        if order_by not in ORDER_BY:
+            raise ValueError("排序方式必须为 deadline、id 或不指定")
+
+        self.tags = tags
+        self.priority = priority
+        self.completed = completed
+        self.all_tags = all_tags
+        self.not_tags = not_tags
+        self.deadline_from = deadline_from
+        self.deadline_to = deadline_to
+        self.text = text
+        self.order_by = order_by
+
+        # 预先解析日期，格式无效时尽早报错
+        self.start = parse_date(deadline_from)
+        self.end = parse_date(deadline_to)
+
+    def replace(self, **changes) -> "PlanFilter":
+        """
+        返回修改了部分条件的新查询条件
+
+        参数:
+            **changes: 要修改的条件，与构造函数的参数同名
+
+        返回:
+            新的查询条件
+        """
+        fields = {
+            key: value
+            for key, value in vars(self).items()
+            if key not in ("start", "end")
+        }
+        fields.update(changes)
+        return PlanFilter(**fields)
+
+    def __repr__(self) -> str:
+        """返回只列出已设置条件的表示"""
+        fields = ", ".join(
+            f"{key}={value!r}"
+            for key, value in vars(self).items()
+            if value is not None and key not in ("start", "end")
+        )
+        return f"PlanFilter({fields})"
+
+
+class Condition:
+    """查询计划中的一个条件"""
+
+    def __init__(
+        self,
+        description: str,
+        estimate: int,
+        contains: Callable[[str], bool],
+        ids: Optional[Callable[[], Iterable[str]]] = None,
+        ordered: bool = False,
+    ) -> None:
+        """
+        初始化条件
+
+        参数:
+            description: 在 explain 中显示的条件描述
+            estimate: 估计匹配的计划数
+            contains: 判断计划ID是否满足条件
+            ids: 返回全部满足条件的计划ID，没有时不能作为驱动条件
+            ordered: ids 是否已按截止日期排列
+        """
+        self.description = description
+        self.estimate = estimate
+        self.contains = contains
+        self.ids = ids
+        self.ordered = ordered
+
+
+class QueryPlan:
+    """规划好的查询，可以执行或输出说明"""
+
+    def __init__(
+        self,
+        plan_filter: PlanFilter,
+        records: Dict[str, Dict],
+        order: OrderIndex,
+        driver: Optional[Condition],
+        filters: List[Condition],
+        residual: List[Callable[[Dict], bool]],
+        limit: Optional[int] = None,
+    ) -> None:
+        """
+        初始化查询计划
+
+        参数:
+            plan_filter: 查询条件
+            records: 按ID索引的全部计划
+            order: 输出顺序对应的索引
+            driver: 驱动条件，None 表示按输出顺序扫描
+            filters: 逐个判断的索引条件
+            residual: 逐条判断计划字典的条件
+            limit: 最多产出的结果数，None 表示全部
+
+        异常:
+            ValueError: 驱动条件不能列出匹配的计划ID
+        """
+        if driver is not None and driver.ids is None:
+            raise ValueError(f"条件 {driver.description} 不能作为驱动条件")
+        self.filter = plan_filter
+        self.records = records
+        self.order = order
+        self.driver = driver
+        self.filters = filters
+        self.residual = residual
+        self.limit = limit
+
+    @property
+    def strategy(self) -> str:
+        """执行方式：scan 按输出顺序扫描，index 从驱动条件的候选集合出发"""
+        return "scan" if self.driver is None else "index"
+
+    @property
+    def needs_sort(self) -> bool:
+        """候选结果是否还需要按输出顺序排序"""
+        if self.driver is None:
+            return False
+        return not (self.driver.ordered and self.filter.order_by == "deadline")
+
+    def _matches(self, plan_id: str) -> bool:
+        """判断计划ID是否满足全部索引条件"""
+        return all(condition.contains(plan_id) for condition in self.filters)
+
+    def execute(self, after: Optional[str] = None) -> Iterator[Dict]:
+        """
+        执行查询，按要求的顺序逐个产出计划字典
+
+        按输出顺序扫描时边遍历边产出，只取前几个结果时无需遍历全部计划
+
+        参数:
+            after: 分页游标，即上一页最后一个计划的ID，从它之后开始输出
+
+        返回:
+            计划字典的迭代器
+
+        异常:
+            ValueError: 游标对应的计划不存在
+        """
+        cursor: Optional[SortKey] = None
+        if after is not None:
+            try:
+                cursor = self.order.key(after)
+            except KeyError:
+                raise ValueError(f"分页游标 {after} 对应的计划不存在")
+        return self._execute(after, cursor)
+
+    def _execute(
+        self, after: Optional[str], cursor: Optional[SortKey]
+    ) -> Iterator[Dict]:
+        """生成 execute 的结果"""
+        # 有驱动条件时它一定能列出匹配的计划ID，见 __init__
+        source = None if self.driver is None else self.driver.ids
+        if source is None:
+            ids: Iterable[str] = self.order.ordered_from(after)
+        else:
+            ids = (plan_id for plan_id in source() if self._matches(plan_id))
+            if cursor is not None:
+                # 同一个索引的排序键类型相同，可以比较
+                key: Callable[[str], Any] = self.order.key
+                ids = (plan_id for plan_id in ids if key(plan_id) > cursor)
+            if self.needs_sort:
+                ids = self.order.sort(ids)
+
+        if self.limit is not None and self.limit <= 0:
+            return
+        records = self.records
+        check = self._matches if self.driver is None and self.filters else None
+        residual = self.residual
+        produced = 0
+        for plan_id in ids:
+            if check is not None and not check(plan_id):
+                continue
+            plan = records.get(plan_id)
+            if plan is None:
+                continue
+            if not residual or all(predicate(plan) for predicate in residual):
+                yield plan
+                produced += 1
+                if produced == self.limit:
+                    return
+
+    def explain(self) -> str:
+        """
+        以文字说明查询的执行方式
+
+        返回:
+            多行说明文字
+        """
+        lines = [f"查询计划（共 {len(self.records)} 个计划）"]
+        if self.driver is None:
+            if self.limit is None:
+                lines.append("  执行方式: 按输出顺序扫描全部计划")
+            else:
+                lines.append(
+                    f"  执行方式: 按输出顺序扫描，找到 {self.limit} 个结果即停止"
+                )
+        else:
+            lines.append("  执行方式: 从驱动条件的索引出发")
+            lines.append(
+                f"  驱动条件: {self.driver.description}（约 {self.driver.estimate} 个）"
+            )
+        for condition in self.filters:
+            lines.append(
+                f"  索引过滤: {condition.description}（约 {condition.estimate} 个）"
+            )
+        if self.filter.text:
+            lines.append(f"  逐条过滤: 标题或描述包含 {self.filter.text!r}")
+
+        order = {None: "添加顺序", "deadline": "截止日期", "id": "ID"}[
+            self.filter.order_by
+        ]
+        if self.needs_sort:
+            lines.append(f"  排序: 按{order}排列候选结果")
+        else:
+            lines.append(f"  排序: 按{order}输出，无需排序")
+        return "\n".join(lines)
+
+
+def plan_query(
+    plan_filter: PlanFilter,
+    records: Dict[str, Dict],
+    index: IndexGetter,
+    limit: Optional[int] = None,
+) -> QueryPlan:
+    """
+    为查询条件选择执行方式
+
+    参数:
+        plan_filter: 查询条件
+        records: 按ID索引的全部计划
+        index: 按名称获取索引的函数，索引在首次使用时建立
+        limit: 最多需要的结果数，None 表示全部
+
+    返回:
+        查询计划
+    """
+    conditions: List[Condition] = []
+
+    if plan_filter.priority:
+        ids = index("priority", ValueIndex).ids(plan_filter.priority)
+        conditions.append(
+            Condition(
+                f"优先级 = {plan_filter.priority}",
+                len(ids),
+                ids.__contains__,
+                ids.__iter__,
+            )
+        )
+
+    if plan_filter.completed is not None:
+        ids = index("completed", ValueIndex).ids(plan_filter.completed)
+        conditions.append(
+            Condition(
+                "已完成" if plan_filter.completed else "未完成",
+                len(ids),
+                ids.__contains__,
+                ids.__iter__,
+            )
+        )
+
+    for tag in dict.fromkeys(plan_filter.all_tags or ()):
+        ids = index("tags", TagIndex).ids(tag)
+        conditions.append(
+            Condition(f"带有标签 {tag}", len(ids), ids.__contains__, ids.__iter__)
+        )
+
+    if plan_filter.tags:
+        any_tags = plan_filter.tags
+        tags = index("tags", TagIndex)
+        tag_sets = [tags.ids(tag) for tag in dict.fromkeys(any_tags)]
+        conditions.append(
+            Condition(
+                f"带有任一标签 {', '.join(any_tags)}",
+                # 各标签集合大小之和是并集大小的上限
+                sum(len(ids) for ids in tag_sets),
+                lambda plan_id: any(plan_id in ids for ids in tag_sets),
+                lambda: tags.union(any_tags),
+            )
+        )
+
+    start, end = plan_filter.start, plan_filter.end
+    if start is not None or end is not None:
+        deadlines = index("deadline", DeadlineIndex)
+        conditions.append(
+            Condition(
+                "截止日期在 "
+                f"{plan_filter.deadline_from or '不限'} 至 "
+                f"{plan_filter.deadline_to or '不限'} 之间",
+                deadlines.count(start, end),
+                lambda plan_id: deadlines.contains(plan_id, start, end),
+                lambda: deadlines.range(start, end),
+                ordered=True,
+            )
+        )
+
+    order = index(ORDER_INDEXES[plan_filter.order_by], OrderIndex)
+
+    # 选择估计匹配数最少的条件驱动查询，其余条件按选择性从高到低判断
+    conditions.sort(key=lambda condition: condition.estimate)
+    driver: Optional[Condition] = None
+    if conditions:
+        driver = conditions[0]
+        sorted_output = driver.ordered and plan_filter.order_by == "deadline"
+        if not sorted_output and driver.estimate > len(records) * SCAN_RATIO:
+            # 候选集合很大时排序的代价超过顺序扫描
+            driver = None
+        elif (
+            not sorted_output
+            and limit is not None
+            and limit * len(records) < driver.estimate**2
+        ):
+            # 只需要前几个结果时，按输出顺序扫描约 limit * 总数 / 候选数 个计划
+            # 就能找齐，比取出并排序全部候选更快
+            driver = None
+    filters = conditions if driver is None else conditions[1:]
+
+    if plan_filter.not_tags:
+        excluded = [
+            index("tags", TagIndex).ids(tag)
+            for tag in dict.fromkeys(plan_filter.not_tags)
+        ]
+        filters.append(
+            Condition(
+                f"不带标签 {', '.join(plan_filter.not_tags)}",
+                max(len(records) - sum(len(ids) for ids in excluded), 0),
+                lambda plan_id: not any(plan_id in ids for ids in excluded),
+            )
+        )
+
+    residual: List[Callable[[Dict], bool]] = []
+    if plan_filter.text:
+        text = plan_filter.text.lower()
+        residual.append(
+            lambda plan: text in plan["title"].lower()
+            or text in (plan.get("description") or "").lower()
+        )
+
+    return QueryPlan(plan_filter, records, order, driver, filters, residual, limit)
@@ -0,0 +1,105 @@
+"""
+读写锁 - 多个读者可以同时持有，写者独占
+"""
+
+import threading
+from typing import Callable, Dict, Optional
+
+
+class _LockSide:
+    """读写锁的一侧，可以用在 with 语句中"""
+
+    def __init__(self, acquire: Callable[[], None], release: Callable[[], None]):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self) -> None:
+        self.acquire()
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class ReadWriteLock:
+    """
+    写者优先的可重入读写锁
+
+    有写者等待时新的读者排队，持续的读取不会让写者饿死。两侧都可以重入，
+    持有写锁的线程还可以获取读锁；持有读锁时获取写锁会互相等待，因此直接报错。
+
+    用法:
+        lock = ReadWriteLock()
+        with lock.reader:
+            ...
+        with lock.writer:
+            ...
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        # 各线程持有读锁的次数
+        self._readers: Dict[int, int] = {}
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self.reader = _LockSide(self.acquire_read, self.release_read)
+        self.writer = _LockSide(self.acquire_write, self.release_write)
+
+    def acquire_read(self) -> None:
+        """获取读锁，有写者持有或等待时阻塞"""
+        me = threading.get_ident()
+        with self._cond:
+            # 已持有任一侧时直接重入，否则等待中的写者会让自己死锁
+            if me not in self._readers and self._writer != me:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+
+    def release_read(self) -> None:
+        """释放读锁"""
+        me = threading.get_ident()
+        with self._cond:
+            count = self._readers[me] - 1
+            if count:
+                self._readers[me] = count
+            else:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        """
+        获取写锁，等待所有读者和其他写者释放
+
+        异常:
+            RuntimeError: 当前线程持有读锁
+        """
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("持有读锁时不能获取写锁")
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._write_depth = 1
+
+    def release_write(self) -> None:
+        """释放写锁"""
+        with self._cond:
+            if self._writer != threading.get_ident():
+                raise RuntimeError("当前线程没有持有写锁")
+            self._write_depth -= 1
+            if not self._write_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    def write_held(self) -> bool:
+        """当前线程是否持有写锁"""
+        return self._writer == threading.get_ident()
@@ -0,0 +1,108 @@
+"""
+全文检索 - 标题和描述的分词与 BM25 评分
+
+中文、日文和韩文没有空格分词，连续的这类字符按相邻两个字符切分（二元组），
+单独出现的一个字符保留为一个词；拉丁字母和数字按单词切分并转为小写。
+"""
+
+import heapq
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 标题中的词计数时的权重，使标题命中排在仅描述命中之前
+TITLE_WEIGHT = 2
+
+# BM25 参数：词频饱和度和文档长度归一化程度
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 按二元组切分的字符：CJK 统一表意文字及扩展 A、兼容表意文字、假名和谚文音节
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|([^\\W_{_CJK}]+)")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    将文本切分为检索词
+
+    参数:
+        text: 文本
+
+    返回:
+        检索词列表，按出现顺序排列，可能重复
+    """
+    tokens: List[str] = []
+    for cjk, word in _TOKEN_RE.findall((text or "").lower()):
+        if word:
+            tokens.append(word)
+        elif len(cjk) == 1:
+            tokens.append(cjk)
+        else:
+            tokens.extend(cjk[i] + cjk[i + 1] for i in range(len(cjk) - 1))
+    return tokens
+
+
+def plan_terms(plan: Dict) -> Dict[str, int]:
+    """
+    计划的检索词及词频，标题中的词按 TITLE_WEIGHT 计数
+
+    参数:
+        plan: 计划字典
+
+    返回:
+        检索词到词频的映射
+    """
+    terms: Dict[str, int] = {}
+    for token in tokenize(plan.get("title")):
+        terms[token] = terms.get(token, 0) + TITLE_WEIGHT
+    for token in tokenize(plan.get("description")):
+        terms[token] = terms.get(token, 0) + 1
+    return terms
+
+
+def query_terms(query: str) -> List[str]:
+    """查询中不重复的检索词，按字典序排列，保证各后端累加评分的顺序一致"""
+    return sorted(set(tokenize(query)))
+
+
+def bm25(tf: int, df: int, length: int, count: int, average: float) -> float:
+    """
+    一个检索词对一个计划的 BM25 评分
+
+    参数:
+        tf: 词在计划中的词频
+        df: 包含该词的计划数
+        length: 计划的词数
+        count: 计划总数
+        average: 计划的平均词数
+
+    返回:
+        评分
+    """
+    idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+    norm = 1 - BM25_B + BM25_B * length / average if average else 1.0
+    return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+
+def top_scores(
+    scores: Dict[str, float], order: Dict[str, int], limit: Optional[int]
+) -> List[Tuple[str, float]]:
+    """
+    按评分从高到低排列，评分相同时先添加的计划在前
+
+    参数:
+        scores: 计划ID到评分的映射
+        order: 计划ID到添加顺序的映射
+        limit: 最多返回的数量，None 表示全部
+
+    返回:
+        (计划ID, 评分) 列表
+    """
+
+    def key(item: Tuple[str, float]) -> Tuple[float, int]:
+        return -item[1], order[item[0]]
+
+    if limit is None:
+        return sorted(scores.items(), key=key)
+    return heapq.nsmallest(limit, scores.items(), key=key)
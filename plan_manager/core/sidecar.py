@@ -0,0 +1,149 @@
+"""
+索引旁路文件 - 把建立好的索引保存在存储文件旁边，下次运行时直接读取
+
+每个索引一个文件，只在用到时读取，文件记录建立索引时存储的版本标识
+（见 StorageBackend.generation）。每次保存修改后，修改前后的计划追加到
+同一目录的变更日志中；读取版本较旧的索引文件时沿变更日志重放到当前版本，
+因此修改计划时不需要读取和重写索引文件。
+找不到连续的变更记录（例如数据被其他程序改动过）的文件视为过期，
+由调用方重新建立索引并覆盖。
+"""
+
+import io
+import os
+import marshal
+from typing import Dict, List, Optional, Tuple
+
+from .indexes import Marshallable
+from .storage import gc_paused
+
+# 旁路文件的格式版本，索引内容的结构改变时递增，旧文件随之失效
+SIDECAR_FORMAT = 1
+
+# 变更日志超过该字节数时清空，版本较旧的索引文件随之过期，用到时重新建立
+CHANGE_LOG_BYTES = 4 * 1024 * 1024
+
+# 一次修改：(修改前的计划, 修改后的计划)，添加时前者为 None，删除时后者为 None
+Change = Tuple[Optional[Dict], Optional[Dict]]
+
+
+class IndexSidecar:
+    """保存在 <存储文件>.indexes 目录中的索引文件和变更日志"""
+
+    def __init__(self, storage_path: str):
+        """
+        初始化索引旁路文件
+
+        参数:
+            storage_path: 存储文件路径
+        """
+        self.directory = storage_path + ".indexes"
+        self.log_path = os.path.join(self.directory, "changes.log")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.idx")
+
+    def load(
+        self, name: str, generation: str
+    ) -> Optional[Tuple[Marshallable, List[Change]]]:
+        """
+        读取索引内容，以及把它更新到当前版本需要重放的修改
+
+        参数:
+            name: 索引名称
+            generation: 当前存储的版本标识
+
+        返回:
+            (索引内容, 按顺序需要重放的修改)；
+            文件不存在、损坏或无法更新到当前版本时返回 None
+        """
+        try:
+            with open(self._path(name), "rb") as f:
+                header = marshal.load(f)
+                if not isinstance(header, tuple) or header[0] != SIDECAR_FORMAT:
+                    return None
+                changes = self._changes_between(header[1], generation)
+                if changes is None:
+                    return None
+                content = f.read()
+            # 一次读入再解析，比 marshal.load 逐段读取文件快得多；
+            # 解析时会创建大量容器对象，暂停垃圾回收
+            with gc_paused():
+                return marshal.loads(content), changes
+        except (OSError, EOFError, ValueError, TypeError, IndexError):
+            return None
+
+    def _changes_between(self, start: str, end: str) -> Optional[List[Change]]:
+        """
+        沿变更日志从 start 版本走到 end 版本
+
+        返回:
+            按顺序需要重放的修改，找不到连续的记录时返回 None
+        """
+        if start == end:
+            return []
+        try:
+            with open(self.log_path, "rb") as f:
+                log = io.BytesIO(f.read())
+        except OSError:
+            return None
+
+        changes: List[Change] = []
+        current = start
+        # 日志由每次保存的 (保存前版本, 保存后版本, 修改列表) 依次拼接而成
+        while current != end:
+            try:
+                before, after, saved = marshal.load(log)
+            except EOFError:
+                return None
+            if before == current:
+                changes.extend(saved)
+                current = after
+        return changes
+
+    def save(self, name: str, generation: str, state: Marshallable) -> None:
+        """
+        保存索引内容，先写临时文件再原子替换
+
+        旁路文件只是缓存，写入失败时忽略，下次运行会重新建立索引
+
+        参数:
+            name: 索引名称
+            generation: 索引内容对应的存储版本标识
+            state: 索引内容
+        """
+        path = self._path(name)
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            content = marshal.dumps(state)
+            with open(tmp_path, "wb") as f:
+                marshal.dump((SIDECAR_FORMAT, generation), f)
+                f.write(content)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError):
+            pass
+
+    def record(self, before: str, after: str, changes: List[Change]) -> None:
+        """
+        在变更日志中记录一次保存包含的修改
+
+        参数:
+            before: 保存前存储的版本标识
+            after: 保存后存储的版本标识
+            changes: 按顺序的修改，只改变版本标识的保存（如压缩）为空列表
+        """
+        # 还没有保存过索引文件时不需要记录
+        if before == after or not os.path.isdir(self.directory):
+            return
+        try:
+            entry = marshal.dumps((before, after, changes))
+            try:
+                size = os.path.getsize(self.log_path)
+            except OSError:
+                size = 0
+            mode = "wb" if size + len(entry) > CHANGE_LOG_BYTES else "ab"
+            with open(self.log_path, mode) as f:
+                f.write(entry)
+        except (OSError, ValueError):
+            pass
@@ -0,0 +1,1305 @@
+"""
+存储后端 - 定义计划数据的持久化方式
+
+变更以记录的形式提交给后端，记录格式为:
+    {"op": "add", "plan": {...}}
+    {"op": "update", "plan": {...}}
+    {"op": "delete", "id": "..."}
+"""
+
+import gc
+import os
+import re
+import json
+import zlib
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+)
+
+from ..models.plan import CREATED_AT_FORMAT
+from .indexes import make_stats
+from .journal import PlanJournal
+from .search import bm25, plan_terms, query_terms, top_scores
+from .query import PlanFilter
+
+if TYPE_CHECKING:
+    import fcntl
+    import msvcrt
+else:
+    try:
+        import fcntl
+    except ImportError:  # Windows 没有 fcntl，使用 msvcrt
+        fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+# 存储文件格式的版本，以及校验和字段写入时的占位内容（与真实值等长）
+SCHEMA_VERSION = 1
+CHECKSUM_PLACEHOLDER = "0" * 8
+
+# 日志超过以下任一阈值时自动压缩为新快照
+JOURNAL_COMPACT_BYTES = 8 * 1024 * 1024
+JOURNAL_COMPACT_RECORDS = 10000
+
+# 快照开头的版本计数字段，读取文件头即可取得，不必解析整个文件
+GENERATION_PATTERN = re.compile(rb'"generation": (\d+)')
+JOURNAL_SEQ_PATTERN = re.compile(rb'"journal_seq": (\d+)')
+HEADER_BYTES = 256
+HEADER_FIELDS = ("schema_version", "checksum", "generation", "journal_seq")
+
+
+class StaleStoreError(RuntimeError):
+    """存储已被其他进程修改，基于旧数据的修改没有保存"""
+
+
+def normalize_deadline(deadline: Optional[str]) -> Optional[str]:
+    """
+    将截止日期统一为补零的 YYYY-MM-DD 格式
+
+    Plan.validate 接受省略前导零的写法（如 2024-1-5），按字符串比较截止日期的
+    存储必须先统一格式，结果才与按日期比较一致。空值和无法解析的值原样返回
+
+    参数:
+        deadline: 截止日期
+
+    返回:
+        补零后的截止日期
+    """
+    if not deadline or (len(deadline) == 10 and deadline[4] == deadline[7] == "-"):
+        return deadline
+    try:
+        return datetime.datetime.strptime(deadline, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        return deadline
+
+
+@contextmanager
+def gc_paused() -> Iterator[None]:
+    """在代码块执行期间暂停自动垃圾回收"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class PlanMapping(Protocol):
+    """apply_record 修改的计划映射，字典和列式的 PlanTable 都满足"""
+
+    def __contains__(self, plan_id: object) -> bool:
+        """计划是否存在"""
+        ...
+
+    def __setitem__(self, plan_id: str, plan: Dict) -> None:
+        """添加或替换计划"""
+        ...
+
+    def pop(self, plan_id: str, default: None, /) -> Optional[Dict]:
+        """删除并返回计划，不存在时返回 None"""
+        ...
+
+
+def apply_record(plans: PlanMapping, record: Dict) -> None:
+    """
+    将一条变更记录应用到按ID索引的计划上
+
+    参数:
+        plans: 计划ID到计划字典的有序映射，保持添加顺序
+        record: 变更记录，op 为 add、update 或 delete
+    """
+    op = record.get("op")
+
+    if op == "add":
+        plan = record["plan"]
+        plans[plan["id"]] = plan
+    elif op == "update":
+        plan = record["plan"]
+        if plan["id"] in plans:
+            plans[plan["id"]] = plan
+    elif op == "delete" and "id" in record:
+        plans.pop(record["id"], None)
+
+
+class StorageBackend:
+    """存储后端基类"""
+
+    # 是否支持直接查询；支持时管理器不必把全部计划载入内存。
+    # 支持查询的后端需要实现 query、explain、get_plan_by_id、
+    # get_upcoming_deadlines、get_overdue_plans、find_plan_ids、
+    # get_plans_created_since、urgent_candidates、stats 和 search
+    supports_queries = False
+
+    # 最近一次加载的数据是否确定由本程序写入且未被改动；
+    # 为 True 时管理器不再逐个验证计划
+    trusted = False
+
+    # 当前持久化数据的版本标识，每次保存后改变；
+    # 为 None 表示无法确定，此时不使用索引旁路文件
+    generation: Optional[str] = None
+
+    def __init__(self, path: str):
+        """
+        初始化存储后端
+
+        参数:
+            path: 存储文件路径
+        """
+        self.path = path
+
+    def load(self) -> Dict:
+        """加载全部计划数据"""
+        raise NotImplementedError
+
+    def save(self, data: Dict, durable: bool = True) -> None:
+        """
+        完整保存计划数据
+
+        参数:
+            data: 计划数据
+            durable: 是否等待数据同步到磁盘
+        """
+        raise NotImplementedError
+
+    def commit(
+        self,
+        records: List[Dict],
+        snapshot: Callable[[], Dict],
+        durable: bool = True,
+    ) -> Optional[List[Dict]]:
+        """
+        持久化一批变更记录
+
+        参数:
+            records: 已应用到内存数据的变更记录
+            snapshot: 返回应用变更后完整计划数据的函数，只在需要时调用
+            durable: 是否等待数据同步到磁盘
+
+        返回:
+            其他进程在这批记录之前保存、内存数据中还没有的变更记录；
+            无法逐条取得其他进程的修改、内存数据需要重新加载时返回 None
+        """
+        raise NotImplementedError
+
+    def compact(self, snapshot: Callable[[], Dict]) -> Dict[str, int]:
+        """
+        整理存储文件
+
+        参数:
+            snapshot: 返回当前完整计划数据的函数
+
+        返回:
+            整理掉的记录数和字节数
+        """
+        return {"records": 0, "bytes": 0}
+
+    def lock(self):
+        """返回跨进程的修改锁，在 with 语句中使用，可以重入"""
+        return nullcontext()
+
+    def stale(self) -> bool:
+        """存储是否在最近一次加载或保存之后被其他进程修改，调用方应持有存储锁"""
+        return False
+
+
+class JSONStorage(StorageBackend):
+    """
+    JSON 文件存储，可选追加式操作日志
+
+    多个进程可以同时使用同一个存储：修改持有存储文件旁边 .lock 文件上的排他锁，
+    加载不加锁，读取期间存储有变化时重新读取。快照开头的 generation 在每次重写快照时加一，
+    日志记录的 seq 在每次追加时递增。保存时检查存储是否仍是最近一次加载或
+    保存时的状态，已被其他进程修改时不重写快照，而是把变更记录追加到日志中
+    对方的修改之后，见 commit。
+    """
+
+    def __init__(
+        self,
+        path: str = "plans.json",
+        journal: bool = False,
+        compact_bytes: int = JOURNAL_COMPACT_BYTES,
+        compact_records: int = JOURNAL_COMPACT_RECORDS,
+    ):
+        """
+        初始化 JSON 存储
+
+        参数:
+            path: 存储文件路径
+            journal: 是否启用日志模式。启用后每次变更只向日志文件
+                追加一条记录，而不是重写整个存储文件
+            compact_bytes: 日志超过该字节数时自动压缩
+            compact_records: 日志超过该记录数时自动压缩
+        """
+        super().__init__(path)
+        self.journal = PlanJournal(path + ".journal")
+        self.journal_enabled = journal
+        self.compact_bytes = compact_bytes
+        self.compact_records = compact_records
+        self._journal_seq = 0
+        # 快照文件的校验和，加载的快照不可信时为 None
+        self._checksum_value: Optional[str] = None
+        # 快照的版本计数，以及最近一次加载或保存后磁盘上的状态
+        self._generation_count = 0
+        self._disk: Optional[tuple] = None
+        # 跨进程锁的文件描述符和重入深度；线程锁让同一进程的线程依次持有
+        self._lock_path = path + ".lock"
+        self._lock_fd: Optional[int] = None
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """
+        持有跨进程的排他锁，可以重入
+
+        使用 fcntl.flock；Windows 上使用 msvcrt.locking。
+        锁内只做与计划数量无关的检查、追加和替换文件，快照在锁外写入临时文件
+        """
+        with self._thread_lock:
+            if not self._lock_depth:
+                self._acquire_file_lock()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if not self._lock_depth:
+                    self._release_file_lock()
+
+    def _acquire_file_lock(self) -> None:
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                # 阻塞模式每秒重试一次，10 秒后仍未取得时抛出 OSError
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._lock_fd = fd
+
+    def _release_file_lock(self) -> None:
+        fd, self._lock_fd = self._lock_fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is None and msvcrt is not None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            # 关闭文件描述符同时释放 flock
+            os.close(fd)
+
+    def _snapshot_stamp(self) -> Optional[tuple]:
+        """返回快照文件的标识，用于发现加载期间被替换的快照"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _disk_state(self) -> tuple:
+        """
+        磁盘上存储的状态：快照的版本计数和文件标识，以及日志的大小
+
+        只读取快照的开头，与计划数量无关
+        """
+        stamp = self._snapshot_stamp()
+        count = 0
+        if stamp is not None:
+            try:
+                with open(self.path, "rb") as f:
+                    match = GENERATION_PATTERN.search(f.read(HEADER_BYTES))
+                if match:
+                    count = int(match.group(1))
+            except OSError:
+                pass
+        try:
+            journal_size = os.path.getsize(self.journal.path)
+        except OSError:
+            journal_size = 0
+        return (count, stamp, journal_size)
+
+    def stale(self) -> bool:
+        """存储是否在最近一次加载或保存之后被其他进程修改，调用方应持有存储锁"""
+        return self._disk != self._disk_state()
+
+    def _check_current(self) -> None:
+        """
+        确认存储没有被其他进程修改
+
+        异常:
+            StaleStoreError: 存储已被其他进程修改
+        """
+        if self.stale():
+            raise StaleStoreError(f"存储 {self.path} 已被其他进程修改")
+
+    def _catch_up(self) -> Optional[List[Dict]]:
+        """
+        追上其他进程对存储的修改，使下一条追加的日志记录排在它们之后。调用方持有存储锁
+
+        快照没有被替换时只需读取日志新增的部分，与计划数量无关
+
+        返回:
+            其他进程追加的变更记录；快照已被替换时返回 None，只更新日志序号
+        """
+        state = self._disk_state()
+        if state == self._disk:
+            return []
+        if (
+            self._disk is not None
+            and state[:2] == self._disk[:2]
+            and state[2] >= self._disk[2]
+        ):
+            records = [
+                record
+                for record in self.journal.read_new()
+                if record.get("seq", 0) > self._journal_seq
+            ]
+            if records:
+                self._journal_seq = records[-1]["seq"]
+            return records
+
+        # 新快照之后的日志记录的序号大于快照记下的序号
+        self._journal_seq = self._snapshot_journal_seq()
+        for record in self.journal.read():
+            self._journal_seq = max(self._journal_seq, record.get("seq", 0))
+        return None
+
+    def _snapshot_journal_seq(self) -> int:
+        """磁盘上的快照记下的日志序号，从文件开头读取"""
+        try:
+            with open(self.path, "rb") as f:
+                head = f.read(HEADER_BYTES)
+                match = JOURNAL_SEQ_PATTERN.search(head)
+                if match:
+                    return int(match.group(1))
+                if GENERATION_PATTERN.search(head):
+                    return 0
+                # 旧格式的快照把序号写在计划之后
+                seq = json.loads(head + f.read()).get("journal_seq", 0)
+                return seq if isinstance(seq, int) else 0
+        except (OSError, ValueError):
+            return 0
+
+    def load(self) -> Dict:
+        """从存储文件加载计划，并重放快照之后的日志记录"""
+        data, records, self._disk = self._read()
+        stamp = self._disk[1]
+
+        # 无论是否启用日志模式都重放日志，避免混用两种模式时丢失变更
+        self._journal_seq = data.get("journal_seq", 0)
+        plans = None
+        for record in records:
+            if record.get("seq", 0) <= self._journal_seq:
+                continue
+            if plans is None:
+                plans = {plan["id"]: plan for plan in data["plans"]}
+            apply_record(plans, record)
+            self._journal_seq = record["seq"]
+
+        if plans is not None:
+            data["plans"] = list(plans.values())
+        if stamp is None:
+            # 没有快照文件时数据完全由日志决定
+            self._checksum_value = CHECKSUM_PLACEHOLDER
+        else:
+            self._checksum_value = data.get("checksum") if self.trusted else None
+        count = data.get("generation")
+        self._generation_count = count if isinstance(count, int) else 0
+        self._update_generation()
+        return data
+
+    def _read(self) -> Tuple[Dict, List[Dict], tuple]:
+        """
+        不加锁地读取快照和日志
+
+        返回:
+            (快照数据, 日志记录, 读取前磁盘上存储的状态)
+        """
+        # 读取不持有锁，不必等待其他进程写入快照。读取期间快照被替换或
+        # 日志有追加时重新读取；多次都没有读到稳定的状态时返回读取前的状态，
+        # 之后保存时会发现存储已变化，补上其他进程的修改
+        for _ in range(3):
+            state = self._disk_state()
+            stamp = state[1]
+            data: Dict[str, Any] = {"plans": []}
+            self.trusted = False
+            if stamp is not None:
+                try:
+                    with open(self.path, "rb") as f:
+                        content = f.read()
+                    # 解析时会创建大量容器对象，暂停垃圾回收可以省去反复的全量扫描
+                    with gc_paused():
+                        data = json.loads(content)
+                    self.trusted = self._verify(content, data)
+                except json.JSONDecodeError:
+                    print(f"警告：计划文件 {self.path} 损坏，创建新文件")
+            else:
+                self.trusted = True
+            records = self.journal.read()
+            if self._disk_state() == state:
+                break
+        return data, records, state
+
+    def _update_generation(self) -> None:
+        """版本标识由快照的校验和与已应用的日志序号组成"""
+        if self._checksum_value is None:
+            self.generation = None
+        else:
+            self.generation = f"{self._checksum_value}-{self._journal_seq}"
+
+    @staticmethod
+    def _checksum(content: bytes) -> str:
+        """计算文件内容的校验和，校验和字段本身以占位内容参与计算"""
+        return format(zlib.crc32(content), "08x")
+
+    def _verify(self, content: bytes, data: Dict) -> bool:
+        """
+        检查文件是否由本程序写入且未被改动
+
+        参数:
+            content: 文件内容
+            data: 解析后的数据
+
+        返回:
+            格式版本相同且校验和一致时返回 True
+        """
+        checksum = data.get("checksum")
+        if data.get("schema_version") != SCHEMA_VERSION or not isinstance(
+            checksum, str
+        ):
+            return False
+        field = f'"checksum": "{checksum}"'.encode("utf-8")
+        placeholder = f'"checksum": "{CHECKSUM_PLACEHOLDER}"'.encode("utf-8")
+        return self._checksum(content.replace(field, placeholder, 1)) == checksum
+
+    def _write_temp(self, data: Dict, durable: bool) -> Tuple[str, str]:
+        """
+        把快照写入临时文件，文件开头写入格式版本、校验和、下一个版本计数与日志序号
+
+        返回:
+            (临时文件路径, 校验和)
+        """
+        content = {
+            "schema_version": SCHEMA_VERSION,
+            "checksum": CHECKSUM_PLACEHOLDER,
+            "generation": self._generation_count + 1,
+        }
+        if self._journal_seq:
+            content["journal_seq"] = self._journal_seq
+        content.update(
+            (key, value) for key, value in data.items() if key not in HEADER_FIELDS
+        )
+        encoded = json.dumps(content, indent=4, ensure_ascii=False).encode("utf-8")
+        # 校验和字段位于文件开头，替换第一次出现的占位内容即可
+        checksum = self._checksum(encoded)
+        encoded = encoded.replace(
+            f'"checksum": "{CHECKSUM_PLACEHOLDER}"'.encode("utf-8"),
+            f'"checksum": "{checksum}"'.encode("utf-8"),
+            1,
+        )
+
+        # 先写入临时文件再原子替换，崩溃时旧快照保持完整。
+        # 随后要清空日志时必须先落盘，否则掉电可能同时丢失快照和日志。
+        # 临时文件按进程和线程区分，可以同时准备各自的快照
+        durable = durable or self.journal.record_count > 0
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        return tmp_path, checksum
+
+    def _install(self, tmp_path: str, checksum: str) -> None:
+        """在存储锁内用临时文件替换快照并清空日志"""
+        os.replace(tmp_path, self.path)
+        # 快照已包含日志中的全部变更；若在清空前崩溃，
+        # 重放时会按 journal_seq 跳过这些记录
+        self.journal.truncate()
+        self._generation_count += 1
+        self._checksum_value = checksum
+        self._update_generation()
+        self._disk = self._disk_state()
+
+    def save(self, data: Dict, durable: bool = True) -> None:
+        """完整保存计划数据，覆盖存储中的全部内容，包括其他进程的修改"""
+        while True:
+            # 版本计数接着磁盘上的计数递增，保持单调；快照在锁外写入临时文件，
+            # 锁内确认期间没有其他进程替换快照后再替换，否则重新写入
+            state = self._disk_state()
+            self._generation_count = max(self._generation_count, state[0])
+            tmp_path, checksum = self._write_temp(data, durable)
+            with self.lock():
+                if self._disk_state()[:2] == state[:2]:
+                    self._install(tmp_path, checksum)
+                    return
+            os.remove(tmp_path)
+
+    def commit(
+        self,
+        records: List[Dict],
+        snapshot: Callable[[], Dict],
+        durable: bool = True,
+    ) -> Optional[List[Dict]]:
+        """
+        日志模式下追加记录，否则重写整个存储文件
+
+        存储已被其他进程修改时不覆盖对方的修改：这批记录追加到日志中对方的修改之后，
+        加载时依次重放，同一个计划以最后保存的修改为准。快照在锁外编码并写入
+        临时文件，锁内只检查存储、读取其他进程新增的日志和追加或替换文件，
+        持有锁的时间与计划数量无关。日志超过阈值时在释放锁之后自动压缩，见 compact
+
+        返回:
+            其他进程追加的变更记录，调用方应把它们和这批记录依次应用到内存数据；
+            其他进程替换了快照时返回 None，调用方应重新加载
+        """
+        tmp = None
+        if not self.journal_enabled:
+            tmp = self._write_temp(snapshot(), durable)
+        with self.lock():
+            if tmp is not None and self._disk_state() == self._disk:
+                self._install(*tmp)
+                return []
+            if tmp is not None:
+                os.remove(tmp[0])
+
+            foreign = self._catch_up()
+            for record in records:
+                self._journal_seq += 1
+                record["seq"] = self._journal_seq
+            self.journal.append(records, fsync=durable)
+            self._update_generation()
+            self._disk = self._disk_state()
+        # 内存数据中还没有其他进程的修改时不能压缩
+        if foreign == [] and self._needs_compaction():
+            try:
+                self.compact(snapshot)
+            except StaleStoreError:
+                # 其他进程刚刚修改了存储，留到之后的保存再压缩
+                pass
+        return foreign
+
+    def compact(self, snapshot: Callable[[], Dict]) -> Dict[str, int]:
+        """
+        将日志压缩为新的快照并清空日志
+
+        新快照在锁外写入临时文件，锁内只确认存储仍是写入前的状态，
+        再替换快照、清空日志
+
+        异常:
+            StaleStoreError: 存储已被其他进程修改，没有压缩；
+                调用方应追上其他进程的修改后重试
+        """
+        state = self._disk
+        tmp_path, checksum = self._write_temp(snapshot(), True)
+        try:
+            with self.lock():
+                # 写入期间本进程的其他保存也会改变状态
+                if self._disk != state:
+                    raise StaleStoreError(f"存储 {self.path} 在压缩期间被修改")
+                self._check_current()
+                stats = {
+                    "records": self.journal.record_count,
+                    "bytes": self.journal.size_bytes,
+                }
+                self._install(tmp_path, checksum)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return stats
+
+    def _needs_compaction(self) -> bool:
+        """日志是否超过自动压缩阈值"""
+        return (
+            self.journal.size_bytes >= self.compact_bytes
+            or self.journal.record_count >= self.compact_records
+        )
+
+
+class SQLiteStorage(StorageBackend):
+    """SQLite 数据库存储，查询直接走索引，变更只更新对应的行"""
+
+    supports_queries = True
+
+    # 数据库只由本程序按行写入，表结构保证了各字段的类型
+    trusted = True
+
+    # 计划表中与字典字段一一对应的列（不含标签）
+    COLUMNS = (
+        "id",
+        "title",
+        "description",
+        "created_at",
+        "deadline",
+        "priority",
+        "completed",
+    )
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS plans (
+            pos INTEGER PRIMARY KEY AUTOINCREMENT,
+            id TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            created_at TEXT,
+            deadline TEXT,
+            priority TEXT NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS plan_tags (
+            plan_id TEXT NOT NULL REFERENCES plans(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (plan_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS plan_terms (
+            term TEXT NOT NULL,
+            plan_id TEXT NOT NULL REFERENCES plans(id) ON DELETE CASCADE,
+            tf INTEGER NOT NULL,
+            PRIMARY KEY (term, plan_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS plan_lengths (
+            plan_id TEXT PRIMARY KEY REFERENCES plans(id) ON DELETE CASCADE,
+            length INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_plans_deadline ON plans(deadline);
+        CREATE INDEX IF NOT EXISTS idx_plans_priority ON plans(priority);
+        CREATE INDEX IF NOT EXISTS idx_plans_completed ON plans(completed);
+        CREATE INDEX IF NOT EXISTS idx_plan_tags_tag ON plan_tags(tag);
+        CREATE INDEX IF NOT EXISTS idx_plan_terms_plan ON plan_terms(plan_id);
+        CREATE INDEX IF NOT EXISTS idx_plans_open_deadline
+            ON plans(deadline) WHERE completed = 0;
+
+        -- 汇总计数：kind 为 total、completed、priority 或 tag，key 为优先级或标签。
+        -- 由以下触发器在修改计划的同一事务中维护，统计时不必扫描计划表
+        CREATE TABLE IF NOT EXISTS plan_stats (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER IF NOT EXISTS plan_stats_insert AFTER INSERT ON plans
+        BEGIN
+            INSERT INTO plan_stats VALUES
+                ('total', '', 1),
+                ('completed', '', NEW.completed != 0),
+                ('priority', NEW.priority, 1)
+            ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count;
+        END;
+        CREATE TRIGGER IF NOT EXISTS plan_stats_delete AFTER DELETE ON plans
+        BEGIN
+            INSERT INTO plan_stats VALUES
+                ('total', '', -1),
+                ('completed', '', -(OLD.completed != 0)),
+                ('priority', OLD.priority, -1)
+            ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count;
+        END;
+        CREATE TRIGGER IF NOT EXISTS plan_stats_update
+        AFTER UPDATE OF priority, completed ON plans
+        BEGIN
+            INSERT INTO plan_stats VALUES
+                ('completed', '', (NEW.completed != 0) - (OLD.completed != 0)),
+                ('priority', OLD.priority, -1),
+                ('priority', NEW.priority, 1)
+            ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count;
+        END;
+        -- 同一计划重复的标签只计一次
+        CREATE TRIGGER IF NOT EXISTS plan_stats_tag_insert AFTER INSERT ON plan_tags
+        WHEN NOT EXISTS (
+            SELECT 1 FROM plan_tags WHERE plan_id = NEW.plan_id AND tag = NEW.tag
+            AND position != NEW.position
+        )
+        BEGIN
+            INSERT INTO plan_stats VALUES ('tag', NEW.tag, 1)
+            ON CONFLICT (kind, key) DO UPDATE SET count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS plan_stats_tag_delete AFTER DELETE ON plan_tags
+        WHEN NOT EXISTS (
+            SELECT 1 FROM plan_tags WHERE plan_id = OLD.plan_id AND tag = OLD.tag
+        )
+        BEGIN
+            UPDATE plan_stats SET count = count - 1 WHERE kind = 'tag' AND key = OLD.tag;
+        END;
+    """
+
+    def __init__(self, path: str = "plans.db"):
+        """
+        初始化 SQLite 存储
+
+        参数:
+            path: 数据库文件路径
+        """
+        super().__init__(path)
+        # 连接可能由后台保存线程使用，调用方负责串行化写入
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        # WAL 模式下读取不会被写入阻塞
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(self.SCHEMA)
+        self._backfill_terms()
+        self._normalize_deadlines()
+        self._backfill_stats()
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _rows_to_plans(self, rows: List[sqlite3.Row]) -> List[Dict]:
+        """将查询结果转换为计划字典，并补全标签"""
+        plans = [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "description": row["description"],
+                "created_at": row["created_at"],
+                "deadline": row["deadline"],
+                "priority": row["priority"],
+                "tags": [],
+                "completed": bool(row["completed"]),
+            }
+            for row in rows
+        ]
+        by_id = {plan["id"]: plan for plan in plans}
+
+        # 分批查询标签，避免超出 SQLite 的参数数量限制
+        ids = list(by_id)
+        for start in range(0, len(ids), 500):
+            end = start + 500
+            chunk = ids[start:end]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.conn.execute(
+                f"SELECT plan_id, tag FROM plan_tags WHERE plan_id IN ({placeholders})"
+                " ORDER BY plan_id, position",
+                chunk,
+            ):
+                by_id[row["plan_id"]]["tags"].append(row["tag"])
+        return plans
+
+    def _insert(self, plan: Dict) -> None:
+        """插入一个计划及其标签，截止日期统一为补零的格式"""
+        values = [plan.get(column) for column in self.COLUMNS]
+        values[self.COLUMNS.index("deadline")] = normalize_deadline(
+            plan.get("deadline")
+        )
+        self.conn.execute(
+            "INSERT INTO plans (id, title, description, created_at, deadline,"
+            " priority, completed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            values,
+        )
+        self._insert_tags(plan)
+        self._insert_terms(plan)
+
+    def _insert_terms(self, plan: Dict) -> None:
+        """插入一个计划的全文检索词"""
+        terms = plan_terms(plan)
+        self.conn.executemany(
+            "INSERT INTO plan_terms (term, plan_id, tf) VALUES (?, ?, ?)",
+            [(term, plan["id"], tf) for term, tf in terms.items()],
+        )
+        self.conn.execute(
+            "INSERT INTO plan_lengths (plan_id, length) VALUES (?, ?)",
+            (plan["id"], sum(terms.values())),
+        )
+
+    def _backfill_terms(self) -> None:
+        """为创建检索表之前写入的计划补建全文检索词"""
+        missing = self.conn.execute(
+            "SELECT * FROM plans WHERE id NOT IN (SELECT plan_id FROM plan_lengths)"
+        ).fetchall()
+        if not missing:
+            return
+        with self.conn:
+            for row in missing:
+                self._insert_terms(dict(row))
+
+    def _normalize_deadlines(self) -> None:
+        """将早先写入的省略前导零的截止日期改为补零的格式"""
+        rows = self.conn.execute(
+            "SELECT id, deadline FROM plans WHERE deadline != ''"
+            " AND deadline NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'"
+        ).fetchall()
+        updates = []
+        for row in rows:
+            deadline = normalize_deadline(row["deadline"])
+            if deadline != row["deadline"]:
+                updates.append((deadline, row["id"]))
+        if not updates:
+            return
+        with self.conn:
+            self.conn.executemany("UPDATE plans SET deadline = ? WHERE id = ?", updates)
+
+    def _backfill_stats(self) -> None:
+        """创建计数表之前写入的数据库没有计数，按现有计划统计一次"""
+        if self.conn.execute(
+            "SELECT 1 FROM plan_stats WHERE kind = 'total'"
+        ).fetchone():
+            return
+        with self.conn:
+            self.conn.executescript(
+                """
+                DELETE FROM plan_stats;
+                INSERT INTO plan_stats
+                    SELECT 'total', '', COUNT(*) FROM plans
+                    UNION ALL SELECT 'completed', '', COUNT(*) FROM plans
+                        WHERE completed != 0
+                    UNION ALL SELECT 'priority', priority, COUNT(*) FROM plans
+                        GROUP BY priority
+                    UNION ALL SELECT 'tag', tag, COUNT(DISTINCT plan_id) FROM plan_tags
+                        GROUP BY tag;
+                """
+            )
+
+    def _insert_tags(self, plan: Dict) -> None:
+        """插入一个计划的标签"""
+        self.conn.executemany(
+            "INSERT INTO plan_tags (plan_id, position, tag) VALUES (?, ?, ?)",
+            [(plan["id"], i, tag) for i, tag in enumerate(plan.get("tags") or [])],
+        )
+
+    def load(self) -> Dict:
+        """加载全部计划数据"""
+        rows = self.conn.execute("SELECT * FROM plans ORDER BY pos").fetchall()
+        return {"plans": self._rows_to_plans(rows)}
+
+    def save(self, data: Dict, durable: bool = True) -> None:
+        """用给定数据替换数据库中的全部计划"""
+        self._set_synchronous(durable)
+        with self.conn:
+            self.conn.execute("DELETE FROM plan_tags")
+            self.conn.execute("DELETE FROM plan_terms")
+            self.conn.execute("DELETE FROM plan_lengths")
+            self.conn.execute("DELETE FROM plans")
+            for plan in data["plans"]:
+                self._insert(plan)
+
+    def _set_synchronous(self, durable: bool) -> None:
+        """设置提交时是否等待数据同步到磁盘"""
+        self.conn.execute(f"PRAGMA synchronous = {'FULL' if durable else 'OFF'}")
+
+    def commit(
+        self,
+        records: List[Dict],
+        snapshot: Callable[[], Dict],
+        durable: bool = True,
+    ) -> List[Dict]:
+        """
+        在一个事务中逐行应用变更记录，其他进程的修改由 SQLite 按行合并
+
+        汇总计数由 plan_stats 上的触发器在同一事务中更新
+        """
+        self._set_synchronous(durable)
+        with self.conn:
+            for record in records:
+                op = record.get("op")
+                if op == "add":
+                    self._insert(record["plan"])
+                elif op == "update":
+                    plan = record["plan"]
+                    self.conn.execute(
+                        "UPDATE plans SET title = ?, description = ?, deadline = ?,"
+                        " priority = ?, completed = ? WHERE id = ?",
+                        (
+                            plan["title"],
+                            plan["description"],
+                            normalize_deadline(plan["deadline"]),
+                            plan["priority"],
+                            plan["completed"],
+                            plan["id"],
+                        ),
+                    )
+                    self.conn.execute(
+                        "DELETE FROM plan_tags WHERE plan_id = ?", (plan["id"],)
+                    )
+                    self._insert_tags(plan)
+                    for table in ("plan_terms", "plan_lengths"):
+                        self.conn.execute(
+                            f"DELETE FROM {table} WHERE plan_id = ?", (plan["id"],)
+                        )
+                    self._insert_terms(plan)
+                elif op == "delete":
+                    self.conn.execute(
+                        "DELETE FROM plans WHERE id = ?", (record.get("id"),)
+                    )
+        return []
+
+    def compact(self, snapshot: Callable[[], Dict]) -> Dict[str, int]:
+        """回收数据库中的空闲页"""
+        before = os.path.getsize(self.path)
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.execute("VACUUM")
+        return {"records": 0, "bytes": max(before - os.path.getsize(self.path), 0)}
+
+    def _select(
+        self,
+        plan_filter: PlanFilter,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[str, List[Any]]:
+        """将查询条件和分页参数转换为 SQL 语句和参数"""
+        conditions = []
+        params: List[Any] = []
+
+        tags = plan_filter.tags
+        all_tags = plan_filter.all_tags
+        not_tags = plan_filter.not_tags
+        if tags:
+            placeholders = ",".join("?" * len(tags))
+            conditions.append(
+                f"id IN (SELECT plan_id FROM plan_tags WHERE tag IN ({placeholders}))"
+            )
+            params.extend(tags)
+
+        if all_tags:
+            unique_tags = list(dict.fromkeys(all_tags))
+            placeholders = ",".join("?" * len(unique_tags))
+            conditions.append(
+                "id IN (SELECT plan_id FROM plan_tags"
+                f" WHERE tag IN ({placeholders}) GROUP BY plan_id"
+                " HAVING COUNT(DISTINCT tag) = ?)"
+            )
+            params.extend(unique_tags)
+            params.append(len(unique_tags))
+
+        if not_tags:
+            placeholders = ",".join("?" * len(not_tags))
+            conditions.append(
+                "id NOT IN (SELECT plan_id FROM plan_tags"
+                f" WHERE tag IN ({placeholders}))"
+            )
+            params.extend(not_tags)
+
+        if plan_filter.priority:
+            conditions.append("priority = ?")
+            params.append(plan_filter.priority)
+
+        if plan_filter.completed is not None:
+            conditions.append("completed = ?")
+            params.append(int(plan_filter.completed))
+
+        # 统一为补零的格式，与数据库中的日期按字符串比较
+        if plan_filter.start is not None:
+            conditions.append("deadline >= ?")
+            params.append(datetime.date.fromordinal(plan_filter.start).isoformat())
+
+        if plan_filter.end is not None:
+            conditions.append("deadline <= ?")
+            params.append(datetime.date.fromordinal(plan_filter.end).isoformat())
+
+        if plan_filter.text:
+            conditions.append(
+                "(instr(lower(title), ?) > 0 OR instr(lower(description), ?) > 0)"
+            )
+            params.extend([plan_filter.text.lower()] * 2)
+
+        if after is not None:
+            # 键集分页：只取排序键大于游标所在行的计划
+            condition, values = self._after(plan_filter.order_by, after)
+            conditions.append(condition)
+            params.extend(values)
+
+        sql = "SELECT * FROM plans"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if plan_filter.order_by == "deadline":
+            sql += " ORDER BY deadline IS NULL, deadline, pos"
+        elif plan_filter.order_by == "id":
+            sql += " ORDER BY id"
+        else:
+            sql += " ORDER BY pos"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def _after(self, order_by: Optional[str], after: str) -> Tuple[str, List[Any]]:
+        """游标之后的行对应的 SQL 条件"""
+        if order_by == "id":
+            return "id > ?", [after]
+
+        row = self.conn.execute(
+            "SELECT pos, deadline FROM plans WHERE id = ?", (after,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"分页游标 {after} 对应的计划不存在")
+        if order_by != "deadline":
+            return "pos > ?", [row["pos"]]
+        if row["deadline"] is None:
+            return "(deadline IS NULL AND pos > ?)", [row["pos"]]
+        return (
+            "(deadline > ? OR (deadline = ? AND pos > ?) OR deadline IS NULL)",
+            [row["deadline"], row["deadline"], row["pos"]],
+        )
+
+    def query(
+        self,
+        plan_filter: PlanFilter,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict]:
+        """按查询条件查询计划，结果分批读取"""
+        sql, params = self._select(plan_filter, after, limit)
+        return self._stream(self.conn.execute(sql, params))
+
+    def _stream(self, cursor: sqlite3.Cursor) -> Iterator[Dict]:
+        """分批读取查询结果并转换为计划字典"""
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                return
+            yield from self._rows_to_plans(rows)
+
+    def explain(self, plan_filter: PlanFilter, limit: Optional[int] = None) -> str:
+        """返回 SQLite 为查询选择的执行计划"""
+        sql, params = self._select(plan_filter, limit=limit)
+        rows = self.conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        lines = ["SQLite 查询计划"]
+        lines.extend(f"  {row['detail']}" for row in rows)
+        return "\n".join(lines)
+
+    def get_plan_by_id(self, plan_id: str) -> Optional[Dict]:
+        """通过ID查询计划"""
+        rows = self.conn.execute(
+            "SELECT * FROM plans WHERE id = ?", (plan_id,)
+        ).fetchall()
+        plans = self._rows_to_plans(rows)
+        return plans[0] if plans else None
+
+    def find_plan_ids(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """按ID前缀查询，使用ID索引上的范围扫描"""
+        sql = "SELECT id FROM plans WHERE id >= ? AND id < ? ORDER BY id"
+        params: List[Any] = [prefix, prefix + "\uffff"]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [row["id"] for row in self.conn.execute(sql, params)]
+
+    def get_plans_created_since(
+        self,
+        since: Optional[datetime.datetime] = None,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """按ID顺序查询创建时间不早于指定时间的计划，沿ID索引做键集分页"""
+        conditions = []
+        params: List[Any] = []
+        if since is not None:
+            conditions.append("created_at >= ?")
+            params.append(since.strftime(CREATED_AT_FORMAT))
+        if after is not None:
+            conditions.append("id > ?")
+            params.append(after)
+        sql = "SELECT * FROM plans"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._rows_to_plans(self.conn.execute(sql, params).fetchall())
+
+    def get_upcoming_deadlines(self, days: int = 7) -> List[Dict]:
+        """查询未来指定天数内到期且未完成的计划"""
+        today = datetime.datetime.now().date()
+        future = today + datetime.timedelta(days=days)
+        rows = self.conn.execute(
+            "SELECT * FROM plans WHERE completed = 0 AND deadline BETWEEN ? AND ?"
+            " ORDER BY deadline, pos",
+            (today.isoformat(), future.isoformat()),
+        ).fetchall()
+        return self._rows_to_plans(rows)
+
+    def get_overdue_plans(self) -> List[Dict]:
+        """查询截止日期已过且未完成的计划"""
+        today = datetime.datetime.now().date()
+        rows = self.conn.execute(
+            "SELECT * FROM plans WHERE completed = 0 AND deadline < ?"
+            " ORDER BY deadline, pos",
+            (today.isoformat(),),
+        ).fetchall()
+        return self._rows_to_plans(rows)
+
+    def urgent_candidates(self, k: int) -> List[Dict]:
+        """
+        查询可能进入最紧急前 k 名的未完成计划
+
+        同一优先级内截止日期越早越紧急，没有截止日期的计划紧急程度相同，
+        所以每个优先级只需取有截止日期的前 k 个和没有截止日期的前 k 个
+
+        参数:
+            k: 数量
+
+        返回:
+            候选计划，有截止日期的按截止日期排列在前，其余按添加顺序排列
+        """
+        rows = self.conn.execute(
+            """
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY priority, due IS NULL ORDER BY due, pos
+                ) AS rank
+                FROM (
+                    SELECT *, NULLIF(deadline, '') AS due
+                    FROM plans WHERE completed = 0
+                )
+            )
+            WHERE rank <= ?
+            ORDER BY due IS NULL, due, pos
+            """,
+            (k,),
+        ).fetchall()
+        return self._rows_to_plans(rows)
+
+    def stats(self, today: int, days: int = 7) -> Dict:
+        """
+        读取触发器维护的汇总计数，不扫描计划表
+
+        过期和即将到期的数量在未完成计划的截止日期索引上做范围计数
+
+        参数:
+            today: 今天的日期序数
+            days: 即将到期的天数
+
+        返回:
+            见 PlanManager.stats
+        """
+        start = datetime.date.fromordinal(today).isoformat()
+        end = datetime.date.fromordinal(today + days).isoformat()
+        counts: Dict[str, Dict[str, int]] = {
+            "total": {},
+            "completed": {},
+            "priority": {},
+            "tag": {},
+        }
+        for kind, key, count in self.conn.execute(
+            "SELECT kind, key, count FROM plan_stats"
+        ):
+            counts[kind][key] = count
+        # 两个条件都只匹配未完成计划截止日期索引中的一段
+        overdue, due_soon = self.conn.execute(
+            "SELECT (SELECT COUNT(*) FROM plans INDEXED BY idx_plans_open_deadline"
+            " WHERE completed = 0 AND deadline > '' AND deadline < ?),"
+            " (SELECT COUNT(*) FROM plans INDEXED BY idx_plans_open_deadline"
+            " WHERE completed = 0 AND deadline BETWEEN ? AND ?)",
+            (start, start, end),
+        ).fetchone()
+        return make_stats(
+            counts["total"].get("", 0),
+            counts["completed"].get("", 0),
+            counts["priority"],
+            counts["tag"],
+            overdue=overdue,
+            due_soon=due_soon,
+        )
+
+    def search(
+        self, query: str, limit: Optional[int] = None
+    ) -> List[Tuple[Dict, float]]:
+        """
+        按 BM25 评分全文检索，评分与内存中的全文索引一致
+
+        参数:
+            query: 查询文本
+            limit: 最多返回的数量，None 表示全部
+
+        返回:
+            按评分从高到低排列的 (计划字典, 评分)
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        row = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM plan_lengths"
+        ).fetchone()
+        count, total = row[0], row[1]
+        average = total / count if count else 0.0
+
+        placeholders = ",".join("?" * len(terms))
+        rows = self.conn.execute(
+            "SELECT t.term, t.plan_id, t.tf, l.length, p.pos,"
+            " COUNT(*) OVER (PARTITION BY t.term) AS df"
+            " FROM plan_terms t JOIN plan_lengths l ON l.plan_id = t.plan_id"
+            " JOIN plans p ON p.id = t.plan_id"
+            f" WHERE t.term IN ({placeholders}) ORDER BY t.term",
+            terms,
+        ).fetchall()
+        scores: Dict[str, float] = {}
+        order: Dict[str, int] = {}
+        for row in rows:
+            score = bm25(row["tf"], row["df"], row["length"], count, average)
+            scores[row["plan_id"]] = scores.get(row["plan_id"], 0.0) + score
+            order[row["plan_id"]] = row["pos"]
+
+        ranked = top_scores(scores, order, limit)
+        ids = [plan_id for plan_id, _ in ranked]
+        plans: Dict[str, Dict] = {}
+        # 分批查询，避免超出 SQLite 的参数数量限制
+        for start in range(0, len(ids), 500):
+            end = start + 500
+            chunk = ids[start:end]
+            rows = self.conn.execute(
+                f"SELECT * FROM plans WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            plans.update((plan["id"], plan) for plan in self._rows_to_plans(rows))
+        return [(plans[plan_id], score) for plan_id, score in ranked]
+
+
+# 各后端默认的存储文件，相对于当前目录
+DEFAULT_PATHS = {"json": "plans.json", "sqlite": "plans.db"}
+
+
+def create_storage(
+    backend: str = "json", path: Optional[str] = None, **options: Any
+) -> StorageBackend:
+    """
+    按名称创建存储后端
+
+    参数:
+        backend: 后端名称 (json, sqlite)
+        path: 存储文件路径，不提供时使用后端的默认路径
+        **options: 传递给后端构造函数的其他参数
+
+    返回:
+        存储后端对象
+    """
+    if backend == "json":
+        return JSONStorage(path or DEFAULT_PATHS[backend], **options)
+    if backend == "sqlite":
+        return SQLiteStorage(path or DEFAULT_PATHS[backend])
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+def migrate_storage(source: StorageBackend, target: StorageBackend) -> int:
+    """
+    将全部计划从一个存储后端复制到另一个
+
+    参数:
+        source: 源存储后端
+        target: 目标存储后端
+
+    返回:
+        迁移的计划数量
+    """
+    data = source.load()
+    target.save({"plans": data["plans"]})
+    return len(data["plans"])
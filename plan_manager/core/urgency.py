@@ -0,0 +1,217 @@
+"""
+紧急程度 - 按优先级和截止日期为未完成的计划评分，找出最紧急的几个计划
+
+评分等于优先级权重乘以时间系数。时间系数随截止日期临近而增大，
+过期后再加上过期加成；对同一优先级而言，截止日期越早评分越高。
+因此按截止日期顺序扫描时可以算出剩余计划评分的上限，提前结束扫描。
+"""
+
+import heapq
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .indexes import UNDATED, deadline_ordinal
+
+# 默认的优先级权重
+PRIORITY_WEIGHTS = {"high": 3.0, "medium": 2.0, "low": 1.0}
+
+
+class UrgencyScore:
+    """可配置的紧急程度评分"""
+
+    def __init__(
+        self,
+        priority_weights: Optional[Dict[str, float]] = None,
+        horizon_days: float = 7.0,
+        overdue_boost: float = 1.0,
+        overdue_daily: float = 0.1,
+        overdue_cap_days: int = 30,
+        undated: float = 0.05,
+    ):
+        """
+        初始化评分规则
+
+        参数:
+            priority_weights: 优先级到权重的映射，未列出的优先级权重为 0
+            horizon_days: 截止日期在该天数之后时，时间系数降到今天到期时的一半
+            overdue_boost: 过期计划在今天到期的系数之上额外增加的系数
+            overdue_daily: 每过期一天再增加的系数
+            overdue_cap_days: 按天增加的过期系数最多累计的天数
+            undated: 没有截止日期的计划的时间系数
+        """
+        if horizon_days <= 0:
+            raise ValueError("horizon_days 必须大于 0")
+        if min(overdue_boost, overdue_daily, overdue_cap_days, undated) < 0:
+            raise ValueError("过期加成和无截止日期系数不能为负数")
+        self.priority_weights = dict(priority_weights or PRIORITY_WEIGHTS)
+        # 权重为负时截止日期越早评分反而越低，无法按截止日期提前结束扫描
+        if any(weight < 0 for weight in self.priority_weights.values()):
+            raise ValueError("优先级权重不能为负数")
+        self.horizon_days = horizon_days
+        self.overdue_boost = overdue_boost
+        self.overdue_daily = overdue_daily
+        self.overdue_cap_days = overdue_cap_days
+        self.undated = undated
+
+    def time_factor(self, days: Optional[int]) -> float:
+        """
+        距截止日期的天数对应的时间系数，随天数增加单调不增
+
+        参数:
+            days: 截止日期减去今天的天数，负数表示已过期，None 表示没有截止日期
+        """
+        if days is None:
+            return self.undated
+        if days < 0:
+            overdue = min(-days, self.overdue_cap_days)
+            return 1.0 + self.overdue_boost + self.overdue_daily * overdue
+        return self.horizon_days / (self.horizon_days + days)
+
+    def weight(self, priority: str) -> float:
+        """优先级的权重"""
+        return self.priority_weights.get(priority, 0.0)
+
+    def __call__(self, plan: Dict, today: int) -> float:
+        """
+        计算计划的紧急程度
+
+        参数:
+            plan: 计划字典
+            today: 今天的日期序数
+
+        返回:
+            评分，越大越紧急
+        """
+        ordinal = deadline_ordinal(plan)
+        days = None if ordinal == UNDATED else ordinal - today
+        return self.weight(plan.get("priority", "")) * self.time_factor(days)
+
+
+class TopK:
+    """
+    保留评分最高的 k 个计划的有界最小堆
+
+    评分相同时截止日期早的优先，再相同时先遇到的优先
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.heap: List[Tuple[float, int, int, str]] = []
+        self.plans: Dict[str, Dict] = {}
+        self._seen = 0
+
+    @property
+    def full(self) -> bool:
+        """是否已经保留了 k 个计划"""
+        return len(self.heap) >= self.k
+
+    @property
+    def threshold(self) -> float:
+        """进入结果所需超过的评分，结果未满时为负无穷"""
+        return self.heap[0][0] if self.full else float("-inf")
+
+    def offer(self, plan: Dict, score: float, ordinal: int) -> None:
+        """
+        提交一个候选计划
+
+        参数:
+            plan: 计划字典
+            score: 紧急程度
+            ordinal: 截止日期序数，没有截止日期时为 UNDATED
+        """
+        if self.k <= 0:
+            return
+        self._seen += 1
+        item = (score, -ordinal, -self._seen, plan["id"])
+        if not self.full:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            removed = heapq.heappushpop(self.heap, item)
+            del self.plans[removed[3]]
+        else:
+            return
+        self.plans[plan["id"]] = plan
+
+    def result(self) -> List[Tuple[Dict, float]]:
+        """按紧急程度从高到低排列的 (计划字典, 评分)"""
+        items = sorted(self.heap, reverse=True)
+        return [(self.plans[item[3]], item[0]) for item in items]
+
+
+def top_by_scan(
+    plans: Iterable[Dict],
+    k: int,
+    today: int,
+    score: Callable[[Dict, int], float],
+) -> List[Tuple[Dict, float]]:
+    """
+    逐个计算评分，用有界堆保留最紧急的 k 个计划
+
+    参数:
+        plans: 候选计划，按截止日期顺序提供时评分相同的计划保持该顺序
+        k: 数量
+        today: 今天的日期序数
+        score: 评分函数
+
+    返回:
+        按紧急程度从高到低排列的 (计划字典, 评分)
+    """
+    top = TopK(k)
+    for plan in plans:
+        top.offer(plan, score(plan, today), deadline_ordinal(plan))
+    return top.result()
+
+
+def top_by_deadline(
+    dated: Iterable[Tuple[Dict, int]],
+    undated: Iterable[Dict],
+    k: int,
+    today: int,
+    score: UrgencyScore,
+) -> List[Tuple[Dict, float]]:
+    """
+    按截止日期顺序扫描未完成的计划，剩余计划不可能进入结果时提前结束
+
+    同一优先级的计划截止日期越晚评分越低，所以扫描到某个截止日期时，
+    剩余计划的评分不会超过 最大权重 × 该日期的时间系数。
+    没有截止日期的计划评分只取决于优先级，每个优先级最多只需要看前 k 个。
+
+    参数:
+        dated: 按截止日期排列的有截止日期的计划，元素为 (计划字典, 日期序数)
+        undated: 按添加顺序排列的没有截止日期的计划
+        k: 数量
+        today: 今天的日期序数
+        score: 评分规则
+
+    返回:
+        按紧急程度从高到低排列的 (计划字典, 评分)
+    """
+    top = TopK(k)
+    if k <= 0:
+        return []
+    max_weight = max(score.priority_weights.values(), default=0.0)
+
+    for plan, ordinal in dated:
+        if (
+            top.full
+            and max_weight * score.time_factor(ordinal - today) <= top.threshold
+        ):
+            break
+        top.offer(plan, score(plan, today), ordinal)
+
+    factor = score.time_factor(None)
+    seen: Dict[str, int] = {}
+    for plan in undated:
+        # 还可能进入结果的优先级都已看过 k 个时结束
+        pending = [
+            priority
+            for priority, weight in score.priority_weights.items()
+            if weight * factor > top.threshold and seen.get(priority, 0) < k
+        ]
+        if not pending:
+            break
+        priority = plan.get("priority", "")
+        if seen.get(priority, 0) >= k:
+            continue
+        seen[priority] = seen.get(priority, 0) + 1
+        top.offer(plan, score(plan, today), UNDATED)
+    return top.result()
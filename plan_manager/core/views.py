@@ -0,0 +1,98 @@
+"""
+计划视图 - 按需构建计划对象的只读序列
+"""
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Union, overload
+
+from ..models.plan import Plan
+from .query import PlanFilter
+
+if TYPE_CHECKING:
+    from .manager import PlanManager
+
+
+class PlanView(Sequence):
+    """
+    PlanManager.plans 返回的只读序列
+
+    计划对象在按下标访问或遍历到时才构建，并由管理器缓存；
+    某个计划被修改或删除时只有它的缓存失效。视图始终反映最新的数据。
+    视图中的计划对象与缓存共享，修改计划请使用 PlanManager.update_plan。
+    """
+
+    def __init__(self, manager: "PlanManager") -> None:
+        """
+        初始化视图
+
+        参数:
+            manager: 所属的计划管理器
+        """
+        self._manager = manager
+
+    def __len__(self) -> int:
+        """返回计划数"""
+        return len(self._manager._get_records())
+
+    def _plan(self, plan_id: str, plan_dict: Optional[Dict] = None) -> Plan:
+        """
+        返回计划对象
+
+        异常:
+            IndexError: 计划在取得ID之后被删除
+        """
+        plan = self._manager._plan_object(plan_id, plan_dict)
+        if plan is None:
+            raise IndexError(f"计划 {plan_id} 已被删除")
+        return plan
+
+    @overload
+    def __getitem__(self, index: int) -> Plan:
+        """按下标返回计划对象"""
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Plan]:
+        """按切片返回计划对象列表"""
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Plan, List[Plan]]:
+        """
+        按下标或切片返回计划对象
+
+        异常:
+            IndexError: 下标超出范围，或计划在访问期间被删除
+        """
+        ids = self._manager._plan_ids()
+        if isinstance(index, slice):
+            return [self._plan(plan_id) for plan_id in ids[index]]
+        return self._plan(ids[index])
+
+    def __iter__(self) -> Iterator[Plan]:
+        """按添加顺序遍历计划对象，跳过遍历期间被删除的计划"""
+        # 遍历开始时的ID列表，遍历期间增删计划不会影响迭代
+        for plan_id in self._manager._plan_ids():
+            plan = self._manager._plan_object(plan_id)
+            if plan is not None:
+                yield plan
+
+    def __contains__(self, plan: object) -> bool:
+        """判断计划对象是否是视图中的当前对象"""
+        if not isinstance(plan, Plan):
+            return False
+        return self._manager._plan_object(plan.id) is plan
+
+    def where(self, plan_filter: PlanFilter) -> Iterator[Plan]:
+        """
+        按查询条件遍历计划对象，只构建匹配的计划
+
+        参数:
+            plan_filter: 查询条件
+
+        返回:
+            计划对象的迭代器
+        """
+        for plan_dict in self._manager.query(plan_filter):
+            yield self._plan(plan_dict["id"], plan_dict)
+
+    def __repr__(self) -> str:
+        """返回包含计划数的表示"""
+        return f"<PlanView of {len(self)} plans>"
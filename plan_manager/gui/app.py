@@ -6,9 +6,22 @@ import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from typing import Dict, List, Optional, Any
 
-from ..core.manager import PlanManager
+from ..core.manager import PlanManager, AmbiguousPlanIdError
+from ..core.query import PlanFilter
 from ..utils.formatters import get_priority_display_name, get_priority_display_color
 
+# 计划列表每批插入的计划数，其余批次在界面空闲时继续插入
+LIST_BATCH_SIZE = 200
+
+# 搜索结果最多显示的计划数
+SEARCH_LIMIT = 200
+
+# 侧边栏显示的最紧急计划数
+URGENT_COUNT = 5
+
+# 最紧急计划和状态栏定时刷新的间隔（毫秒）
+REFRESH_MS = 60 * 1000
+
 
 class PlanManagerGUI:
     """计划管理器图形界面类"""
@@ -25,14 +38,24 @@ class PlanManagerGUI:
         self.accent_color = "#4a6baf"
         self.root.configure(bg=self.bg_color)
 
-        # 初始化计划管理器
-        self.plan_manager = PlanManager()
-        self.current_filter = {"tags": None, "priority": None, "completed": None}
+        # 初始化计划管理器，后台合并保存频繁的修改，避免界面卡顿
+        self.plan_manager = PlanManager(write_behind=True)
+        self.current_filter = {
+            "tags": None,
+            "tag_mode": "any",
+            "not_tags": None,
+            "priority": None,
+            "completed": None,
+        }
+        # 每次重新加载列表时递增，使上一次加载尚未插入的批次作废
+        self._load_generation = 0
 
         self.setup_styles()
         self.create_menu()
         self.create_widgets()
         self.load_plans()
+        # 紧急程度和过期数量随时间变化，没有修改时也定时刷新
+        self.root.after(REFRESH_MS, self.schedule_refresh)
 
         # 设置窗口图标
         try:
@@ -91,6 +114,7 @@ class PlanManagerGUI:
         # 编辑菜单
         edit_menu = tk.Menu(menu_bar, tearoff=0)
         edit_menu.add_command(label="添加计划", command=self.show_add_plan_dialog)
+        edit_menu.add_command(label="按ID查找", command=self.find_plan_by_id)
         edit_menu.add_command(label="清除筛选", command=self.clear_filters)
         menu_bar.add_cascade(label="编辑", menu=edit_menu)
 
@@ -104,6 +128,7 @@ class PlanManagerGUI:
             label="只显示已完成", command=lambda: self.filter_by_completion(True)
         )
         view_menu.add_command(label="即将到期", command=self.show_upcoming)
+        view_menu.add_command(label="已过期", command=self.show_overdue)
         menu_bar.add_cascade(label="查看", menu=view_menu)
 
         # 帮助菜单
@@ -116,6 +141,12 @@ class PlanManagerGUI:
 
     def create_widgets(self):
         """创建主界面组件"""
+        # 底部状态栏，先放置以免被主窗口挤出
+        self.status_var = tk.StringVar()
+        ttk.Label(
+            self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W
+        ).pack(side=tk.BOTTOM, fill=tk.X)
+
         # 主分割窗口
         self.main_paned = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
         self.main_paned.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -188,6 +219,25 @@ class PlanManagerGUI:
         self.tags_entry = ttk.Entry(self.filter_frame)
         self.tags_entry.pack(fill=tk.X, pady=5)
 
+        self.tag_mode_var = tk.StringVar(value="any")
+        tag_mode_frame = ttk.Frame(self.filter_frame)
+        tag_mode_frame.pack(fill=tk.X, pady=5)
+
+        tag_modes = [("任一标签", "any"), ("全部标签", "all")]
+        for text, value in tag_modes:
+            ttk.Radiobutton(
+                tag_mode_frame,
+                text=text,
+                value=value,
+                variable=self.tag_mode_var,
+                command=self.apply_tag_filter,
+            ).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(self.filter_frame, text="排除标签:").pack(pady=(5, 5), anchor=tk.W)
+
+        self.not_tags_entry = ttk.Entry(self.filter_frame)
+        self.not_tags_entry.pack(fill=tk.X, pady=5)
+
         ttk.Button(
             self.filter_frame, text="应用标签筛选", command=self.apply_tag_filter
         ).pack(pady=5, anchor=tk.W)
@@ -205,6 +255,18 @@ class PlanManagerGUI:
             self.filter_frame, text="查看即将到期", command=self.show_upcoming
         ).pack(pady=5, anchor=tk.W)
 
+        # 最紧急的计划，双击查看详情
+        ttk.Separator(self.filter_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=10)
+        ttk.Label(self.filter_frame, text="最紧急:").pack(pady=(0, 5), anchor=tk.W)
+
+        self.urgent_list = tk.Listbox(
+            self.filter_frame, height=URGENT_COUNT, activestyle="none"
+        )
+        self.urgent_list.pack(fill=tk.X, pady=5)
+        self.urgent_list.bind("<Double-1>", self.on_urgent_double_click)
+        # 紧急列表每一行对应的计划ID
+        self._urgent_ids = []
+
     def create_plan_list(self):
         """创建计划列表区域"""
         # 列表上方的标题和搜索框
@@ -215,6 +277,14 @@ class PlanManagerGUI:
             side=tk.LEFT
         )
 
+        # 全文搜索，回车或点击按钮搜索，清空后搜索恢复完整列表
+        ttk.Button(header_frame, text="搜索", command=self.search_plans).pack(
+            side=tk.RIGHT
+        )
+        self.search_entry = ttk.Entry(header_frame, width=30)
+        self.search_entry.pack(side=tk.RIGHT, padx=5)
+        self.search_entry.bind("<Return>", lambda event: self.search_plans())
+
         # 计划列表（使用Treeview）
         columns = ("id", "title", "priority", "deadline", "tags", "status")
         self.plan_tree = ttk.Treeview(
@@ -304,60 +374,132 @@ class PlanManagerGUI:
 
         # 根据筛选条件获取计划
         tags = None
+        all_tags = None
         if self.current_filter["tags"]:
-            tags = self.current_filter["tags"]
+            if self.current_filter["tag_mode"] == "all":
+                all_tags = self.current_filter["tags"]
+            else:
+                tags = self.current_filter["tags"]
 
         priority = self.current_filter["priority"]
 
         completed = self.current_filter["completed"]
 
-        # 从计划管理器获取过滤后的计划
-        plans = self.plan_manager.get_plans(tags, priority, completed)
+        # 按截止日期排序，未设置截止日期的计划放在最后
+        plan_filter = PlanFilter(
+            tags,
+            priority,
+            completed,
+            all_tags=all_tags,
+            not_tags=self.current_filter["not_tags"],
+            order_by="deadline",
+        )
 
-        # 按截止日期排序
-        if plans:
-            # 未设置截止日期的计划放在最后
-            def sort_key(plan):
-                if not plan["deadline"]:
-                    return "9999-99-99"  # 一个很大的日期值
-                return plan["deadline"]
+        # 设置行颜色
+        self.plan_tree.tag_configure("high", background="#ffcccc")
+        self.plan_tree.tag_configure("medium", background="#ffffcc")
+        self.plan_tree.tag_configure("low", background="#ccffcc")
+        self.plan_tree.tag_configure(
+            "completed", background="#e0e0e0", foreground="#888888"
+        )
 
-            plans.sort(key=sort_key)
+        # 先插入第一批，其余的分批插入，计划很多时界面也能立即响应
+        self._load_generation += 1
+        self.insert_plan_batch(plan_filter, None, self._load_generation)
+        self.refresh_urgent()
+        self.refresh_status()
+
+    def refresh_urgent(self):
+        """刷新侧边栏的最紧急计划"""
+        ranked = self.plan_manager.top_urgent(URGENT_COUNT)
+        self.urgent_list.delete(0, tk.END)
+        self._urgent_ids = []
+        for plan, _ in ranked:
+            deadline = plan.get("deadline") or "无截止日期"
+            self.urgent_list.insert(tk.END, f"{plan['title']} ({deadline})")
+            self.urgent_list.itemconfig(
+                tk.END, background=get_priority_display_color(plan["priority"])
+            )
+            self._urgent_ids.append(plan["id"])
+
+    def refresh_status(self):
+        """刷新状态栏的汇总统计"""
+        stats = self.plan_manager.stats()
+        self.status_var.set(
+            f"共 {stats['total']} 个计划 | 未完成 {stats['open']} | "
+            f"已过期 {stats['overdue']} | 一周内到期 {stats['due_this_week']}"
+        )
 
-        # 添加到树状视图
-        for plan in plans:
-            # 格式化显示内容
-            plan_id = plan["id"][:8]  # 只显示ID的前8位
-            title = plan["title"]
-            priority = get_priority_display_name(plan["priority"])
-            deadline = plan["deadline"] if plan["deadline"] else "无"
-            tags = ", ".join(plan["tags"]) if plan["tags"] else "无"
-            status = "已完成" if plan["completed"] else "未完成"
+    def schedule_refresh(self):
+        """刷新最紧急计划和状态栏，并安排下一次刷新"""
+        self.refresh_urgent()
+        self.refresh_status()
+        self.root.after(REFRESH_MS, self.schedule_refresh)
+
+    def on_urgent_double_click(self, event):
+        """双击最紧急计划时查看详情"""
+        selection = self.urgent_list.curselection()
+        if selection:
+            self.view_plan_details(self._urgent_ids[selection[0]])
+
+    def insert_plan_batch(
+        self, plan_filter: PlanFilter, after: Optional[str], generation: int
+    ):
+        """
+        向列表插入一批计划，还有剩余时安排下一批
 
-            # 根据优先级和状态决定标签颜色
-            if plan["completed"]:
-                tag = "completed"
-            else:
-                tag = plan["priority"]
+        参数:
+            plan_filter: 查询条件
+            after: 上一批最后一个计划的ID
+            generation: 发起加载时的加载序号，列表已重新加载时不再插入
+        """
+        if generation != self._load_generation:
+            return
 
-            item_id = self.plan_tree.insert(
-                "",
-                tk.END,
-                values=(plan_id, title, priority, deadline, tags, status),
-                tags=(tag,),
+        last_id = None
+        count = 0
+        try:
+            for plan in self.plan_manager.iter_plans(
+                plan_filter, limit=LIST_BATCH_SIZE, after=after
+            ):
+                self.insert_plan_row(plan)
+                last_id = plan["id"]
+                count += 1
+        except ValueError:
+            # 上一批最后的计划已被删除，删除时会重新加载列表
+            return
+
+        if count == LIST_BATCH_SIZE:
+            self.root.after(
+                1, lambda: self.insert_plan_batch(plan_filter, last_id, generation)
             )
 
-            # 将完整的计划ID存储为项目的属性
-            self.plan_tree.item(item_id, tags=(tag, plan["id"]))
+    def insert_plan_row(self, plan: Dict):
+        """向列表末尾插入一个计划"""
+        # 格式化显示内容
+        plan_id = plan["id"][:8]  # 只显示ID的前8位
+        title = plan["title"]
+        priority = get_priority_display_name(plan["priority"])
+        deadline = plan["deadline"] if plan["deadline"] else "无"
+        tags = ", ".join(plan["tags"]) if plan["tags"] else "无"
+        status = "已完成" if plan["completed"] else "未完成"
+
+        # 根据优先级和状态决定标签颜色
+        if plan["completed"]:
+            tag = "completed"
+        else:
+            tag = plan["priority"]
 
-        # 设置行颜色
-        self.plan_tree.tag_configure("high", background="#ffcccc")
-        self.plan_tree.tag_configure("medium", background="#ffffcc")
-        self.plan_tree.tag_configure("low", background="#ccffcc")
-        self.plan_tree.tag_configure(
-            "completed", background="#e0e0e0", foreground="#888888"
+        item_id = self.plan_tree.insert(
+            "",
+            tk.END,
+            values=(plan_id, title, priority, deadline, tags, status),
+            tags=(tag,),
         )
 
+        # 将完整的计划ID存储为项目的属性
+        self.plan_tree.item(item_id, tags=(tag, plan["id"]))
+
     def apply_filters(self):
         """应用优先级和完成状态筛选"""
         priority = self.priority_var.get() if self.priority_var.get() else None
@@ -384,14 +526,46 @@ class PlanManagerGUI:
         else:
             self.current_filter["tags"] = None
 
+        not_tags_text = self.not_tags_entry.get().strip()
+        if not_tags_text:
+            not_tags = [tag.strip() for tag in not_tags_text.split(",")]
+            self.current_filter["not_tags"] = not_tags
+        else:
+            self.current_filter["not_tags"] = None
+
+        self.current_filter["tag_mode"] = self.tag_mode_var.get()
+
         self.load_plans()
 
+    def search_plans(self):
+        """按标题和描述全文搜索，结果按相关程度排列"""
+        query = self.search_entry.get().strip()
+        if not query:
+            self.load_plans()
+            return
+
+        # 使尚未插入的列表批次作废
+        self._load_generation += 1
+        for item in self.plan_tree.get_children():
+            self.plan_tree.delete(item)
+        for plan, _ in self.plan_manager.search(query, SEARCH_LIMIT):
+            self.insert_plan_row(plan)
+
     def clear_filters(self):
         """清除所有筛选条件"""
-        self.current_filter = {"tags": None, "priority": None, "completed": None}
+        self.current_filter = {
+            "tags": None,
+            "tag_mode": "any",
+            "not_tags": None,
+            "priority": None,
+            "completed": None,
+        }
         self.priority_var.set("")
         self.completion_var.set("all")
         self.tags_entry.delete(0, tk.END)
+        self.tag_mode_var.set("any")
+        self.not_tags_entry.delete(0, tk.END)
+        self.search_entry.delete(0, tk.END)
 
         self.load_plans()
 
@@ -409,13 +583,34 @@ class PlanManagerGUI:
         if days is None:
             return
 
+        # 获取即将到期的计划
+        plans = self.plan_manager.get_upcoming_deadlines(days)
+        self.show_deadline_plans(plans)
+
+        # 显示过滤提示
+        if plans:
+            messagebox.showinfo(
+                "即将到期", f"显示未来 {days} 天内即将到期的 {len(plans)} 个计划"
+            )
+        else:
+            messagebox.showinfo("即将到期", f"未来 {days} 天内没有即将到期的计划")
+
+    def show_overdue(self):
+        """显示已过期的计划"""
+        plans = self.plan_manager.get_overdue_plans()
+        self.show_deadline_plans(plans)
+
+        if plans:
+            messagebox.showinfo("已过期", f"显示 {len(plans)} 个已过期的计划")
+        else:
+            messagebox.showinfo("已过期", "没有已过期的计划")
+
+    def show_deadline_plans(self, plans):
+        """在列表中显示按截止日期查询到的计划"""
         # 清空现有列表
         for item in self.plan_tree.get_children():
             self.plan_tree.delete(item)
 
-        # 获取即将到期的计划
-        plans = self.plan_manager.get_upcoming_deadlines(days)
-
         # 添加到树状视图
         for plan in plans:
             plan_id = plan["id"][:8]
@@ -436,14 +631,6 @@ class PlanManagerGUI:
             )
             self.plan_tree.item(item_id, tags=(tag, plan["id"]))
 
-        # 显示过滤提示
-        if plans:
-            messagebox.showinfo(
-                "即将到期", f"显示未来 {days} 天内即将到期的 {len(plans)} 个计划"
-            )
-        else:
-            messagebox.showinfo("即将到期", f"未来 {days} 天内没有即将到期的计划")
-
     def get_selected_plan_id(self):
         """获取当前选中计划的完整ID"""
         selection = self.plan_tree.selection()
@@ -460,9 +647,32 @@ class PlanManagerGUI:
 
         return None
 
-    def view_plan_details(self):
+    def find_plan_by_id(self):
+        """按完整ID或ID前缀（如列表中显示的前8位）查找计划"""
+        prefix = simpledialog.askstring("按ID查找", "请输入计划ID或ID前缀:")
+        if not prefix or not prefix.strip():
+            return
+
+        try:
+            plan_id = self.plan_manager.resolve_plan_id(prefix.strip())
+        except AmbiguousPlanIdError as e:
+            messagebox.showerror(
+                "错误",
+                f"ID前缀 {e.prefix} 不唯一，匹配到以下计划:\n"
+                + "\n".join(e.candidates),
+            )
+            return
+
+        if plan_id is None:
+            messagebox.showerror("错误", "找不到该计划")
+            return
+
+        self.view_plan_details(plan_id)
+
+    def view_plan_details(self, plan_id=None):
         """查看计划详情"""
-        plan_id = self.get_selected_plan_id()
+        if plan_id is None:
+            plan_id = self.get_selected_plan_id()
         if not plan_id:
             return
 
@@ -557,7 +767,7 @@ class PlanManagerGUI:
         ttk.Button(
             button_frame,
             text="编辑",
-            command=lambda: [details_window.destroy(), self.edit_selected_plan()],
+            command=lambda: [details_window.destroy(), self.show_plan_dialog(plan_id)],
         ).pack(side=tk.LEFT, padx=5)
 
         if not plan_dict["completed"]:
@@ -767,6 +977,7 @@ class PlanManagerGUI:
 
     def export_data(self):
         """导出计划数据"""
+        self.plan_manager.flush()
         messagebox.showinfo(
             "导出数据", f"数据已保存到 {self.plan_manager.storage_path}"
         )
@@ -786,7 +997,9 @@ class PlanManagerGUI:
         4. 标记完成：选中计划后点击"标记完成"按钮。
         5. 筛选计划：使用左侧筛选面板按不同条件筛选。
         6. 查看即将到期：点击左侧"查看即将到期"按钮。
-        7. 数据存储：所有数据保存在plans.json文件中。
+        7. 搜索计划：在列表上方的搜索框中输入文字后回车，按相关程度列出结果。
+        8. 最紧急计划：左侧列出按优先级和截止日期计算的最紧急计划，双击查看详情。
+        9. 数据存储：所有数据保存在plans.json文件中。
         """
 
         help_window = tk.Toplevel(self.root)
@@ -825,6 +1038,9 @@ def run_gui():
     app = PlanManagerGUI(root)
     root.mainloop()
 
+    # 窗口关闭后保存尚未写入的修改
+    app.plan_manager.close()
+
 
 if __name__ == "__main__":
     run_gui()
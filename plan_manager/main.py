@@ -7,10 +7,9 @@
 
 import sys
 import argparse
-from typing import List
+from typing import List, Optional
 
-from plan_manager.cli import main as cli_main
-from plan_manager.gui import run_gui
+from plan_manager.client import forward
 
 
 def parse_args() -> argparse.Namespace:
@@ -29,26 +28,36 @@ def parse_args() -> argparse.Namespace:
     return args
 
 
-def main(argv: List[str] = None) -> int:
+def main(argv: Optional[List[str]] = None) -> int:
     """主函数，作为程序入口点"""
     if argv is None:
         argv = sys.argv
 
     args = parse_args()
 
+    # 命令行和图形界面在用到时才导入：守护进程在运行时命令直接转发给它，
+    # 省去导入计划管理器和加载计划的时间
     if args.gui:
         # 启动图形界面
+        from plan_manager.gui import run_gui
+
         run_gui()
     else:
+        status = forward(args.unknown)
+        if status is not None:
+            return status
+
         # 启动命令行界面
         # 传递剩余参数给命令行解析器
+        from plan_manager.cli import main as cli_main
+
         sys.argv = [sys.argv[0]] + args.unknown
         cli_main()
 
     return 0
 
 
-def main_gui(argv: List[str] = None) -> int:
+def main_gui(argv: Optional[List[str]] = None) -> int:
     """图形界面入口函数"""
     if argv is None:
         argv = sys.argv
@@ -2,6 +2,6 @@
 数据模型模块 - 定义计划数据结构
 """
 
-from .plan import Plan
+from .plan import Plan, Priority
 
-__all__ = ["Plan"]
+__all__ = ["Plan", "Priority"]
@@ -2,25 +2,193 @@
 计划模型 - 定义计划数据结构
 """
 
+import os
+import sys
+import time
 import uuid
 import datetime
-from typing import List, Optional, Dict, Any
+import threading
+from enum import Enum
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+# 创建时间的格式
+CREATED_AT_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# parse_created_at 计算整数秒的起点
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# update_plan 可以修改的字段，ID和创建时间创建后不再改变
+EDITABLE_FIELDS = ("title", "description", "deadline", "priority", "tags", "completed")
+
+# 相同的标签组合共用一个元组
+_tag_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+# 最近生成的按时间排序ID的毫秒时间戳和序号，保证同一进程内严格递增
+_last_time_id = [0, 0]
+_time_id_lock = threading.Lock()
+
+
+class Priority(str, Enum):
+    """计划优先级，成员本身就是对应的字符串，可以直接与 "low" 等比较"""
+
+    LOW = "low"
+    MEDIUM = "medium"
+    HIGH = "high"
+
+    def __str__(self) -> str:
+        """返回优先级的字符串值"""
+        return self.value
+
+
+def intern_tags(tags: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    将标签转换为共享的元组
+
+    参数:
+        tags: 标签列表
+
+    返回:
+        内容相同的标签共用同一个元组，标签字符串也被驻留
+    """
+    key = tuple(sys.intern(tag) for tag in tags or ())
+    return _tag_tuples.setdefault(key, key)
+
+
+def parse_created_at(value: str) -> int:
+    """
+    将创建时间转换为整数秒
+
+    按字面的日期和时间计算，不做时区换算，因此可以原样格式化回字符串
+
+    参数:
+        value: YYYY-MM-DD HH:MM:SS 格式的创建时间
+
+    返回:
+        整数秒
+
+    异常:
+        ValueError: 格式无效
+    """
+    # fromisoformat 比 strptime 快得多；只接受与 CREATED_AT_FORMAT 完全一致的写法
+    if len(value) != 19 or value[10] != " " or value[13] + value[16] != "::":
+        raise ValueError(f"创建时间格式必须为 {CREATED_AT_FORMAT}")
+    moment = datetime.datetime.fromisoformat(value)
+    return (moment - _EPOCH) // datetime.timedelta(seconds=1)
+
+
+def format_created_at(seconds: int) -> str:
+    """将 parse_created_at 得到的整数秒格式化为创建时间字符串"""
+    return (_EPOCH + datetime.timedelta(seconds=seconds)).strftime(CREATED_AT_FORMAT)
+
+
+def time_ordered_id() -> str:
+    """
+    生成按创建时间排序的计划ID
+
+    采用 UUIDv7 的布局：前 48 位是毫秒时间戳，随后 12 位是同一毫秒内
+    递增的序号，其余是随机数。同一进程内生成的ID严格递增，
+    因此ID的字典序就是创建顺序，并且可以与 uuid4 的ID共存
+
+    返回:
+        标准 UUID 格式的ID字符串
+    """
+    with _time_id_lock:
+        millis = time.time_ns() // 1_000_000
+        last_millis, counter = _last_time_id
+        if millis <= last_millis:
+            # 同一毫秒内或时钟回拨时沿用上一个时间戳，序号用完后借用下一毫秒
+            millis, counter = last_millis, counter + 1
+            if counter > 0xFFF:
+                millis, counter = millis + 1, 0
+        else:
+            counter = 0
+        _last_time_id[:] = [millis, counter]
+
+    random_bits = int.from_bytes(os.urandom(8), "big") & (1 << 62) - 1
+    value = millis << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random_bits
+    return str(uuid.UUID(int=value))
+
+
+def id_timestamp(plan_id: str) -> Optional[int]:
+    """
+    取出按时间排序的ID中的毫秒时间戳
+
+    参数:
+        plan_id: 计划ID
+
+    返回:
+        Unix 毫秒时间戳，不是按时间排序的ID时返回 None
+    """
+    if len(plan_id) != 36 or plan_id[14] != "7" or plan_id[19] not in "89ab":
+        return None
+    try:
+        return int(plan_id[:8] + plan_id[9:13], 16)
+    except ValueError:
+        return None
+
+
+def time_id_bound(millis: int) -> str:
+    """
+    返回不小于指定时间戳的按时间排序ID的下界
+
+    参数:
+        millis: Unix 毫秒时间戳
+
+    返回:
+        该毫秒及之后生成的ID按字典序都不小于这个字符串
+    """
+    return str(uuid.UUID(int=millis << 80 | 0x7 << 76 | 0b10 << 62))
+
+
+def id_created_at(plan_id: str) -> Optional[str]:
+    """
+    按时间排序的ID对应的创建时间（本地时间）
+
+    参数:
+        plan_id: 计划ID
+
+    返回:
+        YYYY-MM-DD HH:MM:SS 格式的创建时间，不是按时间排序的ID时返回 None
+    """
+    millis = id_timestamp(plan_id)
+    if millis is None:
+        return None
+    moment = datetime.datetime.fromtimestamp(millis // 1000)
+    return moment.strftime(CREATED_AT_FORMAT)
 
 
 class Plan:
     """计划数据模型类"""
 
+    # 不为每个实例创建 __dict__；优先级、创建时间和标签以紧凑的形式保存
+    __slots__ = (
+        "id",
+        "title",
+        "description",
+        "deadline",
+        "completed",
+        "_priority",
+        "_tags",
+        "created_ts",
+        "_created_raw",
+    )
+
+    # 能解析的创建时间保存为整数秒，此时 _created_raw 为空；否则原样保存字符串
+    created_ts: Optional[int]
+    _created_raw: str
+
     def __init__(
         self,
         title: str,
         description: str,
         deadline: Optional[str] = None,
         priority: str = "medium",
-        tags: List[str] = None,
-        plan_id: str = None,
-        created_at: str = None,
+        tags: Optional[List[str]] = None,
+        plan_id: Optional[str] = None,
+        created_at: Optional[str] = None,
         completed: bool = False,
-    ):
+        validate: bool = True,
+    ) -> None:
         """
         初始化计划对象
 
@@ -33,23 +201,77 @@ class Plan:
             plan_id: 计划ID（如果不提供则自动生成）
             created_at: 创建时间（如果不提供则使用当前时间）
             completed: 是否已完成
+            validate: 是否验证数据，已经验证过的数据可以跳过
         """
         self.title = title
         self.description = description
         self.deadline = deadline
         self.priority = priority
-        self.tags = tags or []
+        self.tags = tags
         self.id = plan_id or str(uuid.uuid4())
         self.created_at = created_at or datetime.datetime.now().strftime(
-            "%Y-%m-%d %H:%M:%S"
+            CREATED_AT_FORMAT
         )
         self.completed = completed
 
         # 验证数据
-        self.validate()
+        if validate:
+            self.validate()
+
+    @property
+    def priority(self) -> Priority:
+        """优先级"""
+        return self._priority
 
-    def validate(self):
+    @priority.setter
+    def priority(self, value: str) -> None:
+        try:
+            self._priority = Priority(value)
+        except ValueError:
+            raise ValueError("优先级必须为 low, medium 或 high")
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        """标签，以共享的元组保存"""
+        return self._tags
+
+    @tags.setter
+    def tags(self, value: Optional[Iterable[str]]) -> None:
+        # 字符串本身可迭代，不检查会被拆成单个字符的标签
+        if isinstance(value, str):
+            raise ValueError("标签必须是字符串列表")
+        try:
+            self._tags = intern_tags(value)
+        except TypeError:
+            raise ValueError("标签必须是字符串列表")
+
+    @property
+    def created_at(self) -> str:
+        """创建时间 (YYYY-MM-DD HH:MM:SS 格式)"""
+        if self.created_ts is None:
+            return self._created_raw
+        return format_created_at(self.created_ts)
+
+    @created_at.setter
+    def created_at(self, value: str) -> None:
+        try:
+            self.created_ts = parse_created_at(value)
+            self._created_raw = ""
+        except (TypeError, ValueError):
+            # 其他格式的旧数据原样保留
+            self.created_ts = None
+            self._created_raw = value
+
+    def validate(self) -> None:
         """验证计划数据的有效性"""
+        # 索引和搜索按字符串处理这些字段，类型错误的计划无法被维护
+        if not isinstance(self.title, str) or not isinstance(self.description, str):
+            raise ValueError("标题和描述必须是字符串")
+        if not isinstance(self.completed, bool):
+            raise ValueError("完成状态必须为 true 或 false")
+        if self.deadline is not None and not isinstance(self.deadline, str):
+            raise ValueError("截止日期格式必须为 YYYY-MM-DD")
+
         # 验证日期格式
         if self.deadline:
             try:
@@ -57,10 +279,6 @@ class Plan:
             except ValueError:
                 raise ValueError("截止日期格式必须为 YYYY-MM-DD")
 
-        # 验证优先级
-        if self.priority not in ["low", "medium", "high"]:
-            raise ValueError("优先级必须为 low, medium 或 high")
-
     def to_dict(self) -> Dict[str, Any]:
         """将计划对象转换为字典"""
         return {
@@ -69,14 +287,20 @@ class Plan:
             "description": self.description,
             "created_at": self.created_at,
             "deadline": self.deadline,
-            "priority": self.priority,
-            "tags": self.tags,
+            "priority": self.priority.value,
+            "tags": list(self.tags),
             "completed": self.completed,
         }
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "Plan":
-        """从字典创建计划对象"""
+    def from_dict(cls, data: Dict[str, Any], validate: bool = True) -> "Plan":
+        """
+        从字典创建计划对象
+
+        参数:
+            data: 计划字典
+            validate: 是否验证数据，来自本程序存储、已经验证过的数据可以跳过
+        """
         return cls(
             title=data["title"],
             description=data["description"],
@@ -86,6 +310,7 @@ class Plan:
             plan_id=data.get("id"),
             created_at=data.get("created_at"),
             completed=data.get("completed", False),
+            validate=validate,
         )
 
     def __str__(self) -> str:
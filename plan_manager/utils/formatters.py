@@ -52,6 +52,33 @@ def format_plan_for_display(plan: Dict[str, Any]) -> str:
     return "\n".join(result)
 
 
+def format_stats(stats: Dict[str, Any]) -> str:
+    """
+    格式化输出汇总统计，适用于命令行显示
+
+    参数:
+        stats: PlanManager.stats 返回的汇总字典
+
+    返回:
+        格式化后的字符串
+    """
+    priorities = " / ".join(
+        f"{get_priority_display_name(priority)} {count}"
+        for priority, count in stats["by_priority"].items()
+    )
+    tags = ", ".join(f"{tag} {count}" for tag, count in stats["by_tag"].items())
+    return "\n".join(
+        [
+            f"计划总数: {stats['total']}",
+            f"已完成: {stats['completed']}  未完成: {stats['open']}",
+            f"已过期: {stats['overdue']}",
+            f"一周内到期: {stats['due_this_week']}",
+            f"按优先级: {priorities}",
+            f"按标签: {tags or '无'}",
+        ]
+    )
+
+
 def get_priority_display_name(priority: str) -> str:
     """
     获取优先级的显示名称
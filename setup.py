@@ -38,4 +38,8 @@ setup(
     install_requires=[
         # 依赖包，本项目只使用标准库
     ],
+    extras_require={
+        # 列式内存表的向量化过滤，未安装时使用纯 Python 实现
+        "columnar": ["numpy>=1.17"],
+    },
 )
@@ -0,0 +1,1105 @@
+#!/usr/bin/env python3
+"""
+性能基准测试工具
+
+在内存中生成合成计划数据，测量计划管理器各项操作的耗时。
+存储使用只在内存中的后端，结果不受磁盘读写影响。
+
+使用方法:
+    python tools/benchmark.py ids --sizes 10000 100000 1000000
+"""
+
+import gc
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import subprocess
+import multiprocessing
+import datetime
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plan_manager.cli.daemon import PlanDaemon
+from plan_manager.cli.main import execute_request, parse_args
+from plan_manager.client import forward
+from plan_manager.core import columnar
+from plan_manager.core.async_manager import AsyncPlanManager
+from plan_manager.core.columnar import PlanTable
+from plan_manager.core.manager import PlanManager
+from plan_manager.core.query import PlanFilter
+from plan_manager.models.plan import Plan, id_created_at
+from plan_manager.core.storage import JSONStorage, StorageBackend
+
+PRIORITIES = ["low", "medium", "high"]
+TAGS = ["work", "home", "study", "health", "travel", "finance", "family", "misc"]
+
+
+class MemoryStorage(StorageBackend):
+    """只保存在内存中的存储后端"""
+
+    # 合成数据都是有效的，不需要在加载时验证
+    trusted = True
+
+    def __init__(self, plans: List[Dict]):
+        super().__init__(":memory:")
+        self.plans = plans
+
+    def load(self) -> Dict:
+        """返回内存中的计划"""
+        return {"plans": self.plans}
+
+    def save(self, data: Dict, durable: bool = True) -> None:
+        """不保存任何内容"""
+
+    def commit(self, records, snapshot, durable: bool = True) -> List[Dict]:
+        """不保存，也没有其他进程的修改"""
+        return []
+
+
+def make_plans(count: int, seed: int = 0) -> List[Dict]:
+    """生成合成计划数据"""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    plans = []
+    for i in range(count):
+        deadline = None
+        if rng.random() < 0.8:
+            deadline = (
+                today + datetime.timedelta(days=rng.randint(-60, 300))
+            ).isoformat()
+        plans.append(
+            {
+                "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "title": f"计划 {i}",
+                "description": f"第 {i} 个合成计划",
+                "created_at": "2025-01-01 00:00:00",
+                "deadline": deadline,
+                "priority": rng.choice(PRIORITIES),
+                "tags": rng.sample(TAGS, rng.randint(0, 3)),
+                "completed": rng.random() < 0.3,
+            }
+        )
+    return plans
+
+
+def make_manager(plans: List[Dict]) -> PlanManager:
+    """基于内存存储创建计划管理器"""
+    return PlanManager(storage=MemoryStorage(plans))
+
+
+def timeit(func: Callable[[], object], repeat: int) -> float:
+    """返回单次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def print_table(headers: List[str], rows: List[List[object]]) -> None:
+    """打印对齐的结果表格"""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for line in [headers, ["-" * w for w in widths]] + rows:
+        print("  ".join(str(cell).rjust(w) for cell, w in zip(line, widths)))
+
+
+def bench_ids(args: argparse.Namespace) -> None:
+    """按ID查询、更新和删除：线性扫描与ID索引对比"""
+    rows = []
+    for size in args.sizes:
+        plans = make_plans(size)
+        rng = random.Random(1)
+        targets = [plan["id"] for plan in rng.sample(plans, args.ops)]
+
+        # 原实现：在计划列表中线性查找，删除时移动后续元素
+        plan_list = list(plans)
+
+        def scan_get():
+            for plan_id in targets:
+                next(p for p in plan_list if p["id"] == plan_id)
+
+        def scan_delete():
+            for plan_id in targets:
+                for i, plan in enumerate(plan_list):
+                    if plan["id"] == plan_id:
+                        del plan_list[i]
+                        break
+
+        manager = make_manager(list(plans))
+
+        def index_get():
+            for plan_id in targets:
+                manager.get_plan_by_id(plan_id)
+
+        def index_update():
+            for plan_id in targets:
+                manager.update_plan(plan_id, priority="high")
+
+        def index_delete():
+            for plan_id in targets:
+                manager.delete_plan(plan_id)
+
+        ops = len(targets)
+        rows.append(
+            [
+                size,
+                f"{timeit(scan_get, 1) / ops:.1f}",
+                f"{timeit(index_get, 1) / ops:.1f}",
+                f"{timeit(scan_delete, 1) / ops:.1f}",
+                f"{timeit(index_update, 1) / ops:.1f}",
+                f"{timeit(index_delete, 1) / ops:.1f}",
+            ]
+        )
+
+    print("单个计划操作的平均耗时（微秒）")
+    print_table(
+        ["计划数", "扫描查找", "索引查找", "扫描删除", "索引更新", "索引删除"], rows
+    )
+
+
+def bench_deadlines(args: argparse.Namespace) -> None:
+    """即将到期查询：逐个解析日期的全量扫描与截止日期索引对比"""
+    rows = []
+    for size in args.sizes:
+        plans = make_plans(size)
+
+        def scan_upcoming():
+            today = datetime.datetime.now().date()
+            future = today + datetime.timedelta(days=7)
+            result = []
+            for plan in plans:
+                if not plan["deadline"] or plan["completed"]:
+                    continue
+                deadline = datetime.datetime.strptime(
+                    plan["deadline"], "%Y-%m-%d"
+                ).date()
+                if today <= deadline <= future:
+                    result.append(plan)
+            return sorted(result, key=lambda x: x["deadline"])
+
+        manager = make_manager(list(plans))
+        build = timeit(lambda: manager._index("deadline"), 1)
+
+        rows.append(
+            [
+                size,
+                f"{timeit(scan_upcoming, 1) / 1000:.1f}",
+                f"{build / 1000:.1f}",
+                f"{timeit(lambda: manager.get_upcoming_deadlines(7), args.ops) / 1000:.2f}",
+                f"{timeit(manager.get_overdue_plans, args.ops) / 1000:.2f}",
+            ]
+        )
+
+    print("截止日期查询的平均耗时（毫秒）")
+    print_table(["计划数", "扫描7天内", "建立索引", "索引7天内", "索引已过期"], rows)
+
+
+def bench_query(args: argparse.Namespace) -> None:
+    """组合条件查询：依次过滤整个列表与查询规划对比"""
+    today = datetime.date.today()
+    week = (today + datetime.timedelta(days=7)).isoformat()
+    queries = {
+        "优先级+两个标签": dict(priority="high", all_tags=["work", "travel"]),
+        "7天内未完成": dict(
+            completed=False, deadline_from=today.isoformat(), deadline_to=week
+        ),
+        "标签+排除+排序": dict(tags=["home"], not_tags=["misc"], order_by="deadline"),
+    }
+
+    rows = []
+    for size in args.sizes:
+        plans = make_plans(size)
+        manager = make_manager(list(plans))
+        # 预先建立索引，只比较查询本身
+        for name in ("tags", "priority", "completed", "deadline", "sequence"):
+            manager._index(name)
+
+        for label, query in queries.items():
+
+            def scan():
+                result = plans
+                if query.get("tags"):
+                    result = [
+                        p for p in result if any(t in p["tags"] for t in query["tags"])
+                    ]
+                if query.get("all_tags"):
+                    result = [
+                        p
+                        for p in result
+                        if all(t in p["tags"] for t in query["all_tags"])
+                    ]
+                if query.get("not_tags"):
+                    result = [
+                        p
+                        for p in result
+                        if not any(t in p["tags"] for t in query["not_tags"])
+                    ]
+                if query.get("priority"):
+                    result = [p for p in result if p["priority"] == query["priority"]]
+                if query.get("completed") is not None:
+                    result = [p for p in result if p["completed"] == query["completed"]]
+                if query.get("deadline_from"):
+                    result = [
+                        p
+                        for p in result
+                        if p["deadline"]
+                        and query["deadline_from"]
+                        <= p["deadline"]
+                        <= query["deadline_to"]
+                    ]
+                if query.get("order_by"):
+                    result = sorted(result, key=lambda p: p["deadline"] or "9999-99-99")
+                return result
+
+            repeat = max(1, args.ops // 10)
+            rows.append(
+                [
+                    size,
+                    label,
+                    len(manager.get_plans(**query)),
+                    f"{timeit(scan, repeat) / 1000:.2f}",
+                    f"{timeit(lambda: manager.get_plans(**query), repeat) / 1000:.2f}",
+                ]
+            )
+
+    print("组合条件查询的平均耗时（毫秒）")
+    print_table(["计划数", "查询", "结果数", "依次过滤", "查询规划"], rows)
+
+
+def retained_bytes(build: Callable[[], object]) -> int:
+    """返回 build 的结果占用的内存（字节）"""
+    tracemalloc.start()
+    result = build()  # noqa: F841 结果在测量期间保持存活
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def bench_columnar(args: argparse.Namespace) -> None:
+    """字典列表与列式表对比：内存占用和组合条件过滤"""
+    today = datetime.date.today()
+    plan_filter = PlanFilter(
+        priority="high",
+        completed=False,
+        all_tags=["work"],
+        deadline_from=today.isoformat(),
+        deadline_to=(today + datetime.timedelta(days=30)).isoformat(),
+    )
+    numpy = columnar.np
+
+    rows = []
+    for size in args.sizes:
+        dict_bytes = retained_bytes(lambda: make_plans(size))
+        table_bytes = retained_bytes(lambda: PlanTable(make_plans(size)))
+
+        plans = make_plans(size)
+        manager = make_manager(list(plans))
+        table = PlanTable(plans)
+        repeat = max(1, args.ops // 10)
+
+        for name in ("tags", "priority", "completed", "deadline", "sequence"):
+            manager._index(name)
+
+        def indexed():
+            return list(manager.query(plan_filter))
+
+        row = [
+            size,
+            f"{dict_bytes / size:.0f}",
+            f"{table_bytes / size:.0f}",
+            f"{timeit(indexed, repeat) / 1000:.2f}",
+        ]
+        columnar.np = None
+        row.append(f"{timeit(lambda: table.query(plan_filter), repeat) / 1000:.2f}")
+        columnar.np = numpy
+        if numpy is not None:
+            # 首次查询会建立标签数组，不计入耗时
+            table.query(plan_filter)
+            row.append(f"{timeit(lambda: table.query(plan_filter), repeat) / 1000:.2f}")
+        else:
+            row.append("未安装")
+        rows.append(row)
+
+    print("每个计划占用的内存（字节）和组合条件过滤的平均耗时（毫秒）")
+    print_table(
+        ["计划数", "字典内存", "列式内存", "字典+索引", "列式逐行", "列式NumPy"], rows
+    )
+
+
+class LegacyPlan:
+    """改为 __slots__ 之前的计划对象：每个实例一个 __dict__，字段都是字符串和列表"""
+
+    def __init__(self, data: Dict):
+        self.title = data["title"]
+        self.description = data["description"]
+        self.deadline = data.get("deadline")
+        self.priority = data.get("priority", "medium")
+        self.tags = list(data.get("tags", []))
+        self.id = data.get("id")
+        self.created_at = data.get("created_at")
+        self.completed = data.get("completed", False)
+
+
+def bench_models(args: argparse.Namespace) -> None:
+    """计划对象的内存占用：旧的普通类与 __slots__ 紧凑模型对比"""
+    rows = []
+    for size in args.sizes:
+        # 从 JSON 文本加载，与读取存储文件时一样，每个计划的字符串都是独立的对象
+        text = json.dumps({"plans": make_plans(size)}, ensure_ascii=False)
+
+        def load() -> List[Dict]:
+            return json.loads(text)["plans"]
+
+        dicts = retained_bytes(load)
+        legacy = retained_bytes(lambda: [LegacyPlan(plan) for plan in load()])
+        compact = retained_bytes(lambda: [Plan.from_dict(plan) for plan in load()])
+
+        sample = load()[:10000]
+        start = time.perf_counter()
+        converted = [Plan.from_dict(plan).to_dict() for plan in sample]
+        elapsed = (time.perf_counter() - start) / len(sample) * 1e6
+        assert converted == sample
+
+        rows.append(
+            [
+                size,
+                f"{dicts / size:.0f}",
+                f"{legacy / size:.0f}",
+                f"{compact / size:.0f}",
+                f"{(1 - compact / legacy) * 100:.0f}%",
+                f"{elapsed:.1f}",
+            ]
+        )
+
+    print("每个计划占用的内存（字节，含字符串）")
+    print_table(
+        ["计划数", "字典", "普通类", "__slots__", "节省", "往返转换(微秒)"], rows
+    )
+
+
+def bench_load(args: argparse.Namespace) -> None:
+    """启动加载：校验和一致时跳过验证，与逐个验证计划对比"""
+    rows = []
+    directory = tempfile.mkdtemp()
+    try:
+        for size in args.sizes:
+            path = os.path.join(directory, f"plans-{size}.json")
+            JSONStorage(path).save({"plans": make_plans(size)})
+            trusted = timeit(lambda: PlanManager(path), 1)
+
+            # 改动文件内容使校验和失效，加载时逐个验证
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text.replace("计划 0", "计划 零", 1))
+            validated = timeit(lambda: PlanManager(path), 1)
+
+            rows.append(
+                [
+                    size,
+                    f"{trusted / 1000:.0f}",
+                    f"{validated / 1000:.0f}",
+                    f"{validated / trusted:.1f}x",
+                ]
+            )
+    finally:
+        shutil.rmtree(directory)
+
+    print("从 JSON 文件启动的耗时（毫秒）")
+    print_table(["计划数", "校验和一致", "逐个验证", "加速"], rows)
+
+
+def make_time_ordered_plans(count: int, seed: int = 0) -> List[Dict]:
+    """生成使用按时间排序ID的合成计划，创建时间均匀分布在过去一年内"""
+    rng = random.Random(seed)
+    now = int(time.time() * 1000)
+    plans = make_plans(count, seed)
+    for plan in plans:
+        millis = now - rng.randrange(365 * 86400 * 1000)
+        plan["id"] = str(
+            uuid.UUID(
+                int=millis << 80
+                | 0x7 << 76
+                | rng.getrandbits(12) << 64
+                | 0b10 << 62
+                | rng.getrandbits(62)
+            )
+        )
+        plan["created_at"] = id_created_at(plan["id"])
+    return plans
+
+
+def bench_created(args: argparse.Namespace) -> None:
+    """最近创建的计划：解析创建时间的全量扫描与按时间排序的ID索引对比"""
+    rows = []
+    since = datetime.datetime.now() - datetime.timedelta(days=7)
+    since_text = since.strftime("%Y-%m-%d %H:%M:%S")
+    for size in args.sizes:
+        plans = make_time_ordered_plans(size)
+
+        def scan_since():
+            result = [
+                plan
+                for plan in plans
+                if datetime.datetime.strptime(plan["created_at"], "%Y-%m-%d %H:%M:%S")
+                >= since
+            ]
+            return sorted(result, key=lambda x: x["created_at"])[:50]
+
+        manager = make_manager(list(plans))
+        build = timeit(lambda: manager._index("prefix"), 1)
+        last = manager.get_plans_created_since(since_text, limit=50)[-1]["id"]
+
+        rows.append(
+            [
+                size,
+                f"{timeit(scan_since, 1) / 1000:.1f}",
+                f"{build / 1000:.1f}",
+                f"{timeit(lambda: manager.get_plans_created_since(since_text, limit=50), args.ops) / 1000:.3f}",
+                f"{timeit(lambda: manager.get_plans_created_since(since_text, last, 50), args.ops) / 1000:.3f}",
+                f"{timeit(lambda: manager.get_plans_created_since(since_text), args.ops) / 1000:.2f}",
+            ]
+        )
+
+    print("最近 7 天创建的计划，查询平均耗时（毫秒）")
+    print_table(
+        ["计划数", "扫描前50个", "建立索引", "索引前50个", "索引下一页", "索引全部"],
+        rows,
+    )
+
+
+def peak_bytes(func: Callable[[], object]) -> int:
+    """返回调用 func 期间新分配内存的峰值（字节）"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_page(args: argparse.Namespace) -> None:
+    """取前 50 个结果：构建完整列表与流式分页对比"""
+    queries = {
+        "全部": PlanFilter(),
+        "高优先级未完成": PlanFilter(priority="high", completed=False),
+        "按截止日期": PlanFilter(order_by="deadline"),
+    }
+    rows = []
+    for size in args.sizes:
+        manager = make_manager(make_plans(size))
+        for name in ("sequence", "priority", "completed", "deadline"):
+            manager._index(name)
+
+        for label, plan_filter in queries.items():
+            page = list(manager.iter_plans(plan_filter, limit=50))
+            after = page[-1]["id"]
+
+            def full_list():
+                return list(manager.query(plan_filter))[:50]
+
+            def first_page():
+                return list(manager.iter_plans(plan_filter, limit=50))
+
+            def next_page():
+                return list(manager.iter_plans(plan_filter, limit=50, after=after))
+
+            repeat = max(1, args.ops // 10)
+            rows.append(
+                [
+                    size,
+                    label,
+                    f"{timeit(full_list, repeat) / 1000:.2f}",
+                    f"{timeit(first_page, args.ops) / 1000:.3f}",
+                    f"{timeit(next_page, args.ops) / 1000:.3f}",
+                    f"{peak_bytes(full_list) // 1024}",
+                    f"{peak_bytes(first_page) // 1024}",
+                ]
+            )
+
+    print("取前 50 个结果的平均耗时（毫秒）和内存峰值（KB）")
+    print_table(
+        ["计划数", "查询", "完整列表", "第一页", "第二页", "列表内存", "分页内存"],
+        rows,
+    )
+
+
+def bench_urgent(args: argparse.Namespace) -> None:
+    """最紧急的 10 个计划：全部评分后排序与有界堆加提前结束对比"""
+    rows = []
+    for size in args.sizes:
+        plans = make_plans(size)
+        manager = make_manager(plans)
+        manager._index("deadline")
+        table = PlanManager(storage=MemoryStorage(plans), columnar=True)
+        today = datetime.date.today()
+        ordinal = today.toordinal()
+
+        def full_sort():
+            scored = [
+                (manager.urgency(plan, ordinal), plan)
+                for plan in manager.get_plans()
+                if not plan["completed"]
+            ]
+            scored.sort(key=lambda item: item[0], reverse=True)
+            return scored[:10]
+
+        def indexed():
+            return manager.top_urgent(10, now=today)
+
+        def columnar_table():
+            return table.top_urgent(10, now=today)
+
+        repeat = max(1, args.ops // 10)
+        rows.append(
+            [
+                size,
+                f"{timeit(full_sort, repeat) / 1000:.2f}",
+                f"{timeit(indexed, args.ops) / 1000:.3f}",
+                f"{timeit(columnar_table, repeat) / 1000:.2f}",
+            ]
+        )
+
+    print("取最紧急的 10 个计划的平均耗时（毫秒）")
+    print_table(["计划数", "全部排序", "索引+堆", "列式表"], rows)
+
+
+def bench_stats(args: argparse.Namespace) -> None:
+    """汇总统计：每次扫描全部计划与增量维护的计数对比"""
+    rows = []
+    for size in args.sizes:
+        manager = make_manager(make_plans(size))
+        manager.stats()
+        today = datetime.date.today().toordinal()
+
+        def full_scan():
+            priorities: Dict[str, int] = {}
+            tags: Dict[str, int] = {}
+            completed = overdue = due_soon = 0
+            for plan in manager.plans_data["plans"]:
+                priorities[plan["priority"]] = priorities.get(plan["priority"], 0) + 1
+                for tag in plan["tags"]:
+                    tags[tag] = tags.get(tag, 0) + 1
+                if plan["completed"]:
+                    completed += 1
+                elif plan["deadline"]:
+                    ordinal = datetime.date.fromisoformat(plan["deadline"]).toordinal()
+                    overdue += ordinal < today
+                    due_soon += today <= ordinal <= today + 7
+            return completed, overdue, due_soon
+
+        plan_ids = list(manager._get_records())
+
+        def mutate_and_poll():
+            manager.complete_plan(random.choice(plan_ids))
+            return manager.stats()
+
+        repeat = max(1, args.ops // 10)
+        rows.append(
+            [
+                size,
+                f"{timeit(full_scan, repeat) / 1000:.2f}",
+                f"{timeit(manager.stats, args.ops):.1f}",
+                f"{timeit(mutate_and_poll, args.ops):.1f}",
+            ]
+        )
+
+    print("汇总统计的平均耗时：全部扫描为毫秒，增量计数为微秒")
+    print_table(["计划数", "全部扫描(ms)", "增量统计(µs)", "修改后统计(µs)"], rows)
+
+
+def bench_search(args: argparse.Namespace) -> None:
+    """全文搜索：逐条子串匹配与倒排索引加 BM25 对比"""
+    rows = []
+    for size in args.sizes:
+        # 随机汉字组成的两字词汇，加少量英文单词
+        rng = random.Random(1)
+        words = [
+            chr(rng.randint(0x4E00, 0x9FA5)) + chr(rng.randint(0x4E00, 0x9FA5))
+            for _ in range(5000)
+        ]
+        words += [f"word{i}" for i in range(1000)]
+        plans = make_plans(size)
+        for plan in plans:
+            plan["title"] = "".join(rng.sample(words, 3))
+            plan["description"] = "，".join(rng.sample(words, 12))
+        query = words[0] + words[1]
+        manager = make_manager(plans)
+
+        start = time.perf_counter()
+        manager.search(query)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def substring():
+            return list(manager.query(PlanFilter(text=query)))
+
+        def indexed():
+            return manager.search(query, limit=20)
+
+        repeat = max(1, args.ops // 10)
+        rows.append(
+            [
+                size,
+                f"{build_ms:.0f}",
+                f"{timeit(substring, repeat) / 1000:.2f}",
+                f"{timeit(indexed, repeat) / 1000:.2f}",
+            ]
+        )
+
+    print("全文搜索的平均耗时（毫秒）；子串匹配不排序，索引搜索按 BM25 取前 20 个")
+    print_table(["计划数", "建立索引", "子串匹配", "索引搜索"], rows)
+
+
+def bench_sidecar(args: argparse.Namespace) -> None:
+    """索引旁路文件：新进程中首次使用索引时重新建立与从旁路文件读取对比"""
+    operations = [
+        ("prefix", lambda manager: manager.find_plan_ids("abc")),
+        ("tags", lambda manager: manager.query(PlanFilter(tags=["work"]))),
+        ("deadline", lambda manager: manager.get_upcoming_deadlines(7)),
+        ("search", lambda manager: manager.search("计划 5")),
+    ]
+
+    def first_use(path: str, operation: Callable, persist: bool) -> float:
+        """新建管理器并加载计划后，第一次操作的耗时（毫秒）"""
+        manager = PlanManager(path, persist_indexes=persist)
+        start = time.perf_counter()
+        operation(manager)
+        return (time.perf_counter() - start) * 1000
+
+    rows = []
+    directory = tempfile.mkdtemp()
+    try:
+        for size in args.sizes:
+            path = os.path.join(directory, f"plans-{size}.json")
+            JSONStorage(path).save({"plans": make_plans(size)})
+            for name, operation in operations:
+                build = first_use(path, operation, False)
+                # 第一次使用时建立并写入旁路文件，之后的新实例直接读取
+                first_use(path, operation, True)
+                restore = first_use(path, operation, True)
+                rows.append(
+                    [
+                        size,
+                        name,
+                        f"{build:.0f}",
+                        f"{restore:.0f}",
+                        f"{build / restore:.1f}x",
+                    ]
+                )
+    finally:
+        shutil.rmtree(directory)
+
+    print("新进程第一次使用索引的耗时（毫秒）")
+    print_table(["计划数", "索引", "重新建立", "读取旁路文件", "加速"], rows)
+
+
+def bench_daemon(args: argparse.Namespace) -> None:
+    """守护进程：转发命令与每次启动进程直接访问存储对比"""
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for size in args.sizes:
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "plans.json")
+            plans = make_plans(size)
+            JSONStorage(path).save({"plans": plans})
+            sock = os.path.join(directory, "daemon.sock")
+            env = dict(os.environ, PYTHONPATH=repo, PLAN_MANAGER_SOCKET=sock)
+            plan_ids = iter(plan["id"] for plan in plans)
+            commands = [("list -n 20", lambda: ["list", "-n", "20"])]
+            commands.append(("complete", lambda: ["complete", next(plan_ids)]))
+
+            def run_process(argv: List[str]) -> None:
+                subprocess.run(
+                    [sys.executable, "-m", "plan_manager.main"] + argv,
+                    cwd=directory,
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                )
+
+            direct = {
+                name: timeit(lambda: run_process(argv()), 3) for name, argv in commands
+            }
+
+            cli_args = parse_args([])
+            # 与 serve 命令相同：后台写入，加载后冻结垃圾回收跟踪的对象
+            manager = PlanManager(path, write_behind=True, persist_indexes=True)
+            gc.freeze()
+            daemon = PlanDaemon(
+                sock, lambda argv: execute_request(manager, cli_args, argv)
+            )
+            thread = threading.Thread(target=daemon.server.serve_forever)
+            thread.start()
+            try:
+                for name, argv in commands:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        forward(argv(), sock)
+                        request = timeit(lambda: forward(argv(), sock), args.ops)
+                    process = timeit(lambda: run_process(argv()), 3)
+                    rows.append(
+                        [
+                            size,
+                            name,
+                            f"{direct[name] / 1000:.0f}",
+                            f"{process / 1000:.1f}",
+                            f"{request / 1000:.2f}",
+                        ]
+                    )
+            finally:
+                daemon.server.shutdown()
+                thread.join()
+                daemon.close()
+                manager.close()
+                gc.unfreeze()
+        finally:
+            shutil.rmtree(directory)
+
+    print("命令耗时（毫秒）；进程耗时包括解释器启动，请求耗时为已运行进程内的往返")
+    print_table(["计划数", "命令", "直接访问进程", "转发进程", "转发请求"], rows)
+
+
+def bench_async(args: argparse.Namespace) -> None:
+    """异步接口：并发修改时直接调用计划管理器与使用 AsyncPlanManager 对比"""
+
+    async def measure(changes: Callable[[], object]) -> Tuple[float, float]:
+        """执行修改，返回 (总耗时, 事件循环最长停顿)，单位毫秒"""
+        stalls = [0.0]
+        done = False
+
+        async def ticker() -> None:
+            while not done:
+                start = time.perf_counter()
+                await asyncio.sleep(0)
+                stalls.append(time.perf_counter() - start)
+
+        task = asyncio.ensure_future(ticker())
+        start = time.perf_counter()
+        await changes()
+        elapsed = time.perf_counter() - start
+        done = True
+        await task
+        return elapsed * 1000, max(stalls) * 1000
+
+    async def run(path: str) -> List[object]:
+        count = args.ops
+
+        manager = PlanManager(path)
+
+        async def direct() -> None:
+            for i in range(count):
+                manager.add_plan(f"并发 {i}", "", "2030-01-01")
+                await asyncio.sleep(0)
+
+        direct_time, direct_stall = await measure(direct)
+
+        plans = await AsyncPlanManager.open(path)
+
+        async def facade() -> None:
+            await asyncio.gather(
+                *(plans.add_plan(f"并发 {i}", "", "2030-01-01") for i in range(count))
+            )
+
+        try:
+            async_time, async_stall = await measure(facade)
+        finally:
+            await plans.close()
+        return [
+            f"{direct_time:.0f}",
+            f"{direct_stall:.1f}",
+            f"{async_time:.0f}",
+            f"{async_stall:.1f}",
+        ]
+
+    rows = []
+    directory = tempfile.mkdtemp()
+    try:
+        for size in args.sizes:
+            path = os.path.join(directory, f"plans-{size}.json")
+            JSONStorage(path).save({"plans": make_plans(size)})
+            rows.append([size] + asyncio.run(run(path)))
+    finally:
+        shutil.rmtree(directory)
+
+    print(f"{args.ops} 个并发的添加计划请求，总耗时与事件循环最长停顿（毫秒）")
+    print_table(
+        ["计划数", "直接调用", "直接调用停顿", "AsyncPlanManager", "异步停顿"], rows
+    )
+
+
+def stress_threads(
+    path: str, threads: int, ops: int, write_ratio: float, seed: int
+) -> Tuple[float, List[str]]:
+    """
+    多个线程共享一个线程安全的计划管理器，执行随机的查询和修改
+
+    返回:
+        (每秒操作数, 一致性检查发现的问题)
+    """
+    manager = PlanManager(path, journal=True, thread_safe=True)
+    plan_ids = [plan["id"] for plan in manager.get_plans()]
+    # 每次修改都给计数计划加一，写者互斥时最终值等于修改总数
+    counter = manager.add_plan("计数", "0")
+    increments = [0] * threads
+    added = [0] * threads
+    errors: List[str] = []
+    barrier = threading.Barrier(threads + 1)
+    # 预先建立索引，计时只包括稳定状态
+    manager.stats()
+    list(manager.iter_plans(PlanFilter(tags=["work"]), "deadline", limit=20))
+
+    def worker(number: int) -> None:
+        rng = random.Random(seed * 1000 + number)
+        barrier.wait()
+        try:
+            for _ in range(ops):
+                if rng.random() >= write_ratio:
+                    choice = rng.random()
+                    if choice < 0.5:
+                        tag = rng.choice(TAGS)
+                        plan_filter = PlanFilter(tags=[tag], completed=False)
+                        list(manager.iter_plans(plan_filter, "deadline", limit=20))
+                    elif choice < 0.8:
+                        manager.get_plan_by_id(rng.choice(plan_ids))
+                    else:
+                        manager.stats()
+                elif rng.random() < 0.5:
+                    manager.update_plan(
+                        rng.choice(plan_ids), priority=rng.choice(PRIORITIES)
+                    )
+                else:
+                    with manager.transaction():
+                        value = int(manager.get_plan_by_id(counter)["description"])
+                        manager.update_plan(counter, description=str(value + 1))
+                        manager.add_plan(f"线程 {number}", "", tags=["misc"])
+                    increments[number] += 1
+                    added[number] += 1
+        except Exception as e:
+            errors.append(f"线程 {number}: {e!r}")
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    # 一致性检查：计数、总数、索引查询与逐个过滤的结果、重新加载的文件
+    plans = manager.plans_data["plans"]
+    value = int(manager.get_plan_by_id(counter)["description"])
+    if value != sum(increments):
+        errors.append(f"计数为 {value}，应为 {sum(increments)}")
+    if len(plans) != len(plan_ids) + 1 + sum(added):
+        errors.append(f"计划数为 {len(plans)}")
+    if manager.stats()["total"] != len(plans):
+        errors.append("汇总统计的总数与计划数不一致")
+    for tag in TAGS:
+        indexed = {plan["id"] for plan in manager.get_plans(tags=[tag])}
+        scanned = {plan["id"] for plan in plans if tag in plan["tags"]}
+        if indexed != scanned:
+            errors.append(f"标签 {tag} 的索引查询结果与逐个过滤不一致")
+    reloaded = PlanManager(path, journal=True).plans_data["plans"]
+    if {plan["id"]: plan for plan in reloaded} != {plan["id"]: plan for plan in plans}:
+        errors.append("重新加载的文件与内存数据不一致")
+    return threads * ops / elapsed, errors
+
+
+def bench_threads(args: argparse.Namespace) -> None:
+    """多线程：共享一个线程安全的计划管理器时的吞吐量，并检查结果一致"""
+    rows = []
+    failures = []
+    for size in args.sizes:
+        plans = make_plans(size)
+        for name, write_ratio in [("只读", 0.0), ("读写 9:1", 0.1)]:
+            for threads in [1, 4, 16]:
+                directory = tempfile.mkdtemp()
+                try:
+                    path = os.path.join(directory, "plans.json")
+                    JSONStorage(path).save({"plans": plans})
+                    rate, errors = stress_threads(
+                        path, threads, args.ops, write_ratio, size
+                    )
+                finally:
+                    shutil.rmtree(directory)
+                failures.extend(errors)
+                rows.append(
+                    [size, name, threads, f"{rate:.0f}", "失败" if errors else "通过"]
+                )
+
+    print(f"每个线程执行 {args.ops} 次操作，日志模式保存；吞吐量为每秒操作数")
+    print_table(["计划数", "负载", "线程数", "吞吐量", "一致性"], rows)
+    for failure in failures:
+        print(failure)
+
+
+class TimedStorage(JSONStorage):
+    """记录排他锁持有时间和保存时合并其他进程修改的次数的 JSON 存储"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holds: List[float] = []
+        self.merges = 0
+
+    @contextlib.contextmanager
+    def lock(self):
+        """获取排他锁，记录最外层的持有时间"""
+        outermost = not self._lock_depth
+        with super().lock():
+            start = time.perf_counter()
+            yield
+            if outermost:
+                self.holds.append(time.perf_counter() - start)
+
+    def commit(self, records, snapshot, durable=True) -> Optional[List[Dict]]:
+        """保存修改，记录是否合并了其他进程的修改"""
+        foreign = super().commit(records, snapshot, durable)
+        if foreign != []:
+            self.merges += 1
+        return foreign
+
+
+def process_worker(
+    path: str, journal: bool, number: int, ops: int, results: multiprocessing.Queue
+) -> None:
+    """一个进程：用自己的计划管理器交替更新随机计划、添加计划和给自己的计数加一"""
+    storage = TimedStorage(path, journal=journal)
+    manager = PlanManager(storage=storage)
+    rng = random.Random(number)
+    plan_ids = [plan["id"] for plan in manager.get_plans()]
+    counter = manager.add_plan(f"计数 {number}", "0")
+    for _ in range(ops):
+        manager.update_plan(rng.choice(plan_ids), priority=rng.choice(PRIORITIES))
+        manager.add_plan(f"进程 {number}", "", tags=["misc"])
+        value = int(manager.get_plan_by_id(counter)["description"])
+        manager.update_plan(counter, description=str(value + 1))
+    if journal:
+        # 压缩在锁外写入新快照，锁的持有时间同样与计划数量无关
+        manager.compact()
+    results.put((counter, storage.holds, storage.merges))
+
+
+def bench_processes(args: argparse.Namespace) -> None:
+    """多进程：多个进程同时修改同一个存储时的锁持有时间，并检查没有丢失修改"""
+    rows = []
+    failures = []
+    for size in args.sizes:
+        plans = make_plans(size)
+        for journal in (False, True):
+            for processes in [1, 4, 8]:
+                directory = tempfile.mkdtemp()
+                try:
+                    path = os.path.join(directory, "plans.json")
+                    JSONStorage(path).save({"plans": plans})
+                    results: multiprocessing.Queue = multiprocessing.Queue()
+                    workers = [
+                        multiprocessing.Process(
+                            target=process_worker,
+                            args=(path, journal, i, args.ops, results),
+                        )
+                        for i in range(processes)
+                    ]
+                    start = time.perf_counter()
+                    for worker in workers:
+                        worker.start()
+                    outcomes = [results.get() for _ in workers]
+                    for worker in workers:
+                        worker.join()
+                    elapsed = time.perf_counter() - start
+
+                    # 每个进程的计数和添加的计划都必须保存下来
+                    reloaded = PlanManager(path, journal=journal)
+                    for counter, _, _ in outcomes:
+                        plan = reloaded.get_plan_by_id(counter)
+                        if plan is None or plan["description"] != str(args.ops):
+                            failures.append(
+                                f"{processes} 个进程: 计数 {counter} 丢失修改"
+                            )
+                    expected = size + processes * (args.ops + 1)
+                    if len(reloaded.plans_data["plans"]) != expected:
+                        failures.append(f"{processes} 个进程: 计划数不等于 {expected}")
+                finally:
+                    shutil.rmtree(directory)
+                holds = sorted(hold for _, times, _ in outcomes for hold in times)
+                rows.append(
+                    [
+                        size,
+                        "日志" if journal else "快照",
+                        processes,
+                        f"{processes * args.ops * 3 / elapsed:.0f}",
+                        f"{holds[len(holds) // 2] * 1000:.2f}",
+                        f"{holds[int(len(holds) * 0.99)] * 1000:.2f}",
+                        f"{holds[-1] * 1000:.2f}",
+                        sum(merges for _, _, merges in outcomes),
+                    ]
+                )
+
+    print(f"每个进程执行 {args.ops} 轮（更新、添加、计数各一次）；锁持有时间单位为毫秒")
+    print_table(
+        [
+            "计划数",
+            "保存方式",
+            "进程数",
+            "修改/秒",
+            "锁 p50",
+            "锁 p99",
+            "锁最长",
+            "合并次数",
+        ],
+        rows,
+    )
+    for failure in failures:
+        print(failure)
+
+
+BENCHMARKS = {
+    "ids": bench_ids,
+    "deadlines": bench_deadlines,
+    "query": bench_query,
+    "columnar": bench_columnar,
+    "models": bench_models,
+    "load": bench_load,
+    "created": bench_created,
+    "page": bench_page,
+    "urgent": bench_urgent,
+    "stats": bench_stats,
+    "search": bench_search,
+    "sidecar": bench_sidecar,
+    "daemon": bench_daemon,
+    "async": bench_async,
+    "threads": bench_threads,
+    "processes": bench_processes,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="计划管理器性能基准测试")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS), help="测试项目")
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 1000000],
+        help="合成计划数量",
+    )
+    parser.add_argument("--ops", type=int, default=100, help="每项测量的操作次数")
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
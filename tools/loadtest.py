@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+HTTP 接口负载测试工具
+
+用多个持久连接同时向 plan-manager api 发送读写混合的请求，
+报告吞吐量、延迟分位数和各状态码的数量。不指定 --url 时在临时目录中
+生成合成计划并启动一个本地接口进程，测试结束后停止并删除。
+
+使用方法:
+    python tools/loadtest.py --plans 100000 --concurrency 32 --duration 10
+    python tools/loadtest.py --url http://127.0.0.1:8080 --write-ratio 0
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from benchmark import TAGS, make_plans, print_table
+from plan_manager.core.storage import JSONStorage
+
+# 等待接口进程开始监听的最长时间（秒）
+START_TIMEOUT = 120.0
+
+# 读取请求的组成：(名称, 权重)
+READS = [("list", 4), ("get", 3), ("poll", 6), ("upcoming", 2), ("stats", 1)]
+WRITES = [("add", 2), ("patch", 2), ("complete", 1)]
+
+
+class Client:
+    """一个持久连接上的 HTTP/1.1 客户端"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        发送请求并读取完整响应，连接断开时重新连接
+
+        返回:
+            (状态码, 名称转为小写的响应头, 响应体)
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}"]
+        lines.append(f"Content-Length: {len(data)}")
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+        try:
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError("连接已关闭")
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+            length = int(response_headers.get("content-length", "0"))
+            payload = await self.reader.readexactly(length) if length else b""
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+        if response_headers.get("connection") == "close":
+            self.close()
+        return status, response_headers, payload
+
+    def close(self) -> None:
+        """关闭连接"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class LoadTest:
+    """按权重随机选择请求的负载测试"""
+
+    def __init__(self, host: str, port: int, args: argparse.Namespace):
+        self.host = host
+        self.port = port
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.plan_ids: List[str] = []
+        self.etags: Dict[str, str] = {}
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.sent = 0
+
+    async def prepare(self) -> None:
+        """取得一批计划 ID，供获取、更新和完成请求使用"""
+        client = Client(self.host, self.port)
+        try:
+            status, _, payload = await client.request("GET", "/plans?limit=1000")
+        finally:
+            client.close()
+        if status != 200:
+            raise RuntimeError(f"获取计划列表失败: HTTP {status}")
+        self.plan_ids = [plan["id"] for plan in json.loads(payload)["plans"]]
+
+    def choose(self) -> Tuple[str, str, str, Optional[Dict]]:
+        """随机选择一个请求，返回 (名称, 方法, 路径, 请求体)"""
+        choices = WRITES if self.random.random() < self.args.write_ratio else READS
+        name = self.random.choices(
+            [item[0] for item in choices], [item[1] for item in choices]
+        )[0]
+        plan_id = self.random.choice(self.plan_ids) if self.plan_ids else "missing"
+        if name == "list":
+            tag = self.random.choice(TAGS)
+            return name, "GET", f"/plans?tags={tag}&completed=false&limit=20", None
+        if name == "get":
+            return name, "GET", f"/plans/{plan_id}", None
+        if name == "poll":
+            return name, "GET", "/plans?limit=20", None
+        if name == "upcoming":
+            return name, "GET", "/upcoming?days=7", None
+        if name == "stats":
+            return name, "GET", "/stats", None
+        if name == "add":
+            deadline = f"2030-{self.random.randint(1, 12):02d}-01"
+            body = {"title": "负载测试", "deadline": deadline, "tags": ["misc"]}
+            return name, "POST", "/plans", body
+        if name == "patch":
+            body = {"priority": self.random.choice(["low", "medium", "high"])}
+            return name, "PATCH", f"/plans/{plan_id}", body
+        return name, "POST", f"/plans/{plan_id}/complete", None
+
+    async def worker(self, deadline: float) -> None:
+        """
+        在一个连接上不断发送请求，直到截止时间或请求数用完
+
+        参数:
+            deadline: 停止发送的时刻，time.perf_counter() 的值
+        """
+        client = Client(self.host, self.port)
+        try:
+            while time.perf_counter() < deadline and (
+                not self.args.requests or self.sent < self.args.requests
+            ):
+                self.sent += 1
+                name, method, path, body = self.choose()
+                headers = {}
+                # 轮询的客户端带上次的 ETag，数据未变时得到 304
+                if name == "poll" and path in self.etags:
+                    headers["If-None-Match"] = self.etags[path]
+                start = time.perf_counter()
+                try:
+                    status, response_headers, _ = await client.request(
+                        method, path, body, headers
+                    )
+                except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                    self.errors += 1
+                    continue
+                self.latencies.append(time.perf_counter() - start)
+                self.statuses[status] += 1
+                if name == "poll" and "etag" in response_headers:
+                    self.etags[path] = response_headers["etag"]
+        finally:
+            client.close()
+
+    async def run(self) -> float:
+        """运行负载测试，返回实际耗时（秒）"""
+        await self.prepare()
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        await asyncio.gather(
+            *(self.worker(deadline) for _ in range(self.args.concurrency))
+        )
+        return time.perf_counter() - start
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """已排序列表的分位数"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def wait_for_port(host: str, port: int, process: subprocess.Popen) -> None:
+    """
+    等待接口进程开始监听
+
+    异常:
+        RuntimeError: 接口进程已退出或超时
+    """
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("接口进程已退出")
+        try:
+            socket.create_connection((host, port), timeout=1.0).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("等待接口进程启动超时")
+
+
+def free_port() -> int:
+    """由系统分配一个空闲的本地端口"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="计划管理器 HTTP 接口负载测试")
+    parser.add_argument(
+        "--url",
+        help="已运行的接口地址，例如 http://127.0.0.1:8080；不指定时启动本地接口",
+    )
+    parser.add_argument("--plans", type=int, default=10000, help="本地接口的合成计划数")
+    parser.add_argument("--concurrency", type=int, default=16, help="同时使用的连接数")
+    parser.add_argument("--duration", type=float, default=10.0, help="测试时长（秒）")
+    parser.add_argument(
+        "--requests", type=int, default=0, help="最多发送的请求数，0 表示不限"
+    )
+    parser.add_argument(
+        "--write-ratio", type=float, default=0.1, help="修改请求的比例，0 到 1"
+    )
+    parser.add_argument(
+        "--journal", action="store_true", help="本地接口使用日志模式保存修改"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args()
+
+    process = None
+    directory = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname or "127.0.0.1", url.port or 80
+    else:
+        directory = tempfile.mkdtemp()
+        host, port = "127.0.0.1", free_port()
+        JSONStorage(os.path.join(directory, "plans.json")).save(
+            {"plans": make_plans(args.plans)}
+        )
+        command = [sys.executable, "-m", "plan_manager.main"]
+        if args.journal:
+            command.append("--journal")
+        process = subprocess.Popen(
+            command + ["api", "--port", str(port)],
+            cwd=directory,
+            env=dict(os.environ, PYTHONPATH=REPO),
+            stdout=subprocess.DEVNULL,
+        )
+
+    try:
+        if process is not None:
+            wait_for_port(host, port, process)
+        test = LoadTest(host, port, args)
+        elapsed = asyncio.run(test.run())
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+        if directory is not None:
+            shutil.rmtree(directory)
+
+    latencies = sorted(test.latencies)
+    completed = len(latencies)
+    not_modified = test.statuses[304]
+    print(f"{completed} 个请求，{elapsed:.1f} 秒，{completed / elapsed:.0f} 请求/秒")
+    print_table(
+        ["p50 (ms)", "p95 (ms)", "p99 (ms)", "最大 (ms)", "304 比例", "连接错误"],
+        [
+            [
+                f"{percentile(latencies, 0.5) * 1000:.2f}",
+                f"{percentile(latencies, 0.95) * 1000:.2f}",
+                f"{percentile(latencies, 0.99) * 1000:.2f}",
+                f"{(latencies[-1] if latencies else 0) * 1000:.2f}",
+                f"{not_modified / completed:.0%}" if completed else "-",
+                test.errors,
+            ]
+        ],
+    )
+    print_table(
+        ["状态码", "数量"],
+        [[status, count] for status, count in sorted(test.statuses.items())],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())